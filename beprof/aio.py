@@ -0,0 +1,142 @@
+"""
+Asynchronous loading of curves for asyncio applications (Python 3.6+).
+
+Reading and parsing of files is done in an executor, so the event loop
+is not blocked. Number of files being loaded at the same time is bounded,
+and new files are submitted only when previous ones complete, so slow
+consumers of results limit the work in progress (backpressure).
+"""
+import asyncio
+import concurrent.futures
+import os
+import tempfile
+import time
+import logging
+
+import numpy as np
+
+from beprof import loader
+
+logger = logging.getLogger(__name__)
+
+
+def _read(load, path, kwargs):
+    # run in executor, returns plain data, so that it can be sent from worker process:
+    # class, points and public attributes (metadata, i.e. Profile.axis)
+    c = load(path, **kwargs)
+    attributes = dict((k, v) for k, v in c.__dict__.items() if not k.startswith('_'))
+    return type(c), np.asarray(c), attributes
+
+
+def _restore(cls, array, attributes):
+    # loaded data is owned by the new object, so it is neither copied nor checked again
+    c = array.view(cls)
+    c.__dict__.update(attributes)
+    return c
+
+
+async def iter_curves(paths, concurrency=8, executor=None, load=loader.load_curve, return_exceptions=False,
+                      **kwargs):
+    """
+    Asynchronous generator of (path, curve) pairs in order of completion.
+
+    At most `concurrency` files are loaded at the same time; next file
+    is submitted only after one of them completes.
+
+    :param paths: iterable of paths (consumed lazily)
+    :param concurrency: maximal number of files loaded at the same time
+    :param executor: concurrent.futures executor, by default a thread pool
+        of `concurrency` threads, created and shut down by the generator
+    :param load: function loading one file (see loader.load_curve())
+    :param return_exceptions: yield (path, exception) for files which
+        could not be loaded instead of raising the exception
+    :param kwargs: extra arguments of load
+    """
+    if concurrency < 1:
+        raise ValueError("Concurrency must be positive.")
+    loop = asyncio.get_event_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+    paths = iter(paths)
+    pending = {}
+
+    def submit():
+        for path in paths:
+            pending[loop.run_in_executor(executor, _read, load, path, kwargs)] = path
+            return
+
+    try:
+        for _ in range(concurrency):
+            submit()
+        while pending:
+            done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                # refill before yielding, so that loading continues while result is consumed
+                submit()
+                try:
+                    data = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    logger.error('Loading %(path)s failed: %(e)s', {"path": path, "e": e})
+                    yield path, e
+                    continue
+                yield path, _restore(*data)
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+async def load_curves(paths, concurrency=8, executor=None, load=loader.load_curve, **kwargs):
+    """
+    Loads all files concurrently (see iter_curves()).
+
+    :return: list of curves in order of paths
+    """
+    paths = list(paths)
+    results = {}
+    async for path, c in iter_curves(paths, concurrency, executor, load, **kwargs):
+        results[path] = c
+    return [results[path] for path in paths]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    rng = np.random.RandomState(0)
+    x = np.linspace(-10, 10, 201)
+    paths = []
+    for i in range(2000):
+        paths.append(os.path.join(directory, 'p{:04d}.dat'.format(i)))
+        np.savetxt(paths[-1], np.column_stack((x, np.exp(-x ** 2 / 8) + 0.01 * rng.randn(x.size))))
+
+    start = time.time()
+    for path in paths:
+        loader.load_curve(path)
+    elapsed = time.time() - start
+    print('sequential: {:.0f} files/s'.format(len(paths) / elapsed))
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for concurrency in (1, 4, 16):
+        start = time.time()
+        loop.run_until_complete(load_curves(paths, concurrency))
+        elapsed = time.time() - start
+        print('asyncio, {:2d} threads: {:.0f} files/s'.format(concurrency, len(paths) / elapsed))
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        start = time.time()
+        loop.run_until_complete(load_curves(paths, 16, executor))
+        elapsed = time.time() - start
+    print('asyncio, process pool: {:.0f} files/s'.format(len(paths) / elapsed))
+    loop.close()
+
+    for path in paths:
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
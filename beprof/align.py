@@ -0,0 +1,132 @@
+import numpy as np
+import time
+import logging
+
+from beprof import functions
+
+logger = logging.getLogger(__name__)
+
+
+def _grid(curves, step):
+    lo = min(float(np.min(c.x)) for c in curves)
+    hi = max(float(np.max(c.x)) for c in curves)
+    if step is None:
+        # finest typical spacing of all curves
+        step = min(float(np.median(np.diff(np.sort(c.x)))) for c in curves if len(c) > 1)
+    if step <= 0:
+        raise ValueError("Grid step must be positive.")
+    return lo + step * np.arange(int(np.floor((hi - lo) / step)) + 1), step
+
+
+def _peak_lags(correlation, max_lag):
+    """
+    Position of maximum of each row of circular cross-correlation
+    (lags 0, 1, ..., -2, -1), limited to |lag| <= max_lag
+    and refined with parabola fitted to three points around maximum.
+    """
+    length = correlation.shape[-1]
+    lags = np.arange(length)
+    lags[lags > length // 2] -= length
+    window = np.abs(lags) <= max_lag
+    masked = np.where(window, correlation, -np.inf)
+    best = np.argmax(masked, axis=1)
+    rows = np.arange(len(correlation))
+    left = correlation[rows, (best - 1) % length]
+    center = correlation[rows, best]
+    right = correlation[rows, (best + 1) % length]
+    denominator = left - 2 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = np.where(denominator < 0, 0.5 * (left - right) / denominator, 0.)
+    return lags[best] + np.clip(delta, -0.5, 0.5)
+
+
+def estimate_shifts(reference, curves, step=None, max_shift=None):
+    """
+    Estimates shifts of curves relative to reference curve,
+    i.e. s such that curve(x) ~ reference(x - s).
+
+    All curves are resampled on common uniform grid (values outside
+    of curve domain are 0) and cross-correlated with reference using
+    one batched FFT. Position of correlation maximum is refined to
+    sub-sample precision with parabolic interpolation.
+
+    >>> from beprof.curve import Curve
+    >>> x = np.linspace(-10, 10, 201)
+    >>> ref = Curve(np.column_stack((x, np.exp(-x ** 2 / 8))))
+    >>> moved = Curve(np.column_stack((x, np.exp(-(x - 0.73) ** 2 / 8))))
+    >>> print(np.round(estimate_shifts(ref, [moved]), 2))
+    [0.73]
+
+    :param reference: Curve object
+    :param curves: list of Curve objects
+    :param step: step of common grid, defaults to finest median spacing of curves
+    :param max_shift: largest shift considered (absolute value), unlimited if None
+    :return: np.array of shifts, in units of x
+    """
+    curves = list(curves)
+    if not curves:
+        return np.zeros(0)
+    grid, step = _grid([reference] + curves, step)
+    logger.info('Estimating shifts of %(n)s curves on grid of %(g)s points, step %(s)s',
+                {"n": len(curves), "g": grid.size, "s": step})
+    values = np.array([c.evaluate_at_x(grid, 0) for c in curves])
+    ref_values = reference.evaluate_at_x(grid, 0)
+    # zero padding to at least 2G - 1 makes circular correlation equal to linear one
+    length = functions.fast_length(2 * grid.size - 1)
+    spectrum = np.fft.rfft(values, length, axis=-1) * np.conj(np.fft.rfft(ref_values, length))
+    correlation = np.fft.irfft(spectrum, length, axis=-1)
+    max_lag = grid.size - 1 if max_shift is None else min(grid.size - 1, int(np.floor(max_shift / step)))
+    return _peak_lags(correlation, max_lag) * step
+
+
+def estimate_shift(reference, curve, step=None, max_shift=None):
+    """
+    Shift of single curve relative to reference, see estimate_shifts().
+    """
+    return float(estimate_shifts(reference, [curve], step, max_shift)[0])
+
+
+def align(reference, curves, step=None, max_shift=None):
+    """
+    Aligns curves to reference in place, by subtracting estimated
+    shifts from x values of each curve (no new objects are created).
+
+    :param reference: Curve object
+    :param curves: list of Curve objects, modified in place
+    :param step: step of common grid, see estimate_shifts()
+    :param max_shift: largest shift considered, see estimate_shifts()
+    :return: np.array of applied shifts
+    """
+    curves = list(curves)
+    shifts = estimate_shifts(reference, curves, step, max_shift)
+    for c, shift in zip(curves, shifts):
+        c.x = c.x - shift
+    return shifts
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(0)
+    x = np.linspace(-30, 30, 1201)
+    reference = curve.Curve(np.column_stack((x, 1 / (1 + np.exp(np.abs(x) - 10)))))
+    true_shifts = rng.uniform(-0.8, 0.8, 500)
+    curves = [curve.Curve(np.column_stack((x, 1 / (1 + np.exp(np.abs(x - s) - 10)) + 0.005 * rng.randn(x.size))))
+              for s in true_shifts]
+
+    start = time.time()
+    candidates = np.arange(-1, 1, 0.01)
+    brute = [candidates[np.argmin([np.sum((c.evaluate_at_x(x + s) - reference.y) ** 2) for s in candidates])]
+             for c in curves[:20]]
+    elapsed = (time.time() - start) / 20
+    print('brute force: {:.5f} s per curve, max error {:.4f}'.format(
+        elapsed, np.max(np.abs(brute - true_shifts[:20]))))
+
+    start = time.time()
+    shifts = align(reference, curves)
+    elapsed = (time.time() - start) / len(curves)
+    print('FFT batch: {:.5f} s per curve, max error {:.4f}'.format(elapsed, np.max(np.abs(shifts - true_shifts))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Debug mode reporting memory allocations and dtype promotions made inside beprof.
+
+Within CopyAudit context every line of beprof code (this module and tests
+excluded) is traced: memory allocated while the line runs (peak of memory
+traced by tracemalloc, so temporary arrays freed before the next line
+are included) is recorded with its call site when it reaches min_bytes.
+Allocations in NumPy functions are attributed to the beprof line which
+called them. Additionally ufunc results of Curve data which up-cast their
+inputs (i.e. int to float) and explicit dtype conversions with np.asarray(),
+np.array() or np.ascontiguousarray() called from beprof are recorded
+as promotions.
+
+Audit is meant for tests and debugging only, tracing makes code
+several times slower. Only the current thread is traced.
+
+Example::
+
+    with CopyAudit(max_bytes=10 * 1024 * 1024) as audit:
+        c.change_domain(domain)
+    print(audit.summary())
+"""
+import collections
+import os
+import sys
+import logging
+
+import numpy as np
+
+from beprof import curve
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+logger = logging.getLogger(__name__)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_EXCLUDED = (os.path.splitext(os.path.abspath(__file__))[0], os.path.join(_PACKAGE_DIR, 'tests') + os.sep)
+
+Record = collections.namedtuple('Record', ('kind', 'nbytes', 'filename', 'lineno', 'function', 'detail'))
+Record.__doc__ = """
+Recorded event: kind is 'alloc' or 'promotion', filename is relative
+to beprof package directory, detail describes promotion.
+"""
+
+
+class CopyBudgetExceeded(AssertionError):
+    """
+    Raised on exit from CopyAudit when recorded allocations exceed budget.
+    """
+    pass
+
+
+def _in_package(filename):
+    filename = os.path.abspath(filename)
+    if not filename.startswith(_PACKAGE_DIR + os.sep):
+        return False
+    return not (os.path.splitext(filename)[0] == _EXCLUDED[0] or filename.startswith(_EXCLUDED[1]))
+
+
+def _caller_site():
+    """
+    Innermost beprof frame of current call stack, None if there is none.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        if _in_package(frame.f_code.co_filename):
+            return frame
+        frame = frame.f_back
+    return None
+
+
+class CopyAudit(object):
+    """
+    Context manager recording allocations and dtype promotions in beprof code.
+
+    :param max_bytes: budget of total allocated bytes, no limit if None
+    :param max_count: budget of number of recorded allocations
+    :param max_promotions: budget of number of recorded promotions
+    :param min_bytes: allocations smaller than that are ignored
+    """
+
+    def __init__(self, max_bytes=None, max_count=None, max_promotions=None, min_bytes=4096):
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_promotions = max_promotions
+        self.min_bytes = min_bytes
+        self.records = []
+        self._site = None
+        self._patched = []
+
+    # allocations
+
+    def _flush(self):
+        current, peak = tracemalloc.get_traced_memory()
+        allocated = (peak if self._reset_peak else current) - self._base
+        if self._site is not None and allocated >= self.min_bytes:
+            filename, lineno, function = self._site
+            self.records.append(Record('alloc', int(allocated), filename, lineno, function, ''))
+        if self._reset_peak:
+            tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0]
+
+    def _site_of(self, frame):
+        return os.path.relpath(frame.f_code.co_filename, _PACKAGE_DIR), frame.f_lineno, frame.f_code.co_name
+
+    def _global_trace(self, frame, event, arg):
+        if not _in_package(frame.f_code.co_filename):
+            return None
+        # allocations before the call belong to calling line (if it is in beprof)
+        self._flush()
+        self._site = self._site_of(frame)
+        return self._local_trace
+
+    def _local_trace(self, frame, event, arg):
+        self._flush()
+        if event == 'return':
+            caller = frame.f_back
+            self._site = self._site_of(caller) if caller is not None and _in_package(
+                caller.f_code.co_filename) else None
+        else:
+            self._site = self._site_of(frame)
+        return self._local_trace
+
+    # promotions
+
+    def _promotion(self, nbytes, detail):
+        frame = _caller_site()
+        if frame is not None:
+            site = self._site_of(frame)
+            self.records.append(Record('promotion', int(nbytes), site[0], site[1], site[2], detail))
+
+    def _patch_array_wrap(self, cls):
+        audit = self
+        original = cls.__dict__.get('__array_wrap__')
+
+        def __array_wrap__(self, obj, context=None, *args):
+            if context is not None:
+                ufunc, inputs = context[0], context[1]
+                dtypes = set(str(i.dtype) for i in inputs if isinstance(i, np.ndarray) and i.size > 1)
+                if obj.dtype.kind != 'b' and dtypes and not dtypes <= set([str(obj.dtype)]):
+                    audit._promotion(obj.nbytes, '{}: {} -> {}'.format(ufunc.__name__, ', '.join(sorted(dtypes)),
+                                                                       obj.dtype))
+            if original is not None:
+                return original(self, obj, context, *args)
+            return np.ndarray.__array_wrap__(self, obj, context, *args)
+
+        cls.__array_wrap__ = __array_wrap__
+        self._patched.append((cls, '__array_wrap__', original))
+
+    def _patch_conversion(self, name):
+        audit = self
+        original = getattr(np, name)
+
+        def conversion(a, dtype=None, *args, **kwargs):
+            result = original(a, dtype, *args, **kwargs)
+            if dtype is not None and isinstance(a, np.ndarray) and result.dtype != a.dtype:
+                audit._promotion(result.nbytes, '{}: {} -> {}'.format(name, a.dtype, result.dtype))
+            return result
+
+        setattr(np, name, conversion)
+        self._patched.append((np, name, original))
+
+    def __enter__(self):
+        if tracemalloc is None:
+            raise RuntimeError("Copy audit requires tracemalloc (Python 3.4+).")
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        # without reset_peak (Python < 3.9) only net allocation of a line is visible
+        self._reset_peak = hasattr(tracemalloc, 'reset_peak')
+        self._base = tracemalloc.get_traced_memory()[0]
+        for cls in (curve.Curve, curve.DataSet):
+            self._patch_array_wrap(cls)
+        for name in ('asarray', 'array', 'ascontiguousarray'):
+            self._patch_conversion(name)
+        self._old_trace = sys.gettrace()
+        sys.settrace(self._global_trace)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        sys.settrace(self._old_trace)
+        self._flush()
+        for owner, name, original in reversed(self._patched):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self._patched = []
+        if self._started:
+            tracemalloc.stop()
+        logger.info('Copy audit: %(n)s allocations, %(b)s bytes, %(p)s promotions',
+                    {"n": len(self.allocations), "b": self.total_bytes, "p": len(self.promotions)})
+        if exc_type is None:
+            exceeded = self.exceeded()
+            if exceeded:
+                raise CopyBudgetExceeded('Copy budget exceeded ({}):\n{}'.format(', '.join(exceeded), self.summary()))
+        return False
+
+    @property
+    def allocations(self):
+        return [r for r in self.records if r.kind == 'alloc']
+
+    @property
+    def promotions(self):
+        return [r for r in self.records if r.kind == 'promotion']
+
+    @property
+    def total_bytes(self):
+        return sum(r.nbytes for r in self.allocations)
+
+    def exceeded(self):
+        """
+        List of descriptions of exceeded budgets (empty if none).
+        """
+        result = []
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            result.append('{} bytes > {}'.format(self.total_bytes, self.max_bytes))
+        if self.max_count is not None and len(self.allocations) > self.max_count:
+            result.append('{} allocations > {}'.format(len(self.allocations), self.max_count))
+        if self.max_promotions is not None and len(self.promotions) > self.max_promotions:
+            result.append('{} promotions > {}'.format(len(self.promotions), self.max_promotions))
+        return result
+
+    def by_site(self):
+        """
+        Records aggregated by call site and kind, largest first.
+
+        :return: list of tuples (kind, filename, lineno, function, count, bytes, details)
+        """
+        groups = collections.OrderedDict()
+        for r in self.records:
+            key = (r.kind, r.filename, r.lineno, r.function)
+            count, nbytes, details = groups.get(key, (0, 0, set()))
+            if r.detail:
+                details.add(r.detail)
+            groups[key] = (count + 1, nbytes + r.nbytes, details)
+        rows = [key + (count, nbytes, sorted(details)) for key, (count, nbytes, details) in groups.items()]
+        return sorted(rows, key=lambda row: -row[5])
+
+    def summary(self, top=20):
+        """
+        Human readable report of largest call sites.
+        """
+        lines = ['{:d} allocations ({:d} bytes), {:d} promotions'.format(
+            len(self.allocations), self.total_bytes, len(self.promotions))]
+        for kind, filename, lineno, function, count, nbytes, details in self.by_site()[:top]:
+            lines.append('  {:<9s} {:>12d} B {:>5d}x  {}:{:d} ({}) {}'.format(
+                kind, nbytes, count, filename, lineno, function, '; '.join(details)))
+        return '\n'.join(lines)
+
+
+def main():
+    x = np.linspace(0, 100, 1000001)
+    c = curve.Curve(np.column_stack((x, np.sin(x))))
+    domain = np.linspace(1, 99, 500000)
+    with CopyAudit() as audit:
+        c.change_domain(domain)
+        c.rescale(2)
+        curve.Curve(np.column_stack((x, x)), dtype=int).rescale(1.5)
+    print(audit.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Command-line batch processor of measurement files.
+
+Every file is loaded and passed through a pipeline of stages
+(rebin, smooth, subtract background, normalize, metrics), each
+enabled by its option. Files are processed on a pool of worker processes
+and results are appended to a JSON Lines file, one line per input file,
+as soon as they are ready. Lines of files processed successfully in a
+previous run are read with --resume and those files are skipped,
+so an interrupted run can be continued. Throughput (files/s, points/s)
+and time spent in every stage is reported at the end.
+
+Example::
+
+    beprof data/ -o results.jsonl --step 0.1 --smooth 5 --normalize 2 --workers 4
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from beprof import loader
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('load', 'rebin', 'smooth', 'background', 'normalize', 'metrics')
+
+# configuration of current process, set by _init_worker()
+_config = {}
+
+
+def find_files(paths, pattern='*', recursive=False):
+    """
+    Lists files given directly or found in directories
+    (names matching pattern), sorted within each directory.
+    """
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        if recursive:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, f) for f in sorted(fnmatch.filter(files, pattern)))
+        else:
+            found.extend(os.path.join(path, f) for f in sorted(fnmatch.filter(os.listdir(path), pattern))
+                         if os.path.isfile(os.path.join(path, f)))
+    return found
+
+
+def _finite(value):
+    """
+    Value as float, None if it is not finite (NaN and infinity are not valid JSON).
+    """
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def metrics(p):
+    """
+    Dictionary with basic parameters of a profile,
+    undefined (not finite) values are None.
+    """
+    i = int(np.argmax(p.y))
+    result = {'points': len(p), 'x_max': _finite(p.x[i]), 'y_max': _finite(p.y[i]),
+              'integral': _finite(p.integral())}
+    try:
+        result['fwhm'] = _finite(p.fwhm)
+    except (ValueError, IndexError):
+        result['fwhm'] = None
+    return result
+
+
+def _init_worker(config):
+    global _config
+    _config = dict(config)
+    if config.get('background'):
+        _config['background_curve'] = loader.load_curve(config['background'], config['x_col'], config['y_col'],
+                                                        config['delimiter'], config['skiprows'])
+
+
+def process_file(path):
+    """
+    Runs pipeline configured with _init_worker() on one file.
+
+    :return: dictionary (result record) with file path, status,
+        number of points, metrics and time of each stage in seconds
+    """
+    config = _config
+    record = {'file': path, 'timing': {}}
+    timing = record['timing']
+    stage = 'load'
+    try:
+        start = time.time()
+        p = loader.load_curve(path, config['x_col'], config['y_col'], config['delimiter'], config['skiprows'])
+        record['points'] = len(p)
+        timing['load'] = time.time() - start
+        if config.get('step'):
+            stage, start = 'rebin', time.time()
+            p = p.rebinned(config['step'])
+            timing[stage] = time.time() - start
+        if config.get('smooth'):
+            stage, start = 'smooth', time.time()
+            p.smooth(config['smooth'])
+            timing[stage] = time.time() - start
+        if config.get('background'):
+            stage, start = 'background', time.time()
+            p.subtract(config['background_curve'])
+            timing[stage] = time.time() - start
+        if config.get('normalize'):
+            stage, start = 'normalize', time.time()
+            p.normalize(config['normalize'])
+            timing[stage] = time.time() - start
+        stage, start = 'metrics', time.time()
+        record['metrics'] = metrics(p)
+        timing[stage] = time.time() - start
+        record['status'] = 'ok'
+    except Exception as e:
+        logger.error('Processing %(path)s failed at %(stage)s stage: %(e)s', {"path": path, "stage": stage, "e": e})
+        record['status'] = 'error'
+        record['error'] = '{}: {}'.format(stage, e)
+    return record
+
+
+def completed_files(output):
+    """
+    Set of files with successful result records in output file.
+    Incomplete last line (i.e. of interrupted run) is ignored.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok':
+                done.add(record['file'])
+    return done
+
+
+def _needs_newline(output):
+    """
+    True if output file is not empty and doesn't end with a newline
+    (i.e. last line was interrupted).
+    """
+    if not os.path.exists(output):
+        return False
+    with open(output, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+class Report(object):
+    """
+    Accumulates throughput and per-stage timing of processed records.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.files = 0
+        self.errors = 0
+        self.points = 0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, record):
+        self.files += 1
+        self.errors += record['status'] != 'ok'
+        self.points += record.get('points', 0)
+        for stage, seconds in record['timing'].items():
+            self.stages[stage] += seconds
+
+    def summary(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        lines = ['{:d} files ({:d} failed), {:d} points in {:.2f} s: {:.1f} files/s, {:.0f} points/s'.format(
+            self.files, self.errors, self.points, elapsed, self.files / elapsed, self.points / elapsed)]
+        total = sum(self.stages.values()) or 1.0
+        for stage in STAGES:
+            if self.stages[stage]:
+                lines.append('  {:<10s} {:8.3f} s {:5.1f}%'.format(stage, self.stages[stage],
+                                                                   100.0 * self.stages[stage] / total))
+        return '\n'.join(lines)
+
+
+def run(files, output, config, workers=1, resume=False, progress_every=0, stream=sys.stderr):
+    """
+    Processes files and appends result records to output (JSON Lines).
+
+    :param files: list of paths
+    :param output: path of output file
+    :param config: pipeline configuration (dictionary of parsed options)
+    :param workers: number of worker processes (0 or None for number of CPUs)
+    :param resume: skip files with successful records already in output
+    :param progress_every: print report every that many files (0 - only at the end)
+    :param stream: file-like object for reports
+    :return: Report object
+    """
+    if resume:
+        done = completed_files(output)
+        logger.info('Resuming, %(n)s files already processed', {"n": len(done)})
+        files = [f for f in files if f not in done]
+    workers = workers or multiprocessing.cpu_count()
+    report = Report()
+    pool = None
+    if workers > 1 and len(files) > 1:
+        pool = multiprocessing.Pool(workers, _init_worker, (config,))
+        # small chunks keep output streaming, while limiting inter-process overhead
+        records = pool.imap_unordered(process_file, files, chunksize=max(1, min(16, len(files) // (4 * workers))))
+    else:
+        _init_worker(config)
+        records = (process_file(f) for f in files)
+    try:
+        newline = resume and _needs_newline(output)
+        with open(output, 'a' if resume else 'w') as out:
+            if newline:
+                # terminate incomplete last line of interrupted run
+                out.write('\n')
+            for record in records:
+                out.write(json.dumps(record, sort_keys=True) + '\n')
+                # flushed, so that interrupted run can be resumed
+                out.flush()
+                report.add(record)
+                if progress_every and report.files % progress_every == 0:
+                    stream.write(report.summary() + '\n')
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    stream.write(report.summary() + '\n')
+    return report
+
+
+def parser():
+    p = argparse.ArgumentParser(prog='beprof', description='Batch processing of beam profile measurements.')
+    p.add_argument('paths', nargs='+', help='measurement files or directories')
+    p.add_argument('-o', '--output', default='beprof_results.jsonl', help='output file (JSON Lines)')
+    p.add_argument('--pattern', default='*', help='file name pattern used in directories')
+    p.add_argument('-r', '--recursive', action='store_true', help='search directories recursively')
+    p.add_argument('--x-col', type=int, default=0, help='column with x values')
+    p.add_argument('--y-col', type=int, default=1, help='column with y values')
+    p.add_argument('--delimiter', default=None, help='column separator (default: whitespace)')
+    p.add_argument('--skiprows', type=int, default=0, help='number of header lines')
+    p.add_argument('--step', type=float, help='rebin with given step')
+    p.add_argument('--smooth', type=int, help='median filter window')
+    p.add_argument('--background', help='file with background curve subtracted from every profile')
+    p.add_argument('--normalize', type=float, help='normalize to mean over [-dt, dt]')
+    p.add_argument('-j', '--workers', type=int, default=1, help='number of worker processes (0 for all CPUs)')
+    p.add_argument('--resume', action='store_true', help='skip files already processed into output')
+    p.add_argument('--progress', type=int, default=0, help='report progress every N files')
+    p.add_argument('-v', '--verbose', action='store_true', help='log progress of every operation')
+    return p
+
+
+def main(args=None):
+    options = parser().parse_args(args)
+    logging.basicConfig(level=logging.INFO if options.verbose else logging.WARNING)
+    config = dict((k, getattr(options, k)) for k in ('x_col', 'y_col', 'delimiter', 'skiprows', 'step',
+                                                     'smooth', 'background', 'normalize'))
+    files = find_files(options.paths, options.pattern, options.recursive)
+    report = run(files, options.output, config, options.workers, options.resume, options.progress)
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
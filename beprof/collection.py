@@ -0,0 +1,176 @@
+import numpy as np
+import copy
+import time
+import logging
+
+from beprof import profile
+
+logger = logging.getLogger(__name__)
+
+
+class CurveCollection(object):
+    """
+    Many curves packed into one (total, 2) buffer, or (total, 3) buffer
+    if all curves have uncertainty channel (see Curve.sigma).
+
+    Points of i-th curve are rows offsets[i]:offsets[i + 1] of the buffer,
+    so per-curve quantities (mean around center, maximum, integral)
+    are calculated for all curves with single segmented reductions
+    (np.add.reduceat and similar) and normalization or rescaling
+    is one in-place division over the whole buffer, instead of one
+    Python call per curve. Curves are available as views of the buffer.
+
+    >>> from beprof.profile import Profile
+    >>> cc = CurveCollection([Profile([[-1, 2], [0, 4], [1, 2]]), Profile([[-2, 1], [0, 5], [2, 1], [4, 3]])])
+    >>> print(cc.factors('max'))
+    [4. 5.]
+    >>> print(cc.normalize(dt=1.5))
+    [2.66666667 5.        ]
+    >>> print(cc[1].y)
+    [0.2 1.  0.2 0.6]
+
+    :param curves: iterable of Curve objects (none of them empty,
+        either all or none of them with sigma channel)
+    :param curve_class: class of views returned by indexing, defaults to class of first curve
+    """
+
+    def __init__(self, curves, curve_class=None):
+        curves = list(curves)
+        lengths = [len(c) for c in curves]
+        if 0 in lengths:
+            raise ValueError("Collection cannot contain empty curves.")
+        columns = set(np.shape(c)[1] for c in curves)
+        if len(columns) > 1:
+            raise ValueError("Either all or none of curves must have sigma channel.")
+        self.offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.intp))).astype(np.intp)
+        self.data = np.empty((int(self.offsets[-1]), columns.pop() if columns else 2), dtype=np.float64)
+        for c, start, stop in zip(curves, self.offsets[:-1], self.offsets[1:]):
+            self.data[start:stop] = c
+        self.metadata = [copy.deepcopy(c.metadata) for c in curves]
+        if curve_class is None:
+            curve_class = type(curves[0]) if curves else profile.Profile
+        self.curve_class = curve_class
+        logger.info('Packed %(n)s curves of %(p)s points into %(name)s',
+                    {"n": len(curves), "p": self.data.shape[0], "name": self.__class__.__name__})
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """
+        View of i-th curve (modifications change the collection).
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError("Curve index out of range.")
+        i %= len(self)
+        obj = self.data[self.offsets[i]:self.offsets[i + 1]].view(self.curve_class)
+        obj.metadata = self.metadata[i]
+        return obj
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @property
+    def sigma(self):
+        return self.data[:, 2] if self.data.shape[1] > 2 else None
+
+    def _reduce(self, ufunc, values):
+        return ufunc.reduceat(values, self.offsets[:-1])
+
+    def factors(self, by='mean', dt=None):
+        """
+        Per-curve values used for normalization:
+        'mean' - average y of points with |x| <= dt (as in Profile.normalize()),
+        'max' - maximal y, 'integral' - area under curve (trapezoidal rule).
+
+        :param by: 'mean', 'max' or 'integral'
+        :param dt: half-width of central region for 'mean'
+        :return: np.array with one value per curve (NaN for 'mean' without points in region)
+        """
+        if len(self) == 0:
+            return np.zeros(0)
+        x, y = self.x, self.y
+        if by == 'mean':
+            if dt is None or dt <= 0:
+                raise ValueError("Expected positive dt")
+            inside = np.abs(x) <= dt
+            sums = self._reduce(np.add, np.where(inside, y, 0.))
+            counts = self._reduce(np.add, inside.astype(np.intp))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return sums / counts
+        if by == 'max':
+            return self._reduce(np.maximum, y)
+        if by == 'integral':
+            # area of interval starting at each point, zero for last point of every curve
+            areas = np.zeros(len(x))
+            areas[:-1] = 0.5 * (y[1:] + y[:-1]) * np.diff(x)
+            areas[self.offsets[1:] - 1] = 0.
+            return self._reduce(np.add, areas)
+        raise ValueError("Unknown normalization: {}".format(by))
+
+    def rescale(self, factors):
+        """
+        Divides y of every curve by its factor, in place (one pass over buffer).
+        Uncertainty (if present) is divided by absolute value of factor.
+
+        :param factors: scalar or array with one value per curve
+        """
+        factors = np.asarray(factors, dtype=np.float64)
+        if factors.ndim != 0:
+            if factors.shape != (len(self),):
+                raise ValueError("Expected one factor per curve.")
+            factors = np.repeat(factors, self.lengths)
+        self.data[:, 1] /= factors
+        if self.data.shape[1] > 2:
+            self.data[:, 2] /= np.abs(factors)
+
+    def normalize(self, dt=None, by='mean'):
+        """
+        Normalizes all curves in place, see factors() for methods.
+        Nothing is modified if factor of any curve is undefined.
+
+        :return: np.array of applied factors
+        """
+        factors = self.factors(by, dt)
+        bad = np.flatnonzero(~np.isfinite(factors) | (factors == 0))
+        if bad.size:
+            logger.error('Normalization factors of curves %(bad)s are undefined', {"bad": bad[:10]})
+            raise ValueError("Scaling factor error for curves {}".format(bad[:10].tolist()))
+        self.rescale(factors)
+        return factors
+
+
+def main():
+    rng = np.random.RandomState(0)
+    x = np.linspace(-10, 10, 201)
+    profiles = [profile.Profile(np.column_stack((x, a * np.exp(-x ** 2 / 8)))) for a in rng.uniform(1, 5, 100000)]
+
+    start = time.time()
+    for p in profiles[:10000]:
+        p.normalize(1.)
+    print('Profile.normalize(): {:.0f} profiles/s'.format(10000 / (time.time() - start)))
+    start = time.time()
+    cc = CurveCollection(profiles)
+    print('packing: {:.0f} profiles/s'.format(len(profiles) / (time.time() - start)))
+    for by in ('mean', 'max', 'integral'):
+        start = time.time()
+        cc.normalize(1., by=by)
+        print('CurveCollection.normalize(by={!r}): {:.0f} profiles/s'.format(
+            by, len(profiles) / (time.time() - start)))
+
+
+if __name__ == '__main__':
+    main()
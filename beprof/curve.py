@@ -1,17 +1,53 @@
 import numpy as np
 import math
 import copy
+import time
 from beprof import functions
+from beprof import decimate
+from beprof import pyramid
+from beprof import rolling
+from beprof import memo
+from beprof import parallel
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _invalidate(obj):
+    """
+    Drops cache of obj and of all objects obj is a view of.
+    """
+    while obj is not None:
+        obj.__dict__.pop('_cache', None)
+        obj = obj.__dict__.get('_owner')
+
+
+def _owner(obj, view):
+    """
+    Object view was created from, if it is a Curve (or DataSet) sharing
+    memory with view, None otherwise (i.e. for copies and ufunc results).
+    """
+    if isinstance(obj, (Curve, DataSet)) and np.may_share_memory(view, obj):
+        return obj
+    return None
+
+
 class DataSet(np.ndarray):
     """
     1-D data set, used in type casting for X and Y component of Curve
+
+    Writes into a data set obtained from Curve (i.e. c.y[0] = 1 or
+    c.y += 1) invalidate cache of the curve.
     """
-    pass
+
+    def __array_finalize__(self, obj):
+        if obj is None:
+            return
+        self._owner = _owner(obj, self)
+
+    def __setitem__(self, key, value):
+        _invalidate(self)
+        super(DataSet, self).__setitem__(key, value)
 
 
 class Curve(np.ndarray):
@@ -30,10 +66,25 @@ class Curve(np.ndarray):
         2) When object (obj) already exists, one can use dictionary methods
            to add a field to obj.metadata dict.
 
+    Optional third column of points holds uncertainty (standard deviation)
+    of y, available as sigma. It is stored in the same buffer as x and y
+    and propagated by rescale(), evaluate_at_x(), change_domain(),
+    rebinned() and subtract(), together with y in the same interpolation.
+
+    Some methods keep precomputed helper data (i.e. lookup tables)
+    in a per-object cache. The cache is cleared when points are modified
+    through item assignment, .x/.y/.sigma setters, element writes into
+    .x/.y/.sigma, in-place operators or Curve methods. Writes through views
+    (i.e. crop() results) clear cache of the viewed curve as well.
+    The cache is not aware of writes made in any other way - through plain
+    numpy views (np.asarray(c), out= arguments of ufuncs), through the
+    object a curve is a view of, or to its memory shared with other
+    objects. invalidate_cache() must be called after such writes.
+
     Raises:
         IndexError: this can happen when user is trying to create new Curve
                     object but uses incorrect array of points to initialise it.
-                    Input array should be 2D (shape: (X, 2)).
+                    Input array should be 2D (shape: (X, 2) or (X, 3) with sigma).
         ValueError: in change domain function: when the old domain
                     does not include the new one.
     """
@@ -44,10 +95,10 @@ class Curve(np.ndarray):
         # e.g. np.shape('whatever') returns ()
         shape = np.shape(input_array)
         logger.info('Creating Curve object of shape %(sh)s metadata is: %(meta)s', {"sh": shape, "meta": meta})
-        if shape[1] != 2:
+        if shape[1] not in (2, 3):
             logger.error('Creating Curve object failed. Input array must be an 2D array\n'
-                         'and np.shape(input_array_[1] must be 2.')
-            raise IndexError('Invalid format of input_array - ' 'shape is %s, must be (X, 2)' % str(shape))
+                         'and np.shape(input_array_[1] must be 2 (or 3 with sigma).')
+            raise IndexError('Invalid format of input_array - ' 'shape is %s, must be (X, 2) or (X, 3)' % str(shape))
 
         obj = np.asarray(input_array, dtype=dtype, order=order).view(cls)
         if meta is None:
@@ -60,6 +111,58 @@ class Curve(np.ndarray):
         if obj is None:
             return
         self.metadata = getattr(obj, 'metadata', {})
+        self._owner = _owner(obj, self)
+
+    @classmethod
+    def _from_buffers(cls, x, y, metadata=None, sigma=None):
+        """
+        Trusted low-overhead constructor for code which built x and y itself.
+
+        Columns are written directly into a new float64 buffer, without
+        shape checks, dtype conversion of whole input and logging.
+        Metadata dictionary is used as is (not copied), so caller must pass
+        a dictionary the new object may own.
+
+        >>> c = Curve._from_buffers(np.arange(3.), np.ones(3), {'name': 'fast'})
+        >>> print(c.y, c.metadata)
+        [1. 1. 1.] {'name': 'fast'}
+
+        :param x: 1-D array of x values
+        :param y: 1-D array of y values (same length as x, or scalar)
+        :param metadata: dictionary of metadata, empty if None
+        :param sigma: optional uncertainty of y (adds sigma channel)
+        :return: new object of class cls
+        """
+        points = np.empty((len(x), 2 if sigma is None else 3))
+        points[:, 0] = x
+        points[:, 1] = y
+        if sigma is not None:
+            points[:, 2] = sigma
+        obj = points.view(cls)
+        obj.metadata = {} if metadata is None else metadata
+        return obj
+
+    def __setitem__(self, key, value):
+        self.invalidate_cache()
+        super(Curve, self).__setitem__(key, value)
+
+    def _cached(self, key, build):
+        """
+        Returns object stored in cache under key, calling build()
+        to create it if cache does not contain it yet.
+        """
+        # cache lives in instance __dict__, views and copies start with an empty one
+        cache = self.__dict__.setdefault('_cache', {})
+        if key not in cache:
+            cache[key] = build()
+        return cache[key]
+
+    def invalidate_cache(self):
+        """
+        Drops all precomputed helper data kept by this object
+        (and by the curve it is a view of).
+        """
+        _invalidate(self)
 
     @property
     def x(self):
@@ -77,6 +180,40 @@ class Curve(np.ndarray):
     def y(self, value):
         self[:, 1] = value
 
+    @property
+    def sigma(self):
+        """
+        Uncertainty of y (third column of points), None if curve has no sigma channel.
+        """
+        if self.shape[1] < 3:
+            return None
+        return self[:, 2].view(DataSet)
+
+    @sigma.setter
+    def sigma(self, value):
+        if self.shape[1] < 3:
+            raise ValueError("Curve has no sigma channel, use with_sigma() to add it")
+        self[:, 2] = value
+
+    def with_sigma(self, sigma):
+        """
+        New object with the same points and given uncertainty of y.
+        Points of the result are float64 (also for integer curves),
+        metadata is copied and other attributes (i.e. Profile.axis) are kept.
+
+        >>> c = Curve([[0, 1], [1, 2]], dtype=np.int64).with_sigma([0.1, 0.2])
+        >>> print(c.shape, c.sigma)
+        (2, 3) [0.1 0.2]
+
+        :param sigma: scalar or array of uncertainties (one per point)
+        :return: object of the same type as self with sigma channel
+        """
+        result = self._from_buffers(self.x, self.y, sigma=sigma)
+        # copies attributes of subclasses, metadata is not shared
+        result.__array_finalize__(self)
+        result.metadata = copy.deepcopy(self.metadata)
+        return result
+
     def rescale(self, factor=1.0, allow_cast=True):
         """
         Rescales self.y by given factor, if allow_cast is set to True
@@ -101,28 +238,140 @@ class Curve(np.ndarray):
         >>> print(c.y)
         [  0  -5 -10]
 
+        Uncertainty is rescaled as well:
+        >>> c = Curve([[0, 4, 0.5], [1, 8, 1.0]])
+        >>> c.rescale(-2)
+        >>> print(c.y, c.sigma)
+        [-2. -4.] [0.25 0.5 ]
+
         :param factor: rescaling factor, should be a number
         :param allow_cast: bool - allow division not in place
         """
         try:
             self.y /= factor
+            if self.shape[1] > 2:
+                self[:, 2] /= abs(factor)
         except TypeError as e:
             logger.warning("Division in place is impossible: %s", e)
             if allow_cast:
                 self.y = self.y / factor
+                if self.shape[1] > 2:
+                    self.sigma = self.sigma / abs(factor)
             else:
                 logger.error("allow_cast flag set to True should help")
                 raise
 
-    def smooth(self, window=3):
-        self.y = functions.medfilt(self.y, window)
+    @memo.memoized
+    def smooth(self, window=3, method='median', width=None, kernel=None, edge='reflect', workers=1):
+        """
+        Smooths self.y in place.
+
+        By default a median filter of given window (number of points)
+        is used. Method 'gaussian' convolves data with Gaussian kernel
+        of given width (standard deviation, in units of x), method 'kernel'
+        with explicit odd-length kernel sampled with the same step as data.
+        Convolution uses FFT for wide kernels (see functions.convolve()),
+        so its cost does not grow with kernel width. If domain is not
+        uniformly sampled, data is resampled on a uniform grid,
+        smoothed and interpolated back.
+
+        Uncertainty channel (if present) is propagated by convolution
+        methods as for a weighted sum of independent values: variance
+        is convolved with squared kernel. Median filter is not linear,
+        sigma is left unchanged by it.
+
+        >>> c = Curve([[0, 0], [1, 0], [2, 3], [3, 0], [4, 0]])
+        >>> c.smooth(method='kernel', kernel=[1 / 3., 1 / 3., 1 / 3.], edge='edge')
+        >>> print(c.y)
+        [0. 1. 1. 1. 0.]
+
+        :param window: median filter window, must be odd
+        :param method: 'median', 'gaussian' or 'kernel'
+        :param width: Gaussian kernel standard deviation for 'gaussian' method
+        :param kernel: kernel for 'kernel' method
+        :param edge: np.pad() mode used to extend data at edges
+        :param workers: number of threads used by median filter
+            (None for number of CPUs), see parallel.medfilt()
+        :param cache: TransformCache to use, True/False to force/disable caching,
+            None for globally enabled cache (see memo.memoized())
+        """
+        if method == 'median':
+            self.y = parallel.medfilt(np.asarray(self.y), window, workers)
+            return
+        if method == 'gaussian':
+            if width is None:
+                raise ValueError("width is required for gaussian smoothing")
+        elif method == 'kernel':
+            if kernel is None:
+                raise ValueError("kernel is required for kernel smoothing")
+        else:
+            raise ValueError("Unknown smoothing method: {}".format(method))
+        logger.info('Running %(name)s.smooth(method=%(m)s, width=%(w)s, edge=%(e)s)',
+                    {"name": self.__class__, "m": method, "w": width, "e": edge})
+        if len(self) < 2:
+            return
+
+        x = np.asarray(self.x, dtype=np.float64)
+        variance = None if self.sigma is None else np.asarray(self.sigma, dtype=np.float64) ** 2
+        step = functions.uniform_step(x)
+        if step is None:
+            # resample on uniform grid with typical spacing of original points
+            order = np.argsort(x, kind='mergesort')
+            step = float(np.median(np.diff(x[order])))
+            if step <= 0:
+                raise ValueError("Cannot smooth curve with repeated x values")
+            grid = np.linspace(x[order[0]], x[order[-1]], int(round((x[order[-1]] - x[order[0]]) / step)) + 1)
+            step = grid[1] - grid[0]
+            values = np.interp(grid, x[order], np.asarray(self.y)[order])
+            if variance is not None:
+                variance = np.interp(grid, x[order], variance[order])
+        else:
+            grid, values = None, self.y
+        if method == 'gaussian':
+            kernel = functions.gaussian_kernel(width, step)
+        smoothed = functions.convolve(values, kernel, edge=edge)
+        if variance is not None:
+            variance = functions.convolve(variance, np.asarray(kernel, dtype=np.float64) ** 2, edge=edge)
+        if grid is not None:
+            smoothed = np.interp(x, grid, smoothed)
+            if variance is not None:
+                variance = np.interp(x, grid, variance)
+        self.y = smoothed
+        if variance is not None:
+            # FFT convolution may leave tiny negative values
+            self.sigma = np.sqrt(np.maximum(variance, 0.))
+
+    def hampel(self, window=7, n_sigmas=3.0):
+        """
+        Removes spikes (i.e. detector glitches) from self.y in place using
+        Hampel filter (see rolling.hampel()): points differing from rolling
+        median by more than n_sigmas robust standard deviations are replaced
+        by the median. Other points are not modified.
+
+        >>> c = Curve([[0, 1], [1, 1.1], [2, 0.9], [3, 25], [4, 1], [5, 1.05], [6, 0.95]])
+        >>> print(c.hampel(window=5).nonzero()[0])
+        [3]
+        >>> print(c.y)
+        [1.   1.1  0.9  1.05 1.   1.05 0.95]
+
+        :param window: odd window length (number of points)
+        :param n_sigmas: threshold in units of robust standard deviation
+        :return: boolean np.array marking replaced points
+        """
+        logger.info('Running %(name)s.hampel(window=%(w)s, n_sigmas=%(n)s)',
+                    {"name": self.__class__, "w": window, "n": n_sigmas})
+        filtered, outliers = rolling.hampel(self.y, window, n_sigmas)
+        if np.any(outliers):
+            self.y = filtered
+        return outliers
 
     def y_at_x(self, x):
         if x == self.x[0]:
             return x
         return np.interp(x, self.x, self.y, left=np.nan, right=np.nan)
 
-    def change_domain(self, domain):
+    @memo.memoized
+    def change_domain(self, domain, workers=1):
         """
         Creating new Curve object in memory with domain passed as a parameter.
         New domain must include in the original domain.
@@ -134,10 +383,21 @@ class Curve(np.ndarray):
             .change_domain([1, 2, 8, 9]).y)
         [1. 2. 2. 1.]
 
+        Uncertainty (if present) is interpolated in the same pass,
+        see functions.interp_sigma():
+        >>> print(Curve([[0, 0, 0.3], [2, 2, 0.4]]).change_domain([0, 1]).sigma)
+        [0.3  0.25]
+
         :param domain: set of points representing new domain.
-            Might be a list or np.array.
+            Might be a list, np.array or a scalar (single point).
+        :param workers: number of threads used for interpolation
+            (None for number of CPUs), see parallel.interp(),
+            interpolation with sigma is done in calling thread
+        :param cache: TransformCache to use, True/False to force/disable caching,
+            None for globally enabled cache (see memo.memoized())
         :return: new Curve object with domain set by 'domain' parameter
         """
+        domain = np.atleast_1d(domain)
         logger.info('Running %(name)s.change_domain() with new domain range:[%(ymin)s, %(ymax)s]',
                     {"name": self.__class__, "ymin": np.min(domain), "ymax": np.max(domain)})
 
@@ -148,17 +408,13 @@ class Curve(np.ndarray):
                                                   "ymin": np.min(domain), "ymax": np.max(domain)})
             raise ValueError('in change_domain():' 'the old domain does not include the new one')
 
-        y = np.interp(domain, self.x, self.y)
-        # We need to join together domain and values (y) because we are recreating Curve object
-        # (we pass it as argument to self.__class__)
-        # np.dstack((arrays), axis=1) joins given arrays like np.dstack() but it also nests the result
-        # in additional list and this is the reason why we use [0] to remove this extra layer of list like this:
-        # np.dstack([[0, 5, 10], [0, 0, 0]]) gives [[[ 0,  0], [ 5,  0], [10,  0]]] so use dtack()[0]
-        # to get this: [[0,0], [5, 5], [10, 0]]
-        # which is a 2 dimensional array and can be used to create a new Curve object
-        obj = self.__class__(np.dstack((domain, y))[0], **self.__dict__['metadata'])
-        return obj
+        if self.sigma is not None:
+            y, sigma = functions.interp_sigma(domain, self.x, self.y, self.sigma)
+            return self._from_buffers(domain, y, copy.deepcopy(self.metadata), sigma)
+        y = parallel.interp(domain, self.x, self.y, workers=workers)
+        return self._from_buffers(domain, y, copy.deepcopy(self.metadata))
 
+    @memo.memoized
     def rebinned(self, step=0.1, fixp=0):
         """
         Provides effective way to compute new domain basing on
@@ -174,6 +430,8 @@ class Curve(np.ndarray):
 
         :param step: step size of new domain
         :param fixp: fixed point one of the points in new domain
+        :param cache: TransformCache to use, True/False to force/disable caching,
+            None for globally enabled cache (see memo.memoized())
         :return: new Curve object with domain specified by
             step and fixp parameters
         """
@@ -198,7 +456,60 @@ class Curve(np.ndarray):
         domain = [fixp + n * step for n in range(int(count_start), int(count_stop) + 1)]
         return self.change_domain(domain)
 
-    def evaluate_at_x(self, arg, def_val=0):
+    def crop(self, a, b, interpolate=False):
+        """
+        Part of the curve with x in [a, b]. Domain must be sorted.
+        Range is found with binary search and the result is a view
+        of self - it shares points buffer and metadata with self, so
+        no data is copied and changes are visible in both objects.
+
+        If interpolate is True and a or b (clipped to domain) is not
+        one of the points, interpolated end points are added. Only in
+        this case a new buffer is allocated (metadata is still shared).
+
+        >>> c = Curve([[0, 0], [1, 1], [2, 2], [3, 1], [4, 0]], name='scan')
+        >>> part = c.crop(0.5, 3)
+        >>> print(part.x, part.metadata)
+        [1. 2. 3.] {'name': 'scan'}
+        >>> part.y = 7
+        >>> print(c.y)
+        [0. 7. 7. 7. 0.]
+        >>> print(c.crop(0.5, 3.5, interpolate=True))
+        shape: (5, 2)
+        X : [0.500,3.500]
+        Y : [3.500000,7.000000]
+        Metadata : {'name': 'scan'}
+
+        :param a: start of x range
+        :param b: end of x range
+        :param interpolate: add interpolated points at a and b
+        :return: object of the same type as self
+        """
+        x = self.x
+        lo = np.searchsorted(x, a, side='left')
+        hi = max(np.searchsorted(x, b, side='right'), lo)
+        part = self[lo:hi]
+        if not interpolate or len(self) == 0:
+            return part
+        a, b = max(a, x[0]), min(b, x[-1])
+        if a > b:
+            return part
+        head = [] if (hi > lo and x[lo] == a) else [a]
+        tail = [] if (hi > lo and x[hi - 1] == b) or (not part.size and a == b) else [b]
+        ends = np.asarray(head + tail, dtype=np.float64)
+        values = self.evaluate_at_x(ends, return_sigma=True)
+        if self.sigma is None:
+            values = values[:1]
+        result = np.empty((len(part) + len(ends), self.shape[1]), dtype=self.dtype).view(self.__class__)
+        result.__array_finalize__(self)
+        result[:len(head)] = np.column_stack((ends,) + values)[:len(head)]
+        result[len(head):len(head) + len(part)] = part
+        result[len(head) + len(part):] = np.column_stack((ends,) + values)[len(head):]
+        return result
+
+    xslice = crop
+
+    def evaluate_at_x(self, arg, def_val=0, workers=1, return_sigma=False):
         """
         Returns Y value at arg of self. Arg can be a scalar,
         but also might be np.array or other iterable
@@ -216,14 +527,207 @@ class Curve(np.ndarray):
             [-1, 1, 2 ,3, 5], 100)
         array([100.,   1.,   2.,   3., 100.])
 
+        Get uncertainty of interpolated values as well (zero for def_val):
+        >>> y, sigma = Curve([[0, 0, 0.1], [2, 2, 0.1]]).evaluate_at_x([1, 3], return_sigma=True)
+        >>> print(y, np.round(sigma, 4))
+        [1. 0.] [0.0707 0.    ]
+
         :param arg: x-value to calculate Y (may be an array or list as well)
         :param def_val: default value to return if can't interpolate at arg
+        :param workers: number of threads used for large arg
+            (None for number of CPUs), see parallel.interp()
+        :param return_sigma: return uncertainty of values as well
+            (zeros for curve without sigma channel)
         :return: np.array of Y-values at arg. If arg is a scalar,
-            will return scalar as well
+            will return scalar as well. Tuple (values, uncertainties)
+            if return_sigma is set
         """
-        y = np.interp(arg, self.x, self.y, left=def_val, right=def_val)
+        if self.sigma is not None:
+            y, sigma = functions.interp_sigma(arg, self.x, self.y, self.sigma, left=def_val, right=def_val)
+            return (y, sigma) if return_sigma else y
+        y = parallel.interp(arg, self.x, self.y, left=def_val, right=def_val, workers=workers)
+        if return_sigma:
+            return y, np.zeros_like(y)[()]
         return y
 
+    def _integral_tables(self):
+        logger.info('Building cumulative integral tables for %(name)s of %(n)s points',
+                    {"name": self.__class__, "n": len(self)})
+        x = np.asarray(self.x, dtype=np.float64)
+        y = np.asarray(self.y, dtype=np.float64)
+        if np.any(x[1:] < x[:-1]):
+            order = np.argsort(x, kind='mergesort')
+            x, y = x[order], y[order]
+        else:
+            x, y = x.copy(), y.copy()
+        trapz = np.zeros_like(x)
+        np.cumsum(0.5 * (y[1:] + y[:-1]) * np.diff(x), out=trapz[1:])
+        sums = np.zeros(x.size + 1)
+        np.cumsum(y, out=sums[1:])
+        return x, y, trapz, sums
+
+    def cumulative_integral(self):
+        """
+        Cumulative integral of the curve calculated with trapezoidal rule,
+        value at i-th point is the area under curve between first and i-th point.
+        Result is cached, so that next calls (and integral() queries) are cheap,
+        it must not be modified.
+
+        >>> print(Curve([[0, 0], [1, 2], [2, 2], [4, 0]]).cumulative_integral())
+        [0. 1. 3. 5.]
+
+        :return: np.array of cumulative integral values (domain sorted by x)
+        """
+        return self._cached('integral', self._integral_tables)[2]
+
+    @staticmethod
+    def _antiderivative(tables, t):
+        x, y, trapz, _ = tables
+        t = np.clip(np.asarray(t, dtype=np.float64), x[0], x[-1])
+        if x.size < 2:
+            return np.zeros_like(t)
+        j = np.clip(np.searchsorted(x, t, side='right') - 1, 0, x.size - 2)
+        dx = t - x[j]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (y[j + 1] - y[j]) / (x[j + 1] - x[j])
+        y_t = np.where(dx > 0, y[j] + slope * dx, y[j])
+        return trapz[j] + 0.5 * dx * (y[j] + y_t)
+
+    def integral(self, a=None, b=None):
+        """
+        Area under curve between a and b (trapezoidal rule, linear
+        interpolation between points). Range is clipped to the domain of
+        curve. Uses cached cumulative integral, so each query costs
+        O(log N). Arguments might be arrays, the result is calculated
+        for all ranges at once.
+
+        >>> c = Curve([[0, 0], [1, 2], [2, 2], [4, 0]])
+        >>> print(c.integral())
+        5.0
+        >>> print(c.integral([0, 0.5, 1], [4, 1.5, 10]))
+        [5.   1.75 4.  ]
+
+        :param a: lower limit (or array of limits), start of domain if None
+        :param b: upper limit (or array of limits), end of domain if None
+        :return: integral value, array if a or b is an array
+        """
+        tables = self._cached('integral', self._integral_tables)
+        x = tables[0]
+        a = x[0] if a is None else a
+        b = x[-1] if b is None else b
+        return (self._antiderivative(tables, b) - self._antiderivative(tables, a))[()]
+
+    def integral_mean(self, a=None, b=None):
+        """
+        Mean value of curve over [a, b] range (clipped to domain),
+        calculated as integral divided by range length.
+
+        >>> print(Curve([[0, 0], [1, 2], [2, 2], [4, 0]]).integral_mean(0, 2))
+        1.5
+
+        :param a: lower limit (or array of limits), start of domain if None
+        :param b: upper limit (or array of limits), end of domain if None
+        :return: mean value, array if a or b is an array
+        """
+        tables = self._cached('integral', self._integral_tables)
+        x = tables[0]
+        a = np.clip(x[0] if a is None else a, x[0], x[-1])
+        b = np.clip(x[-1] if b is None else b, x[0], x[-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((self._antiderivative(tables, b) - self._antiderivative(tables, a)) / (b - a))[()]
+
+    def _points_average(self, a, b):
+        """
+        Average of y values of points with a <= x <= b, same as
+        np.average(self.y[(self.x >= a) & (self.x <= b)]) but using
+        cached cumulative sums instead of a mask over whole curve.
+        """
+        x, _, _, sums = self._cached('integral', self._integral_tables)
+        lo = np.searchsorted(x, a, side='left')
+        hi = np.searchsorted(x, b, side='right')
+        if hi <= lo:
+            # average of empty selection - NaN with a RuntimeWarning
+            return np.average(x[:0])
+        return (sums[hi] - sums[lo]) / (hi - lo)
+
+    def simplify(self, tolerance):
+        """
+        Creates new, smaller Curve object with almost collinear points
+        removed (Douglas-Peucker algorithm, see decimate.simplify_indices()).
+        evaluate_at_x() of the result differs from y of every original
+        point by at most tolerance. Domain must be sorted.
+
+        >>> c = Curve([[0, 0], [1, 1], [2, 2.01], [3, 3], [4, 2], [5, 1]])
+        >>> print(c.simplify(0.05))
+        shape: (3, 2)
+        X : [0.000,5.000]
+        Y : [0.000000,3.000000]
+        Metadata : {}
+
+        :param tolerance: maximal allowed interpolation error (units of y)
+        :return: new Curve object with subset of points of self
+        """
+        logger.info('Running %(name)s.simplify(tolerance=%(tol)s)', {"name": self.__class__, "tol": tolerance})
+        if np.any(np.diff(self.x) < 0):
+            raise ValueError("Curve domain must be sorted to simplify it.")
+        kept = decimate.simplify_indices(self.x, self.y, tolerance)
+        return self.__class__(self[kept], **self.metadata)
+
+    def decimate(self, n_points, method='lttb', x_range=None):
+        """
+        Creates new Curve object with at most n_points points for display
+        purposes. Method 'lttb' (largest triangle three buckets) preserves
+        visual shape, 'minmax' keeps minimal and maximal value in each
+        of equal width bins (pixels), so that spikes are never lost.
+        If x_range is given, only points inside it are used
+        (binary search on sorted domain), i.e. for zoomed views.
+
+        >>> c = Curve([[0, 0], [1, 1], [2, 0], [3, 5], [4, 0], [5, 1], [6, 0], [7, 0]])
+        >>> print(c.decimate(4).x)
+        [0. 3. 4. 7.]
+        >>> print(c.decimate(4, method='minmax', x_range=(2, 6)).x)
+        [2. 3. 6.]
+
+        :param n_points: maximal number of points of the result
+        :param method: 'lttb' or 'minmax'
+        :param x_range: optional (a, b) range of x
+        :return: new Curve object with subset of points of self
+        """
+        logger.info('Running %(name)s.decimate(n_points=%(n)s, method=%(m)s, x_range=%(r)s)',
+                    {"name": self.__class__, "n": n_points, "m": method, "r": x_range})
+        if method not in ('lttb', 'minmax'):
+            raise ValueError("Unknown decimation method: {}".format(method))
+        x = self.x
+        lo, hi = 0, len(self)
+        if x_range is not None:
+            lo, hi = np.searchsorted(x, x_range[0], side='left'), np.searchsorted(x, x_range[1], side='right')
+        part = self[lo:hi]
+        if method == 'lttb':
+            kept = decimate.lttb_indices(part.x, part.y, n_points)
+        else:
+            kept = decimate.minmax_indices(part.x, part.y, n_points, x_range)
+        return self.__class__(part[kept], **self.metadata)
+
+    def pyramid(self, factor=4):
+        """
+        Multi-resolution pyramid of the curve (see pyramid.Pyramid),
+        built on first call and kept in the object cache, so that
+        next calls are a dictionary lookup and queries for any x range
+        and resolution don't touch all points. Besides the levels of
+        pyramid nothing is stored. The pyramid is dropped (and rebuilt
+        by the next call) when points are modified, see Curve.
+
+        >>> c = Curve([[0, 0], [1, 1], [2, 0], [3, 5], [4, 0], [5, 1], [6, 0], [7, 0]])
+        >>> x, y_min, y_max, y_mean = c.pyramid(factor=2).query(2, 5, 2)
+        >>> print(y_max)
+        [5. 1.]
+
+        :param factor: number of blocks merged into one on each level
+        :return: pyramid.Pyramid object
+        """
+        return self._cached(('pyramid', factor), lambda: pyramid.Pyramid(self.x, self.y, factor))
+
+    @memo.memoized
     def subtract(self, curve2, new_obj=False):
         """
         Method that calculates difference between 2 curves
@@ -251,9 +755,16 @@ class Curve(np.ndarray):
         Exception: curve2 does not include self domain
 
 
+        Uncertainties of both curves (if present) are added in quadrature:
+        >>> print(Curve([[0, 1, 0.3], [1, 1, 0.3]]).subtract(\
+            Curve([[0, 1, 0.4], [1, 1, 0.4]]), new_obj=True).sigma)
+        [0.5 0.5]
+
         :param curve2: second object to calculate difference
         :param new_obj: if True, method is creating new object
             instead of modifying self
+        :param cache: TransformCache to use, True/False to force/disable caching,
+            None for globally enabled cache (see memo.memoized())
         :return: None if new_obj is False (but will modify self)
             or type(self) object containing the result
         """
@@ -270,8 +781,14 @@ class Curve(np.ndarray):
         # rather then modify existing one
         if new_obj:
             return functions.subtract(self, curve2.change_domain(self.x))
-        values = curve2.evaluate_at_x(self.x)
+        if self.sigma is None:
+            if curve2.sigma is not None:
+                logger.warning("Uncertainty of curve2 is dropped, self has no sigma channel (use new_obj=True)")
+            self.y = self.y - curve2.evaluate_at_x(self.x)
+            return None
+        values, sigma = curve2.evaluate_at_x(self.x, return_sigma=True)
         self.y = self.y - values
+        self.sigma = np.hypot(self.sigma, sigma)
         return None
 
     def __str__(self):
@@ -284,6 +801,24 @@ class Curve(np.ndarray):
         return ret
 
 
+def _invalidating(name):
+    method = getattr(np.ndarray, name)
+
+    def operator(self, other):
+        _invalidate(self)
+        return method(self, other)
+    operator.__name__ = name
+    return operator
+
+
+# in-place operators modify points without __setitem__
+for _name in ('__iadd__', '__isub__', '__imul__', '__idiv__', '__itruediv__', '__ifloordiv__', '__imod__',
+              '__ipow__', '__ilshift__', '__irshift__', '__iand__', '__ior__', '__ixor__'):
+    if hasattr(np.ndarray, _name):
+        setattr(DataSet, _name, _invalidating(_name))
+        setattr(Curve, _name, _invalidating(_name))
+
+
 def main():
     print('\nSubtract method :\n')
 
@@ -337,6 +872,21 @@ def main():
     print('Y: ', b.y)
     print('M: ', b.metadata)
 
+    print('\nConstruction of small curves:')
+    x = np.linspace(0, 1, 10)
+    y = x ** 2
+    points = np.column_stack((x, y))
+    c = Curve(points, name='scan', energy=150.)
+    n = 20000
+    for label, build in (('Curve(points, **meta)', lambda: Curve(points, **c.metadata)),
+                         ('Curve._from_buffers(x, y, meta)',
+                          lambda: Curve._from_buffers(x, y, copy.deepcopy(c.metadata))),
+                         ('change_domain(x)', lambda: c.change_domain(x))):
+        start = time.time()
+        for _ in range(n):
+            build()
+        print('{:32s} {:.2f} us'.format(label, (time.time() - start) / n * 1e6))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,208 @@
+import numpy as np
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def simplify_indices(x, y, tolerance, boundaries=None):
+    """
+    Douglas-Peucker simplification of polyline (x, y) with vertical error:
+    returns indices of points to keep, so that linear interpolation
+    between kept points differs from every original y by at most tolerance.
+
+    Instead of recursion, all segments are processed at once: in every
+    pass each segment which is not yet within tolerance is split
+    at the point of its largest error. Points in segments which are
+    within tolerance are dropped from further passes.
+
+    >>> x = np.arange(7.)
+    >>> print(simplify_indices(x, np.array([0., 1., 2., 3., 2., 1.01, 0.]), 0.05))
+    [0 3 6]
+
+    :param x: np.array of x values, increasing
+    :param y: np.array of y values
+    :param tolerance: maximal allowed interpolation error
+    :param boundaries: optional indices of points that are always kept
+        (i.e. first and last points of curves stored one after another)
+    :return: sorted np.array of indices of kept points
+    """
+    if tolerance < 0:
+        raise ValueError("Tolerance must be non-negative.")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return np.flatnonzero(keep)
+    keep[[0, -1]] = True
+    if boundaries is not None:
+        keep[boundaries] = True
+    cand = np.flatnonzero(~keep)
+    while cand.size:
+        kept = np.flatnonzero(keep)
+        pos = np.searchsorted(kept, cand)
+        start, end = kept[pos - 1], kept[pos]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # same formula as used by np.interp
+            slope = (y[end] - y[start]) / (x[end] - x[start])
+            err = np.fabs(slope * (x[cand] - x[start]) + y[start] - y[cand])
+        # NaN errors (repeated x, NaN in y) never pass the check
+        err[np.isnan(err)] = np.inf
+        # candidates are sorted, so points of each segment are contiguous
+        first = np.flatnonzero(np.concatenate(([True], pos[1:] != pos[:-1])))
+        lengths = np.diff(np.append(first, cand.size))
+        seg_max = np.maximum.reduceat(err, first)
+        split = seg_max > tolerance
+        if not np.any(split):
+            break
+        seg_id = np.repeat(np.arange(first.size), lengths)
+        hits = np.flatnonzero((err == seg_max[seg_id]) & split[seg_id])
+        _, first_hit = np.unique(seg_id[hits], return_index=True)
+        keep[cand[hits[first_hit]]] = True
+        cand = cand[split[seg_id] & ~keep[cand]]
+    return np.flatnonzero(keep)
+
+
+def simplify_batch(curves, tolerance):
+    """
+    Simplifies many curves at once (see simplify_indices()).
+    All curves are joined into one polyline, with first and last point
+    of every curve always kept, so that each pass handles all curves
+    in a single set of vectorized operations.
+
+    :param curves: iterable of Curve objects (x increasing)
+    :param tolerance: maximal allowed interpolation error
+    :return: list of simplified curves
+    """
+    curves = list(curves)
+    if not curves:
+        return []
+    sizes = np.array([len(c) for c in curves])
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    nonempty = sizes > 0
+    boundaries = np.concatenate((starts[nonempty], ends[nonempty] - 1))
+    x = np.concatenate([np.asarray(c.x, dtype=np.float64) for c in curves])
+    y = np.concatenate([np.asarray(c.y, dtype=np.float64) for c in curves])
+    for c in curves:
+        if np.any(np.diff(c.x) < 0):
+            raise ValueError("Curve domain must be sorted to simplify it.")
+    kept = simplify_indices(x, y, tolerance, boundaries=boundaries)
+    parts = np.split(kept, np.searchsorted(kept, ends[:-1]))
+    return [c.__class__(c[idx - start], **c.metadata) for c, idx, start in zip(curves, parts, starts)]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling for display.
+    First and last points are kept, remaining points are split into
+    n_out - 2 buckets of equal count and from each bucket the point
+    forming the largest triangle with previously selected point and
+    average of next bucket is selected.
+
+    >>> x = np.arange(8.)
+    >>> print(lttb_indices(x, np.array([0., 1., 0., 5., 0., 1., 0., 0.]), 4))
+    [0 3 4 7]
+
+    :param x: np.array of x values, increasing
+    :param y: np.array of y values
+    :param n_out: number of points to select
+    :return: sorted np.array of indices of selected points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("At least 3 points are needed for LTTB.")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # averages of all buckets at once, last "bucket" is the last point
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+    result = np.empty(n_out, dtype=np.intp)
+    result[0], result[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.fabs((x[a] - avg_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        result[i + 1] = a
+    return result
+
+
+def minmax_indices(x, y, n_out, x_range=None):
+    """
+    Min/max envelope downsampling for display: domain is split into
+    (n_out - 2) // 2 bins of equal width (i.e. screen pixels) and from
+    each bin points with minimal and maximal y are selected,
+    together with first and last point.
+
+    >>> x = np.arange(8.)
+    >>> print(minmax_indices(x, np.array([0., 1., 0., 5., 0., 1., 0., 0.]), 6))
+    [0 3 4 5 7]
+
+    :param x: np.array of x values, increasing
+    :param y: np.array of y values
+    :param n_out: maximal number of points to select
+    :param x_range: (a, b) range of bins, defaults to domain
+    :return: sorted np.array of indices of selected points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n_out >= n:
+        return np.arange(n)
+    bins = (n_out - 2) // 2
+    if bins < 1:
+        raise ValueError("At least 4 points are needed for min/max envelope.")
+    a, b = (x[0], x[-1]) if x_range is None else x_range
+    # points outside of x_range belong to the first and the last bin
+    starts = np.searchsorted(x, np.linspace(a, b, bins + 1)[1:-1], side='left')
+    starts = np.unique(np.concatenate(([0], starts[starts < n])))
+    lengths = np.diff(np.append(starts, n))
+    bin_id = np.repeat(np.arange(starts.size), lengths)
+    selected = [[0, n - 1]]
+    for reduce_op in (np.minimum, np.maximum):
+        extreme = reduce_op.reduceat(y, starts)
+        hits = np.flatnonzero(y == extreme[bin_id])
+        _, first = np.unique(bin_id[hits], return_index=True)
+        selected.append(hits[first])
+    return np.unique(np.concatenate(selected))
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(1)
+    x = np.linspace(-50, 50, 100000)
+    y = 100.0 / (1 + np.exp((np.fabs(x) - 30) / 2.0)) + 0.01 * rng.randn(x.size)
+    c = curve.Curve(np.column_stack((x, y)))
+    print('Curve simplification, {:d} points'.format(len(c)))
+    for tolerance in (0.01, 0.05, 0.1, 0.5):
+        start = time.time()
+        s = c.simplify(tolerance)
+        elapsed = time.time() - start
+        error = np.max(np.fabs(s.evaluate_at_x(c.x) - c.y))
+        print('tolerance {:5.2f}: {:6d} points, compression ratio {:7.1f}, max error {:.4f}, {:.3f} s'.format(
+            tolerance, len(s), float(len(c)) / len(s), error, elapsed))
+
+    print('Visual decimation, {:d} points'.format(len(c)))
+    for method in ('lttb', 'minmax'):
+        start = time.time()
+        d = c.decimate(2000, method=method)
+        print('{:6s}: {:d} points in {:.4f} s'.format(method, len(d), time.time() - start))
+
+    start = time.time()
+    batch = simplify_batch([c] * 20, 0.05)
+    print('simplify_batch: 20 curves in {:.3f} s, {:d} points total'.format(time.time() - start,
+                                                                            sum(len(s) for s in batch)))
+
+
+if __name__ == '__main__':
+    main()
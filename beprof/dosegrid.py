@@ -0,0 +1,232 @@
+import numpy as np
+import time
+import logging
+
+from beprof import curve
+from beprof import profile
+
+logger = logging.getLogger(__name__)
+
+
+class DoseGrid(object):
+    """
+    Accessor of 3D dose cube, used to extract profiles and depth-dose curves.
+
+    Cube is indexed as data[i0, i1, i2] with physical coordinates
+    origin[a] + spacing[a] * index along axis a. Cubes opened from files
+    with DoseGrid.open() are memory-mapped, so only the parts of file
+    touched by extracted lines are read. Values along axis-aligned lines
+    are returned by values_along() as strided views (no copy); Curve objects
+    keep x and y in one (N, 2) buffer, so line() copies only the N values
+    of the line itself. Oblique lines are sampled with trilinear
+    interpolation, vectorized over all points of all requested lines.
+
+    >>> g = DoseGrid(np.arange(24.).reshape(2, 3, 4), spacing=(1., 1., 0.5), depth_axis='z')
+    >>> c = g.line('z', (1, 2))
+    >>> print(type(c).__name__, c.x, c.y)
+    Curve [0.  0.5 1.  1.5] [20. 21. 22. 23.]
+    >>> print(g.oblique((0, 0, 0), (1, 0, 0), 3).y)
+    [ 0.  6. 12.]
+
+    :param data: 3D array (i.e. np.memmap)
+    :param origin: physical coordinates of data[0, 0, 0]
+    :param spacing: distance between voxels along each axis
+    :param axes: names of axes
+    :param depth_axis: name or number of beam axis, lines along it are returned
+        as Curve (depth-dose), other lines as Profile
+    """
+
+    def __init__(self, data, origin=(0., 0., 0.), spacing=(1., 1., 1.), axes=('x', 'y', 'z'), depth_axis=None):
+        if np.ndim(data) != 3:
+            raise ValueError("Dose grid must be three-dimensional.")
+        self.data = data
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.spacing = np.asarray(spacing, dtype=np.float64)
+        if self.origin.shape != (3,) or self.spacing.shape != (3,) or np.any(self.spacing <= 0):
+            raise ValueError("Expected three coordinates of origin and three positive spacings.")
+        self.axes = tuple(axes)
+        self.depth_axis = None if depth_axis is None else self._axis(depth_axis)
+
+    @classmethod
+    def open(cls, path, shape=None, dtype=np.float32, offset=0, order='C', **kwargs):
+        """
+        Memory-maps dose cube from .npy file or from raw binary file
+        (then shape and dtype must be given). Data is opened read-only.
+
+        :param path: path to the file
+        :param shape: shape of cube in raw file
+        :param dtype: data type of raw file
+        :param offset: size of header of raw file in bytes
+        :param order: 'C' or 'F' layout of raw file
+        :param kwargs: other arguments of DoseGrid (origin, spacing, ...)
+        """
+        logger.info('Memory-mapping dose grid from %(path)s', {"path": path})
+        if str(path).endswith('.npy'):
+            data = np.load(path, mmap_mode='r')
+        else:
+            if shape is None:
+                raise ValueError("Shape of raw dose grid must be given.")
+            data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape), order=order)
+        return cls(data, **kwargs)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def _axis(self, axis):
+        if axis in self.axes:
+            return self.axes.index(axis)
+        if axis in (0, 1, 2):
+            return axis
+        raise ValueError("Unknown axis: {}".format(axis))
+
+    def coordinates(self, axis):
+        """
+        Physical coordinates of voxels along axis.
+        """
+        a = self._axis(axis)
+        return self.origin[a] + self.spacing[a] * np.arange(self.shape[a])
+
+    def index_of(self, axis, position):
+        """
+        Index of voxel nearest to physical position along axis.
+        """
+        a = self._axis(axis)
+        return int(np.clip(np.round((position - self.origin[a]) / self.spacing[a]), 0, self.shape[a] - 1))
+
+    def _selection(self, a, at):
+        if len(at) != 2:
+            raise ValueError("Indices along two other axes are expected.")
+        sel = list(at)
+        sel.insert(a, slice(None))
+        return tuple(sel)
+
+    def values_along(self, axis, at):
+        """
+        Values on axis-aligned line, as a view of the cube (no copy).
+
+        :param axis: name or number of axis
+        :param at: indices along the two other axes (in order of axes)
+        :return: 1D np.array view
+        """
+        return self.data[self._selection(self._axis(axis), at)]
+
+    def _make_curve(self, a, x, y, **meta):
+        if a is not None and a == self.depth_axis:
+            return curve.Curve(np.column_stack((x, y)), **meta)
+        return profile.Profile(np.column_stack((x, y)), axis=None if a is None else self.axes[a], **meta)
+
+    def line(self, axis, at, **meta):
+        """
+        Axis-aligned line as Profile (or Curve along depth_axis).
+
+        :param axis: name or number of axis
+        :param at: indices along the two other axes (in order of axes)
+        :param meta: metadata of created object
+        """
+        a = self._axis(axis)
+        return self._make_curve(a, self.coordinates(a), self.values_along(a, at), **meta)
+
+    def lines(self, axis, ats, **meta):
+        """
+        Many axis-aligned lines extracted with one gather from the cube.
+
+        :param axis: name or number of axis
+        :param ats: sequence of index pairs along the two other axes
+        :param meta: metadata of created objects
+        :return: list of Profile (or Curve) objects
+        """
+        a = self._axis(axis)
+        ats = np.asarray(ats, dtype=np.intp).reshape(-1, 2)
+        sel = [ats[:, 0], ats[:, 1]]
+        sel.insert(a, slice(None))
+        values = self.data[tuple(sel)]
+        # advanced indices are put first, unless they are adjacent after the slice (a = 0)
+        values = values if a != 0 else values.T
+        x = self.coordinates(a)
+        return [self._make_curve(a, x, row, **meta) for row in values]
+
+    def sample(self, points, def_val=0.0):
+        """
+        Trilinear interpolation of dose at physical points.
+
+        :param points: array of shape (..., 3)
+        :param def_val: value returned for points outside of grid
+        :return: np.array of shape points.shape[:-1]
+        """
+        points = np.asarray(points, dtype=np.float64)
+        flat = points.reshape(-1, 3)
+        f = (flat - self.origin) / self.spacing
+        size = np.array(self.shape)
+        outside = np.any((f < 0) | (f > size - 1), axis=1)
+        lo = np.clip(np.floor(f), 0, np.maximum(size - 2, 0)).astype(np.intp)
+        hi = np.minimum(lo + 1, size - 1)
+        t = np.clip(f - lo, 0, 1)
+        result = np.zeros(len(flat))
+        for corner in range(8):
+            weight = np.ones(len(flat))
+            index = []
+            for a in range(3):
+                upper = (corner >> a) & 1
+                index.append(hi[:, a] if upper else lo[:, a])
+                weight *= t[:, a] if upper else 1 - t[:, a]
+            result += weight * self.data[tuple(index)]
+        result[outside] = def_val
+        return result.reshape(points.shape[:-1])
+
+    def oblique(self, start, stop, n_points, def_val=0.0, **meta):
+        """
+        Profile along line from start to stop (physical coordinates),
+        x of returned profile is distance from start.
+        """
+        return self.oblique_lines([start], [stop], n_points, def_val, **meta)[0]
+
+    def oblique_lines(self, starts, stops, n_points, def_val=0.0, **meta):
+        """
+        Many oblique lines sampled in one vectorized interpolation.
+
+        :param starts: (L, 3) array of line starts
+        :param stops: (L, 3) array of line ends
+        :param n_points: number of points on every line
+        :param def_val: value used outside of grid
+        :return: list of L Profile objects
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        stops = np.asarray(stops, dtype=np.float64).reshape(-1, 3)
+        t = np.linspace(0, 1, n_points)
+        points = starts[:, None, :] + t[None, :, None] * (stops - starts)[:, None, :]
+        values = self.sample(points, def_val)
+        lengths = np.sqrt(np.sum((stops - starts) ** 2, axis=1))
+        return [self._make_curve(None, length * t, row, **meta) for length, row in zip(lengths, values)]
+
+
+def main():
+    import os
+    import tempfile
+
+    rng = np.random.RandomState(0)
+    shape = (200, 200, 400)
+    path = os.path.join(tempfile.mkdtemp(), 'dose.npy')
+    np.save(path, rng.uniform(0, 1, shape).astype(np.float32))
+    print('Dose cube {} ({:.0f} MB)'.format(shape, os.path.getsize(path) / 1e6))
+
+    start = time.time()
+    cube = np.load(path)
+    p = [profile.Profile(np.column_stack((np.arange(shape[0]), cube[:, j, 200]))) for j in range(0, 200, 10)]
+    print('loading whole cube, 20 profiles: {:.3f} s'.format(time.time() - start))
+    del cube
+
+    start = time.time()
+    g = DoseGrid.open(path, depth_axis='z')
+    p = g.lines('x', [(j, 200) for j in range(0, 200, 10)])
+    print('memory-mapped grid, 20 profiles: {:.3f} s'.format(time.time() - start))
+    start = time.time()
+    p = g.oblique_lines(rng.uniform(0, 199, (100, 3)), rng.uniform(0, 199, (100, 3)), 500)
+    print('100 oblique lines of 500 points: {:.3f} s'.format(time.time() - start))
+    del g, p
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
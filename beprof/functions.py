@@ -1,4 +1,5 @@
 import numpy as np
+import copy
 
 
 def subtract(curve1, curve2, def_val=0):
@@ -9,6 +10,10 @@ def subtract(curve1, curve2, def_val=0):
     Returned object is of type type(curve1)
     and has same metadata as curve1 object
 
+    If any of curves has sigma channel, uncertainty of the difference
+    is propagated (errors of both curves added in quadrature)
+    and the result has sigma channel as well.
+
     :param curve1: first curve to calculate the difference
     :param curve2: second curve to calculate the difference
     :param def_val: default value for points that cannot be interpolated
@@ -16,12 +21,56 @@ def subtract(curve1, curve2, def_val=0):
     (using interpolation if necessary)
     """
     coord1 = np.union1d(curve1.x, curve2.x)
+    metadata = copy.deepcopy(curve1.metadata)
+    if curve1.sigma is not None or curve2.sigma is not None:
+        y1, s1 = curve1.evaluate_at_x(coord1, def_val, return_sigma=True)
+        y2, s2 = curve2.evaluate_at_x(coord1, def_val, return_sigma=True)
+        return curve1._from_buffers(coord1, y1 - y2, metadata, np.hypot(s1, s2))
     y1 = curve1.evaluate_at_x(coord1, def_val)
     y2 = curve2.evaluate_at_x(coord1, def_val)
-    coord2 = y1 - y2
-    # the below is explained at the end of curve.Curve.change_domain()
-    obj = curve1.__class__(np.dstack((coord1, coord2))[0], **curve1.__dict__['metadata'])
-    return obj
+    return curve1._from_buffers(coord1, y1 - y2, metadata)
+
+
+def interp_sigma(x, xp, fp, sp, left=None, right=None):
+    """
+    Linear interpolation of values fp and their uncertainties sp
+    (standard deviations) at x, with one binary search for both.
+    Value interpolated between two points is their weighted sum
+    (1 - t) * f0 + t * f1, so its uncertainty (independent errors)
+    is sqrt(((1 - t) * s0) ** 2 + (t * s1) ** 2).
+
+    Values outside of xp range are left and right (uncertainty 0),
+    or the edge values with their uncertainties if left/right are None,
+    as in np.interp(). xp must be increasing.
+
+    >>> y, s = interp_sigma([0.5, 1, 3], [0, 1, 2], [0, 2, 4], [0.2, 0.2, 0.4], right=-1)
+    >>> print(y, np.round(s, 4))
+    [ 1.  2. -1.] [0.1414 0.2    0.    ]
+
+    :return: tuple (values, uncertainties), scalars for scalar x
+    """
+    x = np.asarray(x, dtype=np.float64)
+    xp = np.asarray(xp, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    sp = np.asarray(sp, dtype=np.float64)
+    if xp.size == 0:
+        raise ValueError("xp must not be empty")
+    if xp.size == 1:
+        j, t = np.zeros(x.shape, dtype=np.intp), np.zeros(x.shape)
+        xp, fp, sp = (np.repeat(a, 2) for a in (xp, fp, sp))
+    else:
+        j = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, xp.size - 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (x - xp[j]) / (xp[j + 1] - xp[j])
+        t = np.where(np.isfinite(t), t, 0.)
+    y = (1. - t) * fp[j] + t * fp[j + 1]
+    sigma = np.hypot((1. - t) * sp[j], t * sp[j + 1])
+    for outside, value, edge in ((x < xp[0], left, 0), (x > xp[-1], right, -1)):
+        if value is None:
+            y, sigma = np.where(outside, fp[edge], y), np.where(outside, sp[edge], sigma)
+        else:
+            y, sigma = np.where(outside, value, y), np.where(outside, 0., sigma)
+    return y[()], sigma[()]
 
 
 def medfilt(vector, window):
@@ -54,3 +103,151 @@ def medfilt(vector, window):
         result[-j:, -(i + 1)] = vector[-1]
 
     return np.median(result, axis=1)
+
+
+def gaussian_kernel(sigma, step, truncate=4.0):
+    """
+    Normalized Gaussian kernel sampled with given step,
+    spanning +/- truncate * sigma (always odd number of points).
+
+    >>> print(np.round(gaussian_kernel(1.0, 1.0, truncate=1.0), 3))
+    [0.274 0.452 0.274]
+
+    :param sigma: standard deviation, in the same units as step
+    :param step: sampling step
+    :param truncate: kernel half-width in units of sigma
+    :return: np.array with kernel values summing up to 1
+    """
+    if sigma <= 0 or step <= 0:
+        raise ValueError("Kernel sigma and step must be positive.")
+    half = int(np.ceil(truncate * sigma / step))
+    t = np.arange(-half, half + 1) * step
+    kernel = np.exp(-0.5 * (t / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+def fast_length(n):
+    """
+    Smallest 5-smooth number (only 2, 3 and 5 as factors) >= n,
+    such lengths are fast for np.fft (i.e. zero-padded FFT convolution
+    or correlation).
+
+    >>> print(fast_length(97), fast_length(1000))
+    100 1000
+    """
+    best = 2 ** int(np.ceil(np.log2(max(n, 1))))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            p235 = p35
+            while p235 < n:
+                p235 *= 2
+            best = min(best, p235)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def convolve(vector, kernel, edge='reflect', method='auto'):
+    """
+    Convolution of 1D array vector (or each row of 2D array) with
+    odd-length kernel, result has the same shape as input.
+
+    Edges are handled by padding the input with np.pad() using
+    given mode ('reflect', 'symmetric', 'edge', 'wrap' or 'constant' (zeros)).
+    With method 'fft' the cost is O(N log N) regardless of kernel width,
+    method 'direct' is faster for short kernels, 'auto' picks one of them.
+    All rows of 2D input are transformed in a single FFT call.
+
+    Moving average with edge value repeated:
+    >>> print(convolve(np.array([3., 0., 0., 3., 0.]), np.ones(3) / 3, edge='edge'))
+    [2. 1. 1. 1. 1.]
+
+    Same using FFT:
+    >>> print(np.round(convolve(np.array([3., 0., 0., 3., 0.]), np.ones(3) / 3,
+    ...                         edge='edge', method='fft'), 12))
+    [2. 1. 1. 1. 1.]
+
+    :param vector: 1D or 2D array, convolution along last axis
+    :param kernel: 1D kernel of odd length
+    :param edge: np.pad() mode used to extend data at edges
+    :param method: 'auto', 'fft' or 'direct'
+    :return: np.array with convolution result
+    """
+    vector = np.asarray(vector, dtype=np.float64)
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if not kernel.ndim == 1 or not kernel.size % 2 == 1:
+        raise ValueError("Kernel must be one-dimensional and of odd length.")
+    if vector.ndim not in (1, 2):
+        raise ValueError("Input must be one- or two-dimensional.")
+    if method == 'auto':
+        method = 'direct' if kernel.size <= 64 else 'fft'
+    if method not in ('fft', 'direct'):
+        raise ValueError("Unknown convolution method: {}".format(method))
+
+    n, size = vector.shape[-1], kernel.size
+    half = (size - 1) // 2
+    pad_width = [(0, 0)] * (vector.ndim - 1) + [(half, half)]
+    padded = np.pad(vector, pad_width, mode=edge)
+
+    if method == 'direct':
+        result = np.zeros_like(vector)
+        for k in range(size):
+            start = size - 1 - k
+            result += kernel[k] * padded[..., start:start + n]
+        return result
+
+    length = fast_length(padded.shape[-1] + size - 1)
+    spectrum = np.fft.rfft(padded, length, axis=-1) * np.fft.rfft(kernel, length)
+    return np.fft.irfft(spectrum, length, axis=-1)[..., size - 1:size - 1 + n]
+
+
+def uniform_step(x, rtol=1e-6):
+    """
+    Returns step of uniformly sampled, increasing domain x
+    or None if x is not uniform.
+
+    >>> uniform_step(np.array([0., 0.5, 1., 1.5]))
+    0.5
+    >>> uniform_step(np.array([0., 0.5, 2.]))
+    """
+    if len(x) < 2:
+        return None
+    dx = np.diff(x)
+    step = (x[-1] - x[0]) / (len(x) - 1)
+    if step <= 0 or not np.allclose(dx, step, rtol=rtol, atol=0):
+        return None
+    return float(step)
+
+
+def smooth_curves(curves, width=None, kernel=None, edge='reflect', method='auto'):
+    """
+    Smooths y values of many uniformly sampled curves in place.
+    Curves of the same length and step are stacked into one 2D array
+    and convolved in a single FFT call. Uncertainty channels are
+    propagated as in Curve.smooth().
+
+    :param curves: iterable of Curve objects with uniform domains
+    :param width: standard deviation of Gaussian kernel in units of x
+    :param kernel: explicit odd-length kernel (used if width is None)
+    :param edge: np.pad() mode used to extend data at edges
+    :param method: 'auto', 'fft' or 'direct'
+    """
+    groups = {}
+    for c in curves:
+        step = uniform_step(c.x)
+        if step is None:
+            raise ValueError("Curve domain is not uniformly sampled, use Curve.smooth().")
+        groups.setdefault((len(c), round(step, 12)), []).append(c)
+    for (_, step), group in groups.items():
+        k = gaussian_kernel(width, step) if width is not None else kernel
+        smoothed = convolve(np.vstack([c.y for c in group]), k, edge=edge, method=method)
+        for c, row in zip(group, smoothed):
+            c.y = row
+        with_sigma = [c for c in group if c.sigma is not None]
+        if with_sigma:
+            variance = convolve(np.vstack([np.asarray(c.sigma, dtype=np.float64) ** 2 for c in with_sigma]),
+                                np.asarray(k, dtype=np.float64) ** 2, edge=edge, method=method)
+            for c, row in zip(with_sigma, variance):
+                c.sigma = np.sqrt(np.maximum(row, 0.))
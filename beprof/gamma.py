@@ -0,0 +1,219 @@
+import numpy as np
+import time
+import logging
+
+from beprof import curve
+
+logger = logging.getLogger(__name__)
+
+
+def _search_offsets(dist_tol, step, search_radius):
+    """
+    Number of search shells and their spacing for given tolerances.
+    """
+    if step is None:
+        step = dist_tol / 10.0
+    if search_radius is None:
+        search_radius = 2.0 * dist_tol
+    if step <= 0 or search_radius < 0 or dist_tol <= 0:
+        raise ValueError("dist_tol, step and search_radius must be positive")
+    return int(np.ceil(search_radius / step)), step
+
+
+def _gamma_squared(reference, xe, de, dd, lower, upper, dist_tol, shells, step, early_exit):
+    """
+    Squared gamma index of points (xe, de) compared with reference curve.
+
+    Reference is probed at xe +/- k * step for k = 0, 1, ..., shells,
+    always in order of increasing distance. After each shell points whose
+    current gamma cannot be improved by any further (more distant) shell
+    are removed from the active set, so flat, well-matched regions are
+    resolved after a couple of shells.
+
+    Where dose difference criterion is 0 (local normalization at zero
+    dose) only exact agreement of doses gives finite dose term (0).
+
+    :param dd: dose difference criterion for every evaluated point
+    :param lower: lowest x of reference available for every evaluated point
+    :param upper: highest x of reference available for every evaluated point
+    :return: squared gamma of every point, NaN where reference was
+        not available within search radius
+    """
+    gamma2 = np.full(xe.shape, np.inf)
+    found = np.zeros(xe.shape, dtype=bool)
+    active = np.flatnonzero((lower <= xe + shells * step) & (upper >= xe - shells * step))
+    for k in range(shells + 1):
+        dist_term = (k * step / dist_tol) ** 2
+        keep = gamma2[active] > dist_term
+        if early_exit:
+            keep &= gamma2[active] >= 1.0
+        active = active[keep]
+        if active.size == 0:
+            break
+        for shift in ((0.0,) if k == 0 else (-k * step, k * step)):
+            q = xe[active] + shift
+            dr = reference.evaluate_at_x(q, def_val=np.nan)
+            dr[(q < lower[active]) | (q > upper[active])] = np.nan
+            found[active] |= ~np.isnan(dr)
+            diff = dr - de[active]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                g2 = dist_term + np.where(diff == 0, 0.0, (diff / dd[active]) ** 2)
+            gamma2[active] = np.fmin(gamma2[active], g2)
+    gamma2[~found] = np.nan
+    return gamma2
+
+
+def _prepare(reference, evaluated, dose_tol, local, threshold):
+    """
+    Sorted reference and per-point criteria for one pair of curves.
+    """
+    order = np.argsort(reference.x, kind='mergesort')
+    if np.any(order != np.arange(order.size)):
+        reference = reference[order]
+    xe = np.asarray(evaluated.x, dtype=np.float64)
+    de = np.asarray(evaluated.y, dtype=np.float64)
+    d_max = float(np.max(reference.y))
+    if local:
+        dd = dose_tol * np.fabs(de)
+    else:
+        dd = np.full(xe.shape, dose_tol * d_max)
+    excluded = de < threshold * d_max
+    return reference, xe, de, dd, excluded
+
+
+def gamma_index(reference, evaluated, dose_tol=0.03, dist_tol=3.0, step=None, search_radius=None,
+                local=False, threshold=0.0, early_exit=False):
+    """
+    Gamma index of evaluated curve (i.e. measured profile) against reference
+    (i.e. planned profile) combining dose difference and distance to agreement.
+
+    Reference is interpolated with Curve.evaluate_at_x() on a sub-grid of
+    spacing `step` inside a window of +/- `search_radius` around every
+    evaluated point. The search is vectorized over evaluated points and
+    stops for each point as soon as its gamma value is final.
+
+    Identical curves give gamma equal to 0 everywhere:
+    >>> c = curve.Curve([[0, 0], [1, 10], [2, 10], [3, 0]])
+    >>> print(gamma_index(c, c))
+    [0. 0. 0. 0.]
+
+    A 2% dose difference with 3% criterion (global normalization):
+    >>> e = curve.Curve([[1, 10.2], [2, 10.2]])
+    >>> print(np.round(gamma_index(c, e, dist_tol=0.5), 3))
+    [0.667 0.667]
+
+    Local normalization at zero dose:
+    >>> print(gamma_index(c, c, local=True))
+    [0. 0. 0. 0.]
+
+    :param reference: reference curve
+    :param evaluated: curve to be evaluated
+    :param dose_tol: dose difference criterion, as a fraction
+        of reference maximum (or of local dose if local is True)
+    :param dist_tol: distance to agreement criterion, in units of x
+    :param step: spacing of reference sub-grid, defaults to dist_tol / 10
+    :param search_radius: maximal distance searched, defaults to 2 * dist_tol
+    :param local: use local instead of global dose normalization,
+        at points of zero evaluated dose gamma is then 0 if reference
+        dose is also 0 within search radius, inf otherwise
+    :param threshold: evaluated points with value below threshold
+        (fraction of reference maximum) are excluded (NaN is returned)
+    :param early_exit: stop search for a point as soon as its gamma is below 1,
+        returned values below 1 are then only an upper bound (pass/fail mode)
+    :return: np.array of gamma values for every point of evaluated curve,
+        NaN where reference is not available within search radius
+    """
+    logger.info('Running gamma_index(dose_tol=%(dd)s, dist_tol=%(dta)s) for %(n)s points',
+                {"dd": dose_tol, "dta": dist_tol, "n": len(evaluated)})
+    shells, step = _search_offsets(dist_tol, step, search_radius)
+    reference, xe, de, dd, excluded = _prepare(reference, evaluated, dose_tol, local, threshold)
+    lower = np.full(xe.shape, float(reference.x[0]))
+    upper = np.full(xe.shape, float(reference.x[-1]))
+    gamma2 = _gamma_squared(reference, xe, de, dd, lower, upper, dist_tol, shells, step, early_exit)
+    gamma2[excluded] = np.nan
+    return np.sqrt(gamma2)
+
+
+def gamma_index_batch(pairs, dose_tol=0.03, dist_tol=3.0, step=None, search_radius=None,
+                      local=False, threshold=0.0, early_exit=False):
+    """
+    Gamma index for many (reference, evaluated) pairs of curves at once.
+
+    All references are placed one after another on a common x axis
+    (separated by gaps wider than the search window) and joined into
+    a single Curve, so that every search shell is a single interpolation
+    call for all pairs. Parameters are the same as in gamma_index().
+
+    >>> c = curve.Curve([[0, 0], [1, 10], [2, 10], [3, 0]])
+    >>> e = curve.Curve([[1, 10.2], [2, 10.2]])
+    >>> for g in gamma_index_batch([(c, c), (c, e)], dist_tol=0.5):
+    ...     print(np.round(g, 3))
+    [0. 0. 0. 0.]
+    [0.667 0.667]
+
+    :param pairs: iterable of (reference, evaluated) tuples
+    :return: list of np.arrays with gamma values, one for each pair
+    """
+    shells, step = _search_offsets(dist_tol, step, search_radius)
+    gap = 2.0 * (shells + 1) * step
+    ref_parts, xe_parts, de_parts, dd_parts, ex_parts, lower_parts, upper_parts = [], [], [], [], [], [], []
+    sizes = []
+    offset = 0.0
+    for reference, evaluated in pairs:
+        reference, xe, de, dd, excluded = _prepare(reference, evaluated, dose_tol, local, threshold)
+        start, stop = float(reference.x[0]), float(reference.x[-1])
+        if xe.size:
+            start, stop = min(start, float(np.min(xe))), max(stop, float(np.max(xe)))
+        shift = offset - start
+        rx = reference.x + shift
+        ref_parts.append(np.column_stack((rx, reference.y)))
+        xe_parts.append(xe + shift)
+        de_parts.append(de)
+        dd_parts.append(dd)
+        ex_parts.append(excluded)
+        lower_parts.append(np.full(xe.shape, rx[0]))
+        upper_parts.append(np.full(xe.shape, rx[-1]))
+        sizes.append(xe.size)
+        offset += stop - start + gap
+    if not sizes:
+        return []
+    logger.info('Running gamma_index_batch() for %(p)s pairs', {"p": len(sizes)})
+    reference = curve.Curve(np.concatenate(ref_parts))
+    gamma2 = _gamma_squared(reference, np.concatenate(xe_parts), np.concatenate(de_parts),
+                            np.concatenate(dd_parts), np.concatenate(lower_parts), np.concatenate(upper_parts),
+                            dist_tol, shells, step, early_exit)
+    gamma2[np.concatenate(ex_parts)] = np.nan
+    return np.split(np.sqrt(gamma2), np.cumsum(sizes)[:-1])
+
+
+def pass_rate(gamma):
+    """
+    Fraction of evaluated points with gamma <= 1 (NaN values are skipped).
+
+    >>> pass_rate(np.array([0.2, 0.9, 1.5, np.nan]))
+    0.6666666666666666
+    """
+    gamma = np.asarray(gamma)
+    valid = ~np.isnan(gamma)
+    if not np.any(valid):
+        return np.nan
+    return float(np.count_nonzero(gamma[valid] <= 1.0)) / np.count_nonzero(valid)
+
+
+def main():
+    x = np.linspace(-50, 50, 2001)
+    ref = curve.Curve(np.column_stack((x, 100.0 / (1 + np.exp((np.fabs(x) - 30) / 2.0)))))
+    ev = curve.Curve(np.column_stack((x[::2], ref.evaluate_at_x(x[::2] - 0.7) * 1.01)))
+
+    start = time.time()
+    g = gamma_index(ref, ev, dose_tol=0.02, dist_tol=2.0)
+    elapsed = time.time() - start
+    print('gamma_index: {:d} points in {:.4f} s, pass rate {:.3f}'.format(len(ev), elapsed, pass_rate(g)))
+
+    start = time.time()
+    gamma_index_batch([(ref, ev)] * 100, dose_tol=0.02, dist_tol=2.0)
+    print('gamma_index_batch: 100 pairs in {:.4f} s'.format(time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import numpy as np
+import time
+import logging
+
+from beprof import curve
+
+logger = logging.getLogger(__name__)
+
+
+class HistogramBuilder(object):
+    """
+    Streaming histogram of raw events (i.e. hit positions with
+    energy deposits), converted to Curve at the end or at any
+    moment during the stream.
+
+    Events are consumed in chunks of any size. Bin index of every event
+    is calculated directly for regular grid (start, stop, bins), or
+    with binary search for explicit edges, and per-bin sums are
+    accumulated with np.bincount. Memory used between chunks is
+    proportional to the number of bins only.
+
+    >>> h = HistogramBuilder(start=0, stop=4, bins=4)
+    >>> h.add([0.5, 1.5, 1.7, 9.], weights=[1., 2., 3., 4.])
+    >>> h.add(np.array([3.2]))
+    >>> print(h.to_curve().y)
+    [1. 5. 0. 1.]
+    >>> print(h.counts, h.overflow)
+    [1 2 0 1] 1
+
+    :param start: lower edge of regular grid
+    :param stop: upper edge of regular grid
+    :param bins: number of bins of regular grid
+    :param edges: increasing bin edges (instead of regular grid)
+    :param track_errors: accumulate also sums of squared weights (see errors())
+    :param curve_class: class of created curves
+    :param meta: metadata of created curves
+    """
+
+    def __init__(self, start=None, stop=None, bins=None, edges=None, track_errors=False, curve_class=curve.Curve,
+                 **meta):
+        if edges is not None:
+            self.edges = np.asarray(edges, dtype=np.float64)
+            if self.edges.ndim != 1 or self.edges.size < 2 or np.any(np.diff(self.edges) <= 0):
+                raise ValueError("Bin edges must be increasing, at least two are needed.")
+            self._regular = False
+        else:
+            if start is None or stop is None or bins is None:
+                raise ValueError("Either edges or start, stop and bins must be given.")
+            if stop <= start or bins < 1:
+                raise ValueError("Expected start < stop and positive number of bins.")
+            self.edges = np.linspace(start, stop, int(bins) + 1)
+            self._regular = True
+            self._scale = bins / float(stop - start)
+        self.track_errors = track_errors
+        self.curve_class = curve_class
+        self.metadata = meta
+        self.reset()
+
+    @property
+    def bins(self):
+        return self.edges.size - 1
+
+    @property
+    def centers(self):
+        return 0.5 * (self.edges[1:] + self.edges[:-1])
+
+    def reset(self):
+        """
+        Clears all accumulated sums.
+        """
+        n = self.bins
+        self.sums = np.zeros(n)
+        self.sums2 = np.zeros(n)
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.events = 0
+
+    def _indices(self, positions):
+        """
+        Bin indices shifted by one: 0 for underflow, bins + 1 for overflow
+        (and NaN), so that all events can be counted with one bincount call.
+        """
+        if self._regular:
+            idx = positions - self.edges[0]
+            idx *= self._scale
+            np.floor(idx, out=idx)
+        else:
+            idx = np.searchsorted(self.edges, positions, side='right') - 1.
+        # events exactly at upper edge belong to the last bin (as in np.histogram)
+        idx[positions == self.edges[-1]] = self.bins - 1
+        np.fmin(idx, self.bins, out=idx)
+        np.maximum(idx, -1, out=idx)
+        idx += 1
+        return idx.astype(np.intp)
+
+    def add(self, positions, weights=None):
+        """
+        Accumulates chunk of events. NaN positions are counted as overflow.
+
+        :param positions: 1D array of event positions
+        :param weights: 1D array of event weights (i.e. energy deposits),
+            every event has weight 1 if None
+        """
+        positions = np.asarray(positions, dtype=np.float64).ravel()
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+            if weights.size != positions.size:
+                raise ValueError("Positions and weights must have the same size.")
+        idx = self._indices(positions)
+        size = self.bins + 2
+        counts = np.bincount(idx, minlength=size)
+        self.underflow += int(counts[0])
+        self.overflow += int(counts[-1])
+        self.events += positions.size
+        self.counts += counts[1:-1]
+        if weights is None:
+            self.sums += counts[1:-1]
+            if self.track_errors:
+                self.sums2 += counts[1:-1]
+            return
+        self.sums += np.bincount(idx, weights, minlength=size)[1:-1]
+        if self.track_errors:
+            self.sums2 += np.bincount(idx, weights * weights, minlength=size)[1:-1]
+
+    def to_curve(self, mode='sum'):
+        """
+        Current state of histogram as Curve (bin centers, values).
+
+        :param mode: 'sum' (sum of weights), 'count' (number of events),
+            'mean' (mean weight, 0 for empty bins) or 'density'
+            (sum of weights divided by bin width)
+        :return: new object of curve_class
+        """
+        if mode == 'sum':
+            values = self.sums
+        elif mode == 'count':
+            values = self.counts
+        elif mode == 'mean':
+            values = self.sums / np.maximum(self.counts, 1)
+        elif mode == 'density':
+            values = self.sums / np.diff(self.edges)
+        else:
+            raise ValueError("Unknown histogram mode: {}".format(mode))
+        return self.curve_class(np.column_stack((self.centers, values)), **self.metadata)
+
+    def errors(self):
+        """
+        Statistical uncertainty of sums of weights, sqrt(sum of squared weights).
+        Available only if histogram was created with track_errors.
+        """
+        if not self.track_errors:
+            raise ValueError("Histogram was created without track_errors.")
+        return np.sqrt(self.sums2)
+
+    def consume(self, chunks, every=None, mode='sum'):
+        """
+        Accumulates all chunks from an iterable and yields Curve snapshots.
+
+        :param chunks: iterable of positions arrays or (positions, weights) tuples
+        :param every: yield snapshot after every that many events (approximately,
+            at chunk boundaries), only final curve if None
+        :param mode: see to_curve()
+        :return: generator of Curve objects, last one after all chunks
+            (not repeated if the last chunk triggered a snapshot)
+        """
+        next_snapshot = self.events + every if every else None
+        snapshot_events = None
+        for chunk in chunks:
+            if isinstance(chunk, tuple):
+                self.add(*chunk)
+            else:
+                self.add(chunk)
+            if next_snapshot is not None and self.events >= next_snapshot:
+                logger.info('Histogram snapshot after %(n)s events', {"n": self.events})
+                next_snapshot = self.events + every
+                snapshot_events = self.events
+                yield self.to_curve(mode)
+        if snapshot_events != self.events:
+            yield self.to_curve(mode)
+
+
+def main():
+    rng = np.random.RandomState(0)
+    chunk, n_chunks = 2000000, 50
+    h = HistogramBuilder(start=-50, stop=50, bins=1000)
+    t_builder = t_numpy = 0.0
+    reference = np.zeros(1000)
+    for _ in range(n_chunks):
+        positions = rng.normal(0, 10, chunk)
+        energy = rng.exponential(1.0, chunk)
+        start = time.time()
+        h.add(positions, energy)
+        t_builder += time.time() - start
+        start = time.time()
+        reference += np.histogram(positions, bins=1000, range=(-50, 50), weights=energy)[0]
+        t_numpy += time.time() - start
+    events = chunk * n_chunks
+    print('{:d} events: HistogramBuilder {:.2f} s ({:.0f} Mevents/s), np.histogram {:.2f} s'.format(
+        events, t_builder, events / t_builder / 1e6, t_numpy))
+    print('max difference: {:.3g}'.format(np.max(np.abs(h.sums - reference))))
+
+
+if __name__ == '__main__':
+    main()
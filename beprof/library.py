@@ -0,0 +1,243 @@
+import numpy as np
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _nearest(points, centroids):
+    """
+    Index of nearest centroid for every point (squared Euclidean distance).
+    """
+    dist = np.einsum('ij,ij->i', centroids, centroids)[None, :] - 2 * np.dot(points, centroids.T)
+    return np.argmin(dist, axis=1)
+
+
+def _kmeans(points, n_clusters, iterations=10, seed=0):
+    """
+    Lloyd's k-means clustering started from randomly chosen points.
+
+    :return: tuple (centroids, label of every point)
+    """
+    rng = np.random.RandomState(seed)
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest(points, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        nonempty = counts > 0
+        for d in range(points.shape[1]):
+            sums = np.bincount(labels, points[:, d], minlength=n_clusters)
+            centroids[nonempty, d] = sums[nonempty] / counts[nonempty]
+    return centroids, _nearest(points, centroids)
+
+
+class ProfileLibrary(object):
+    """
+    Library of reference curves (i.e. modelled beam profiles) indexed
+    for similarity search.
+
+    All references are resampled once onto a common grid and stored
+    as rows of a dense float32 matrix. A query (one measured curve or many
+    of them) is resampled onto the same grid and compared with the whole
+    library with a single matrix product, which gives both RMS distance
+    and Pearson correlation:
+
+        |q - r|^2 = |q|^2 - 2 q.r + |r|^2
+        corr(q, r) = (q.r - G mean(q) mean(r)) / (G std(q) std(r))
+
+    RMS of the best matches is then calculated again directly from
+    differences, to avoid cancellation errors of float32 products.
+    Cost of such a query is linear in library size.
+
+    With n_components set, references are also projected on their first
+    principal components. RMS queries are then compared in this reduced
+    space first, and only the best candidates are ranked with exact
+    distance. This is still a scan over all references, with a smaller
+    constant (n_components instead of grid size per reference).
+    With n_clusters set as well, references are grouped with k-means in the
+    reduced space (inverted file index): a query is compared with cluster
+    centroids and only with references of the nearest clusters,
+    so its cost grows with n_clusters + library size / n_clusters * probes
+    (i.e. with square root of library size for n_clusters ~ sqrt(size)).
+    Such search is approximate: a match outside of probed clusters is missed.
+
+    >>> from beprof.curve import Curve
+    >>> refs = [Curve([[0, 0], [5, s], [10, 0]], energy=e) for e, s in ((70, 1.), (150, 2.), (230, 3.))]
+    >>> lib = ProfileLibrary(refs, grid=np.linspace(0, 10, 11))
+    >>> indices, scores = lib.query(Curve([[0, 0], [5, 2.2], [10, 0]]), k=2)
+    >>> print(indices, [lib.labels[i]['energy'] for i in indices])
+    [1 2] [150, 230]
+
+    :param references: iterable of Curve objects
+    :param grid: common domain, defaults to n_points spanning all references
+    :param n_points: size of default grid
+    :param labels: list of objects describing references, defaults to their metadata
+    :param n_components: number of principal components kept for reduced search
+    :param n_clusters: number of k-means clusters of candidate index
+        (requires n_components)
+    :param def_val: value used outside of domain of a curve
+    """
+
+    def __init__(self, references, grid=None, n_points=512, labels=None, n_components=None, n_clusters=None,
+                 def_val=0.0):
+        references = list(references)
+        if not references:
+            raise ValueError("Library must contain at least one reference curve.")
+        if grid is None:
+            lo = min(float(np.min(r.x)) for r in references)
+            hi = max(float(np.max(r.x)) for r in references)
+            grid = np.linspace(lo, hi, n_points)
+        self.grid = np.asarray(grid, dtype=np.float64)
+        self.def_val = def_val
+        self.labels = [r.metadata for r in references] if labels is None else list(labels)
+        logger.info('Building %(name)s of %(m)s references on grid of %(g)s points',
+                    {"name": self.__class__.__name__, "m": len(references), "g": self.grid.size})
+        self.matrix = np.empty((len(references), self.grid.size), dtype=np.float32)
+        for row, r in zip(self.matrix, references):
+            row[:] = r.evaluate_at_x(self.grid, def_val)
+        self.norms = np.einsum('ij,ij->i', self.matrix, self.matrix, dtype=np.float64)
+        self.means = self.matrix.mean(axis=1, dtype=np.float64)
+        self.stds = np.sqrt(np.maximum(self.norms / self.grid.size - self.means ** 2, 0))
+
+        self.components = None
+        if n_components is not None:
+            # principal axes of centered library
+            self.center = self.matrix.mean(axis=0)
+            _, _, vt = np.linalg.svd(self.matrix - self.center, full_matrices=False)
+            self.components = np.ascontiguousarray(vt[:n_components])
+            self.projected = np.dot(self.matrix - self.center, self.components.T)
+            self.projected_norms = np.einsum('ij,ij->i', self.projected, self.projected)
+
+        self.centroids = None
+        if n_clusters is not None:
+            if self.components is None:
+                raise ValueError("Candidate index requires n_components.")
+            n_clusters = min(int(n_clusters), len(references))
+            logger.info('Clustering references into %(c)s clusters', {"c": n_clusters})
+            self.centroids, labels = _kmeans(self.projected.astype(np.float64), n_clusters)
+            # members of i-th cluster are members[offsets[i]:offsets[i + 1]]
+            self.members = np.argsort(labels, kind='mergesort')
+            self.offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=n_clusters))))
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def resample(self, curves):
+        """
+        Values of curves on library grid as (Q, G) float32 array.
+        """
+        return np.array([c.evaluate_at_x(self.grid, self.def_val) for c in curves], dtype=np.float32)
+
+    def _scores(self, queries, rows, metric):
+        products = np.dot(queries, self.matrix[rows].T if rows is not None else self.matrix.T).astype(np.float64)
+        sel = slice(None) if rows is None else rows
+        q_norms = np.einsum('ij,ij->i', queries, queries, dtype=np.float64)[:, None]
+        size = self.grid.size
+        if metric == 'rms':
+            squared = q_norms - 2 * products + self.norms[sel]
+            # smaller is better, return negative score for common ranking
+            return -np.sqrt(np.maximum(squared, 0) / size)
+        q_means = queries.mean(axis=1, dtype=np.float64)[:, None]
+        q_stds = np.sqrt(np.maximum(q_norms / size - q_means ** 2, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = (products / size - q_means * self.means[sel]) / (q_stds * self.stds[sel])
+        return np.where(np.isnan(corr), -np.inf, corr)
+
+    def _candidates(self, reduced, n_cand, probes):
+        """
+        For every query (row of reduced) n_cand references nearest in reduced
+        space, searched in the nearest clusters only (at least probes of them,
+        more if they hold less than n_cand references).
+        """
+        sizes = np.diff(self.offsets)
+        centroid_dist = np.einsum('ij,ij->i', self.centroids, self.centroids)[None, :] - \
+            2 * np.dot(reduced, self.centroids.T)
+        top = np.empty((len(reduced), n_cand), dtype=np.intp)
+        for i, clusters in enumerate(np.argsort(centroid_dist, axis=1)):
+            n_probe = max(probes, np.searchsorted(np.cumsum(sizes[clusters]), n_cand) + 1)
+            rows = np.concatenate([self.members[self.offsets[c]:self.offsets[c + 1]] for c in clusters[:n_probe]])
+            dist = self.projected_norms[rows] - 2 * np.dot(self.projected[rows], reduced[i])
+            top[i] = rows[np.argpartition(dist, n_cand - 1)[:n_cand]]
+        return top
+
+    def query(self, curves, k=1, metric='rms', candidates=None, probes=1):
+        """
+        Finds k most similar references for a curve (or each of many curves).
+
+        :param curves: Curve object or list of Curve objects
+        :param k: number of matches returned
+        :param metric: 'rms' (RMS difference) or 'correlation' (Pearson correlation)
+        :param candidates: number of candidates selected in reduced space
+            (only if library was built with n_components), defaults to 10 * k
+        :param probes: number of nearest clusters searched for candidates
+            (only if library was built with n_clusters)
+        :return: tuple (indices, scores) of np.arrays of shape (k,)
+            or (Q, k) for list of Q curves, best match first;
+            scores are RMS differences or correlation coefficients
+        """
+        if metric not in ('rms', 'correlation'):
+            raise ValueError("Unknown metric: {}".format(metric))
+        single = hasattr(curves, 'evaluate_at_x')
+        queries = self.resample([curves] if single else curves)
+        k = min(k, len(self))
+        logger.info('Querying %(name)s with %(q)s curves, k=%(k)s, metric=%(m)s',
+                    {"name": self.__class__.__name__, "q": len(queries), "k": k, "m": metric})
+
+        rows = np.arange(len(queries))[:, None]
+        if self.components is not None and metric == 'rms':
+            # coarse search in reduced space
+            n_cand = min(len(self), candidates or 10 * k)
+            reduced = np.dot(queries - self.center, self.components.T)
+            if self.centroids is not None:
+                top = self._candidates(reduced, n_cand, probes)
+            else:
+                dist = self.projected_norms[None, :] - 2 * np.dot(reduced, self.projected.T)
+                top = np.argpartition(dist, n_cand - 1, axis=1)[:, :n_cand]
+        else:
+            s = self._scores(queries, None, metric)
+            top = np.argpartition(-s, k - 1, axis=1)[:, :k]
+            scores = s[rows, top]
+        if metric == 'rms':
+            # selected references are scored again directly, without
+            # cancellation errors of float32 products
+            diff = self.matrix[top].astype(np.float64) - queries[:, None, :]
+            scores = -np.sqrt(np.einsum('ijk,ijk->ij', diff, diff) / self.grid.size)
+        order = np.argsort(-scores, axis=1, kind='mergesort')[:, :k]
+        indices, scores = top[rows, order], scores[rows, order]
+        if metric == 'rms':
+            scores = -scores
+        if single:
+            return indices[0], scores[0]
+        return indices, scores
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(0)
+    x = np.linspace(-30, 30, 301)
+    widths = rng.uniform(3, 15, 20000)
+    shifts = rng.uniform(-2, 2, widths.size)
+    refs = [curve.Curve(np.column_stack((x, np.exp(-(x - s) ** 2 / (2 * w ** 2))))) for w, s in zip(widths, shifts)]
+    queries = [curve.Curve(np.column_stack((x, r.y + 0.01 * rng.randn(x.size)))) for r in refs[:200]]
+
+    start = time.time()
+    for q in queries[:5]:
+        np.argmin([np.sqrt(np.mean(q.subtract(ref, new_obj=True).y ** 2)) for ref in refs])
+    print('loop over library: {:.4f} s per query'.format((time.time() - start) / 5))
+
+    for n_components, n_clusters in ((None, None), (16, None), (16, 141)):
+        start = time.time()
+        lib = ProfileLibrary(refs, n_points=256, n_components=n_components, n_clusters=n_clusters)
+        print('Library of {:d} references, {} components, {} clusters, built in {:.3f} s'.format(
+            len(lib), n_components, n_clusters, time.time() - start))
+        for metric in ('rms', 'correlation'):
+            start = time.time()
+            indices, _ = lib.query(queries, k=5, metric=metric)
+            elapsed = time.time() - start
+            hits = np.mean(indices[:, 0] == np.arange(len(queries)))
+            print('  {}: {:.6f} s per query, top-1 accuracy {:.3f}'.format(metric, elapsed / len(queries), hits))
+
+
+if __name__ == '__main__':
+    main()
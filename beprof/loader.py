@@ -0,0 +1,27 @@
+import numpy as np
+import os
+import logging
+
+from beprof import profile
+
+logger = logging.getLogger(__name__)
+
+
+def load_curve(path, x_col=0, y_col=1, delimiter=None, skiprows=0, curve_class=profile.Profile, **meta):
+    """
+    Loads curve from text file with data in columns (lines starting
+    with '#' are skipped). File name is stored in metadata
+    under 'filename' key, together with extra meta arguments.
+
+    :param path: path to the file
+    :param x_col: index of column with x values
+    :param y_col: index of column with y values
+    :param delimiter: column separator, any whitespace if None
+    :param skiprows: number of header lines skipped
+    :param curve_class: class of returned object (Curve or its subclass)
+    :return: object of curve_class
+    """
+    logger.info('Loading %(path)s', {"path": path})
+    data = np.loadtxt(path, usecols=(x_col, y_col), delimiter=delimiter, skiprows=skiprows, ndmin=2)
+    meta.setdefault('filename', os.path.basename(path))
+    return curve_class(data, **meta)
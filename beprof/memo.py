@@ -0,0 +1,352 @@
+import numpy as np
+import collections
+import copy
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(obj):
+    """
+    Fast hash of the content of an array (i.e. Curve) or other argument
+    of a transform. Arrays are hashed by dtype, shape and raw buffer,
+    Curve metadata (if present) is included as well. Containers
+    (also metadata) are hashed recursively, so arrays inside them are
+    hashed by content too, not by their (abbreviated) repr.
+
+    >>> content_hash(np.arange(3.)) == content_hash(np.arange(3.))
+    True
+    >>> content_hash(np.arange(3.)) == content_hash(np.arange(3))
+    False
+    """
+    h = hashlib.sha1()
+    if isinstance(obj, np.ndarray):
+        h.update(type(obj).__name__.encode())
+        h.update(str(obj.dtype).encode())
+        h.update(str(obj.shape).encode())
+        if obj.dtype.hasobject:
+            h.update(content_hash(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).view(np.uint8).data)
+        metadata = getattr(obj, 'metadata', None)
+        if metadata:
+            h.update(content_hash(metadata).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(type(obj).__name__.encode())
+        for item in obj:
+            h.update(content_hash(item).encode())
+    elif isinstance(obj, dict):
+        h.update(b'dict')
+        for item in sorted(content_hash(k) + content_hash(v) for k, v in obj.items()):
+            h.update(item.encode())
+    elif isinstance(obj, (set, frozenset)):
+        h.update(b'set')
+        for item in sorted(content_hash(v) for v in obj):
+            h.update(item.encode())
+    else:
+        h.update(type(obj).__name__.encode())
+        h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+class TransformCache(object):
+    """
+    Two-tier cache for results of Curve transforms.
+
+    First tier is an in-memory LRU dictionary limited by number of entries.
+    Optional second tier keeps pickled results in a directory, with least
+    recently used files removed when total size exceeds max_disk_bytes.
+    Entries found on disk are promoted to memory.
+
+    Sizes of files in the directory are read once, on first use of the
+    disk tier, and then kept up to date by this object, so storing an
+    entry doesn't scan the directory. Files added or removed by other
+    processes are noticed by the next TransformCache using the directory.
+
+    >>> cache = TransformCache(max_items=2)
+    >>> cache.put('a', 1)
+    >>> cache.get('a'), cache.get('b')
+    (1, None)
+    >>> print(sorted(cache.stats.items()))
+    [('disk_hits', 0), ('disk_items', 0), ('hits', 1), ('items', 1), ('misses', 1)]
+
+    :param max_items: maximal number of entries kept in memory
+    :param directory: directory of disk tier, no disk tier if None
+    :param max_disk_bytes: maximal size of disk tier
+    """
+
+    def __init__(self, max_items=128, directory=None, max_disk_bytes=1 << 30):
+        self.max_items = max_items
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        # disk entries (name: size), least recently used first, None until first use
+        self._disk = None
+        self._disk_bytes = 0
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """
+        Cached value for key or None if not found.
+        """
+        if key in self._items:
+            value = self._items.pop(key)
+            self._items[key] = value
+            self.hits += 1
+            return value
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                # mark as recently used for eviction (also for next sessions)
+                os.utime(path, None)
+                self._touch(os.path.basename(path), os.path.getsize(path))
+                self.disk_hits += 1
+                self.hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def _remember(self, key, value):
+        self._items[key] = value
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def put(self, key, value):
+        """
+        Stores value in memory and (if enabled) on disk.
+        """
+        self._remember(key, value)
+        if self.directory is None:
+            return
+        # write to temporary file first, so that readers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        path = self._path(key)
+        _replace(tmp, path)
+        self._touch(os.path.basename(path), size)
+        self._evict()
+
+    def _disk_entries(self):
+        """
+        Ordered dictionary of disk entries (file name: size), least recently
+        used first. Directory is scanned only on first call.
+        """
+        if self._disk is None:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    st = os.stat(os.path.join(self.directory, name))
+                    entries.append((st.st_mtime, st.st_size, name))
+            self._disk = collections.OrderedDict((name, size) for _, size, name in sorted(entries))
+            self._disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def _touch(self, name, size):
+        entries = self._disk_entries()
+        self._disk_bytes += size - entries.pop(name, 0)
+        entries[name] = size
+
+    def _evict(self):
+        entries = self._disk_entries()
+        while self._disk_bytes > self.max_disk_bytes and entries:
+            name, size = entries.popitem(last=False)
+            logger.info('Evicting %(name)s from transform cache', {"name": name})
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # already removed, i.e. by other process using the same directory
+                pass
+            self._disk_bytes -= size
+
+    def clear(self):
+        """
+        Removes all entries (memory and disk) and resets statistics.
+        """
+        self._items.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+            self._disk = collections.OrderedDict()
+            self._disk_bytes = 0
+        self.hits = self.misses = self.disk_hits = 0
+
+    @property
+    def stats(self):
+        """
+        Dictionary with hit/miss statistics and number of stored entries.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                'items': len(self._items),
+                'disk_items': len(self._disk_entries()) if self.directory is not None else 0}
+
+
+def _replace(source, destination):
+    """
+    Renames source to destination, replacing existing file (also on Windows).
+    """
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    # Python 2, os.rename() fails on Windows if destination exists
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+# cache used when caching is enabled globally
+_default_cache = None
+
+
+def enable(cache=None):
+    """
+    Enables caching of memoized transforms globally.
+
+    :param cache: TransformCache to use, new in-memory one if None
+    :return: cache in use
+    """
+    global _default_cache
+    _default_cache = cache if cache is not None else TransformCache()
+    return _default_cache
+
+
+def disable():
+    """
+    Disables global caching of memoized transforms.
+    """
+    global _default_cache
+    _default_cache = None
+
+
+# arguments which don't change results of transforms, left out of keys
+IGNORED_ARGUMENTS = ('workers',)
+
+# per-thread flag set while a memoized method is running
+_state = threading.local()
+
+
+def _call(method, self, args, kwargs):
+    """
+    Calls method, marking that memoized methods called by it are nested calls.
+    """
+    nested = getattr(_state, 'nested', False)
+    _state.nested = True
+    try:
+        return method(self, *args, **kwargs)
+    finally:
+        _state.nested = nested
+
+
+def _call_arguments(method, self, args, kwargs):
+    """
+    Dictionary of all arguments of method call (except self and ignored ones),
+    with defaults filled in, so that the same call gives the same dictionary
+    regardless of passing arguments by position or by name.
+    """
+    if hasattr(inspect, 'signature'):
+        bound = inspect.signature(method).bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    else:  # Python 2
+        arguments = inspect.getcallargs(method, self, *args, **kwargs)
+    for name in ('self',) + IGNORED_ARGUMENTS:
+        arguments.pop(name, None)
+    return arguments
+
+
+def memoized(method):
+    """
+    Decorator making a Curve method cacheable.
+
+    Method gets extra keyword argument cache: None (default) uses
+    globally enabled cache (see enable()), True uses global cache or
+    creates one, False disables caching, a TransformCache instance is
+    used directly. Memoized methods called by a memoized method
+    (i.e. change_domain() called by rebinned()) are not cached unless
+    they are given cache argument explicitly - only the outer call
+    is cached (if caching is enabled for it). Key is built from method name and content hashes
+    of self and all arguments (bound to parameter names, with defaults,
+    without IGNORED_ARGUMENTS). New objects returned by method are
+    stored as plain arrays with metadata and re-created on hit;
+    for in-place methods (returning None) new content of self is stored
+    and copied back into self on hit.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = kwargs.pop('cache', None)
+        if cache is None:
+            # result of outer call is cached (or not) as a whole
+            cache = None if getattr(_state, 'nested', False) else _default_cache
+        elif cache is True:
+            cache = _default_cache if _default_cache is not None else enable()
+        if not cache:
+            return _call(method, self, args, kwargs)
+        try:
+            arguments = _call_arguments(method, self, args, kwargs)
+        except TypeError:
+            # wrong arguments, let the method report them
+            return _call(method, self, args, kwargs)
+        key = content_hash((name, self, arguments))
+        entry = cache.get(key)
+        if entry is None:
+            result = _call(method, self, args, kwargs)
+            if result is None:
+                entry = ('inplace', np.array(self))
+            else:
+                entry = ('new', result.__class__, np.array(result), copy.deepcopy(result.metadata))
+            cache.put(key, entry)
+            return result
+        logger.info('Using cached result of %(name)s', {"name": name})
+        if entry[0] == 'inplace':
+            self[...] = entry[1]
+            return None
+        _, cls, array, metadata = entry
+        # copies, so that cached entry is never modified through returned object
+        result = array.copy().view(cls)
+        result.metadata = copy.deepcopy(metadata)
+        return result
+    return wrapper
+
+
+def main():
+    from beprof import curve
+
+    x = np.linspace(-50, 50, 200001)
+    c = curve.Curve(np.column_stack((x, np.exp(-x ** 2 / 200))), name='demo')
+    cache = TransformCache(directory=tempfile.mkdtemp())
+    for attempt in range(3):
+        start = time.time()
+        c.rebinned(0.01, cache=cache)
+        print('rebinned, call {:d}: {:.4f} s'.format(attempt + 1, time.time() - start))
+    print(cache.stats)
+    cache.clear()
+    os.rmdir(cache.directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import numpy as np
+import datetime
+import numbers
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _column(values):
+    """
+    Typed column for list of metadata values (None when missing):
+    float64 for numbers, datetime64[us] for dates, unicode strings otherwise.
+
+    :return: tuple (np.array of values, boolean np.array marking present values)
+    """
+    present = np.array([v is not None for v in values], dtype=bool)
+    known = [v for v in values if v is not None]
+    if known and all(isinstance(v, numbers.Number) for v in known):
+        data = np.array([v if v is not None else np.nan for v in values], dtype=np.float64)
+    elif known and all(isinstance(v, (datetime.date, np.datetime64)) for v in known):
+        data = np.array([v if v is not None else 'NaT' for v in values], dtype='datetime64[us]')
+    else:
+        data = np.array([u'' if v is None else u'{}'.format(v) for v in values], dtype=np.unicode_)
+    return data, present
+
+
+class MetadataIndex(object):
+    """
+    Columnar index of metadata of a collection of curves.
+
+    Metadata dictionaries are converted once into typed columns
+    (one np.array per metadata key). For every queried column a sorted
+    order is built (once, on first use), so equality and range conditions
+    are resolved with binary search instead of scanning all dictionaries.
+    Curves themselves are not kept in the index: they are obtained with
+    loader(key) only for matching records, so the index can describe
+    curves kept in memory as well as curves stored in files.
+
+    >>> from beprof.curve import Curve
+    >>> curves = [Curve([[0, 1], [1, 2]], gantry=g, energy=e) for g, e in ((1, 70.), (2, 150.), (2, 230.))]
+    >>> index = MetadataIndex.from_curves(curves)
+    >>> print(index.select(gantry=2, energy=(100, None)))
+    [1 2]
+    >>> print([c.metadata['energy'] for c in index.curves(energy=[70, 230])])
+    [70.0, 230.0]
+
+    :param records: iterable of (key, metadata dictionary) pairs
+    :param loader: function returning curve for a key
+    """
+
+    def __init__(self, records, loader=None):
+        keys, dicts = [], []
+        for key, metadata in records:
+            keys.append(key)
+            dicts.append(metadata or {})
+        self.keys = keys
+        self.loader = loader
+        names = sorted(set(name for d in dicts for name in d))
+        logger.info('Building %(name)s of %(n)s records, %(c)s columns',
+                    {"name": self.__class__.__name__, "n": len(keys), "c": len(names)})
+        self.columns = dict((name, _column([d.get(name) for d in dicts])) for name in names)
+        self._orders = {}
+
+    @classmethod
+    def from_curves(cls, curves):
+        """
+        Index of in-memory list of curves, keys are positions in list.
+        """
+        curves = list(curves)
+        return cls(enumerate(c.metadata for c in curves), curves.__getitem__)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _order(self, name):
+        """
+        Row numbers of present values of column sorted by value, and sorted values.
+        """
+        if name not in self._orders:
+            data, present = self.columns[name]
+            rows = np.flatnonzero(present)
+            order = rows[np.argsort(data[rows], kind='mergesort')]
+            self._orders[name] = order, data[order]
+        return self._orders[name]
+
+    def _convert(self, name, value):
+        data = self.columns[name][0]
+        if data.dtype.kind == 'U':
+            return np.array(u'{}'.format(value), dtype=np.unicode_)
+        try:
+            return np.array(value, dtype=data.dtype)
+        except (TypeError, ValueError):
+            kind = 'number' if data.dtype.kind == 'f' else 'date'
+            raise TypeError("Condition on metadata key '{}' must be a {} (column of {}), got {!r}".format(
+                name, kind, data.dtype, value))
+
+    def _rows(self, name, condition):
+        if name not in self.columns:
+            return np.zeros(0, dtype=np.intp)
+        order, values = self._order(name)
+        if isinstance(condition, tuple):
+            lo, hi = condition
+            start = 0 if lo is None else np.searchsorted(values, self._convert(name, lo), side='left')
+            stop = len(values) if hi is None else np.searchsorted(values, self._convert(name, hi), side='right')
+            return order[start:stop]
+        if isinstance(condition, (list, set, frozenset)):
+            parts = [self._rows(name, v) for v in condition]
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.intp)
+        value = self._convert(name, condition)
+        start = np.searchsorted(values, value, side='left')
+        stop = np.searchsorted(values, value, side='right')
+        return order[start:stop]
+
+    def select(self, **conditions):
+        """
+        Numbers of records matching all conditions, in order of records.
+
+        Condition for a metadata key can be a value (equality),
+        a tuple (lo, hi) (inclusive range, None for open end)
+        or a list/set of values (any of them). Values must have type
+        of the column (numbers for numeric keys, dates for date keys),
+        otherwise TypeError is raised.
+
+        :return: sorted np.array of record numbers
+        """
+        mask = np.ones(len(self.keys), dtype=bool)
+        for name, condition in conditions.items():
+            matching = np.zeros(len(self.keys), dtype=bool)
+            matching[self._rows(name, condition)] = True
+            mask &= matching
+        return np.flatnonzero(mask)
+
+    def select_keys(self, **conditions):
+        """
+        Keys of records matching all conditions (see select()).
+        """
+        return [self.keys[i] for i in self.select(**conditions)]
+
+    def curves(self, **conditions):
+        """
+        Generator of curves matching all conditions (see select()),
+        each loaded with loader only when reached.
+        """
+        if self.loader is None:
+            raise ValueError("Index has no loader of curves.")
+        for i in self.select(**conditions):
+            yield self.loader(self.keys[i])
+
+    def save(self, path):
+        """
+        Saves index (keys and columns, not curves) to .npz file.
+        """
+        arrays = {'keys': np.array(self.keys), 'names': np.array(sorted(self.columns), dtype=np.unicode_)}
+        for i, name in enumerate(sorted(self.columns)):
+            arrays['data_{:d}'.format(i)], arrays['present_{:d}'.format(i)] = self.columns[name]
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, loader=None):
+        """
+        Reads index saved with save(), loader is used to get curves for keys.
+        """
+        with np.load(path) as f:
+            index = cls((), loader)
+            index.keys = f['keys'].tolist()
+            index.columns = dict((name, (f['data_{:d}'.format(i)], f['present_{:d}'.format(i)]))
+                                 for i, name in enumerate(f['names'].tolist()))
+        return index
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(0)
+    n = 100000
+    start_date = datetime.datetime(2017, 1, 1)
+    curves = [curve.Curve([[0, 0], [1, 1]], gantry=int(g), energy=float(e),
+                          date=start_date + datetime.timedelta(hours=int(h)), detector=d)
+              for g, e, h, d in zip(rng.randint(1, 4, n), rng.choice([70., 150., 230.], n),
+                                    rng.randint(0, 24 * 365, n), rng.choice(['diode', 'chamber'], n))]
+    week = (datetime.datetime(2017, 6, 1), datetime.datetime(2017, 6, 8))
+
+    start = time.time()
+    found = [c for c in curves if (c.metadata['gantry'], c.metadata['energy']) == (2, 150)
+             if week[0] <= c.metadata['date'] <= week[1]]
+    print('scan of {:d} dictionaries: {:.4f} s, {:d} found'.format(n, time.time() - start, len(found)))
+    start = time.time()
+    index = MetadataIndex.from_curves(curves)
+    print('index built in {:.3f} s'.format(time.time() - start))
+    for attempt in ('first', 'next'):
+        start = time.time()
+        rows = index.select(gantry=2, energy=150, date=week)
+        print('{} query: {:.4f} s, {:d} found'.format(attempt, time.time() - start, len(rows)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import numpy as np
+import collections
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+Moments = collections.namedtuple('Moments', ('total', 'centroid', 'rms', 'skewness', 'kurtosis'))
+Moments.__doc__ = """
+Moments of y treated as distribution over x: total (integral of y),
+centroid (mean x), rms (standard deviation of x), skewness and excess
+kurtosis (0 for normal distribution). Fields are floats, or np.arrays
+for batched calculation.
+"""
+
+
+def _weights(x, y, trapezoid):
+    """
+    Weights of points: y multiplied by trapezoidal rule coefficients
+    (half of distance between neighbouring points) or y itself.
+    Rows of 2D input are separate curves.
+    """
+    if not trapezoid:
+        return np.array(y, dtype=np.float64)
+    dx = np.diff(x, axis=-1)
+    half = np.zeros(np.shape(x))
+    half[..., :-1] += 0.5 * dx
+    half[..., 1:] += 0.5 * dx
+    return half * y
+
+
+def _power_sums(d, w):
+    """
+    Sums of w * d ** k for k = 0..4 along last axis, all terms computed
+    in one buffer by repeated multiplication and reduced at once.
+    """
+    terms = np.empty((5,) + np.shape(d))
+    terms[0] = w
+    for k in range(1, 5):
+        np.multiply(terms[k - 1], d, out=terms[k])
+    sums = terms.sum(axis=-1)
+    return np.rollaxis(sums, 0, sums.ndim)
+
+
+def _from_sums(sums, shift):
+    """
+    Moments from power sums (last axis) of x - shift.
+    """
+    sums = np.asarray(sums, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m1, m2, m3, m4 = (sums[..., k] / sums[..., 0] for k in range(1, 5))
+        # central moments from raw moments about shift
+        var = m2 - m1 ** 2
+        mu3 = m3 - 3 * m1 * m2 + 2 * m1 ** 3
+        mu4 = m4 - 4 * m1 * m3 + 6 * m1 ** 2 * m2 - 3 * m1 ** 4
+        var = np.maximum(var, 0.)
+        skewness = mu3 / var ** 1.5
+        kurtosis = mu4 / var ** 2 - 3.
+    return Moments(sums[..., 0], m1 + shift, np.sqrt(var), skewness, kurtosis)
+
+
+def _scalar(m):
+    return Moments(*(float(v) for v in m))
+
+
+def moments(curve, trapezoid=True):
+    """
+    Centroid, RMS width, skewness and kurtosis of a curve
+    in one pass over its points.
+
+    With trapezoid set, every point is weighted by the width of x
+    interval it represents, so non-uniform sampling does not bias
+    results. Power sums are calculated about the middle of domain
+    to limit cancellation errors.
+
+    >>> from beprof.curve import Curve
+    >>> m = moments(Curve([[0, 0], [1, 1], [2, 2], [3, 1], [4, 0]]))
+    >>> print(m.total, m.centroid, m.rms, m.skewness)
+    4.0 2.0 0.7071067811865476 0.0
+
+    :param curve: Curve object (or array of shape (N, 2))
+    :param trapezoid: use trapezoidal weights
+    :return: Moments named tuple
+    """
+    x = np.asarray(curve[:, 0], dtype=np.float64)
+    y = np.asarray(curve[:, 1], dtype=np.float64)
+    if x.size == 0:
+        return _scalar(_from_sums(np.zeros(5), 0.))
+    shift = 0.5 * (x[0] + x[-1])
+    return _scalar(_from_sums(_power_sums(x - shift, _weights(x, y, trapezoid)), shift))
+
+
+def moments_batch(curves, trapezoid=True):
+    """
+    Moments of many curves. Curves of equal length are stacked into 2D
+    arrays, others are packed into one array and reduced per curve
+    with np.add.reduceat.
+
+    :param curves: list of Curve objects
+    :param trapezoid: use trapezoidal weights
+    :return: Moments named tuple of np.arrays
+    """
+    curves = list(curves)
+    lengths = np.array([len(c) for c in curves], dtype=np.intp)
+    if not curves or np.any(lengths == 0):
+        if not curves:
+            return _from_sums(np.zeros((0, 5)), np.zeros(0))
+        raise ValueError("Moments of empty curves are undefined.")
+    logger.info('Calculating moments of %(n)s curves', {"n": len(curves)})
+    if np.all(lengths == lengths[0]):
+        data = np.asarray(curves, dtype=np.float64)
+        x, y = data[..., 0], data[..., 1]
+        shift = 0.5 * (x[:, 0] + x[:, -1])
+        return _from_sums(_power_sums(x - shift[:, None], _weights(x, y, trapezoid)), shift)
+    data = np.concatenate([np.asarray(c, dtype=np.float64) for c in curves])
+    x, y = data[:, 0], data[:, 1]
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = starts + lengths - 1
+    shift = 0.5 * (x[starts] + x[ends])
+    if trapezoid:
+        half = np.zeros(x.size)
+        dx = 0.5 * np.diff(x)
+        # intervals between last point of one curve and first of next one are dropped
+        dx[ends[:-1]] = 0.
+        half[:-1] += dx
+        half[1:] += dx
+        w = half * y
+    else:
+        w = y
+    d = x - np.repeat(shift, lengths)
+    terms = np.empty((5, x.size))
+    terms[0] = w
+    for k in range(1, 5):
+        np.multiply(terms[k - 1], d, out=terms[k])
+    return _from_sums(np.add.reduceat(terms, starts, axis=1).T, shift)
+
+
+class RunningMoments(object):
+    """
+    Moments of a curve growing by chunks of points (i.e. live scan).
+
+    Power sums are updated only with new points; with trapezoidal weights
+    every new interval between consecutive points adds half of its width
+    to the weights of both of its end points, so results are the same
+    as of moments() of all points (up to rounding).
+
+    >>> r = RunningMoments()
+    >>> r.update([[0, 0], [1, 1]])
+    >>> r.update([[2, 2], [3, 1], [4, 0]])
+    >>> print(r.result().centroid, r.count)
+    2.0 5
+
+    :param trapezoid: use trapezoidal weights
+    """
+
+    def __init__(self, trapezoid=True):
+        self.trapezoid = trapezoid
+        self.count = 0
+        self._sums = np.zeros(5)
+        self._shift = None
+        self._last = None
+
+    def update(self, points):
+        """
+        Adds chunk of points with x increasing (array-like of shape (K, 2)).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if points.shape[0] == 0:
+            return
+        if self._shift is None:
+            # power sums about first point, later points are usually near
+            self._shift = points[0, 0]
+        x, y = points[:, 0], points[:, 1]
+        if self.trapezoid:
+            if self._last is not None:
+                x = np.concatenate(([self._last[0]], x))
+                y = np.concatenate(([self._last[1]], y))
+            half = np.zeros(x.size)
+            dx = 0.5 * np.diff(x)
+            half[:-1] += dx
+            half[1:] += dx
+            w = half * y
+        else:
+            w = y
+        self._sums += _power_sums(x - self._shift, w)
+        self._last = points[-1].copy()
+        self.count += points.shape[0]
+
+    def result(self):
+        """
+        Moments of all points added so far.
+        """
+        return _scalar(_from_sums(self._sums, self._shift or 0.))
+
+
+def main():
+    from beprof import profile
+
+    rng = np.random.RandomState(0)
+    x = np.linspace(-20, 20, 401)
+    profiles = [profile.Profile(np.column_stack((x, np.exp(-(x - c) ** 2 / (2 * w ** 2)))))
+                for c, w in zip(rng.uniform(-2, 2, 5000), rng.uniform(2, 5, 5000))]
+
+    start = time.time()
+    for p in profiles:
+        w = p.y / p.y.sum()
+        c = np.sum(w * p.x)
+        s = np.sqrt(np.sum(w * (p.x - c) ** 2))
+        np.sum(w * (p.x - c) ** 3) / s ** 3
+        np.sum(w * (p.x - c) ** 4) / s ** 4 - 3
+    print('separate reductions: {:.0f} profiles/s'.format(len(profiles) / (time.time() - start)))
+    start = time.time()
+    for p in profiles:
+        moments(p)
+    print('moments(): {:.0f} profiles/s'.format(len(profiles) / (time.time() - start)))
+    start = time.time()
+    moments_batch(profiles)
+    print('moments_batch(): {:.0f} profiles/s'.format(len(profiles) / (time.time() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import numpy as np
+import multiprocessing
+import multiprocessing.pool
+import time
+import logging
+
+from beprof import functions
+
+logger = logging.getLogger(__name__)
+
+# inputs shorter than this are processed serially, thread overhead would dominate
+MIN_CHUNK = 65536
+
+
+def _workers(workers):
+    if workers is None or workers < 1:
+        return multiprocessing.cpu_count()
+    return int(workers)
+
+
+def chunk_bounds(n, chunks, min_chunk=None):
+    """
+    Splits range(n) into at most `chunks` contiguous blocks
+    of at least min_chunk elements (except when n is smaller).
+
+    >>> print(chunk_bounds(10, 3, min_chunk=1))
+    [ 0  3  6 10]
+
+    :return: np.array of block boundaries, starting with 0 and ending with n
+    """
+    if min_chunk is None:
+        min_chunk = MIN_CHUNK
+    chunks = max(1, min(chunks, n // max(min_chunk, 1)))
+    return np.linspace(0, n, chunks + 1).astype(int)
+
+
+def _run(tasks, workers):
+    """
+    Calls all functions from tasks list on a thread pool and
+    returns list of their results (in order of tasks).
+    NumPy releases GIL in most kernels, so threads run in parallel.
+    """
+    pool = multiprocessing.pool.ThreadPool(min(workers, len(tasks)))
+    try:
+        return pool.map(lambda task: task(), tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def medfilt(vector, window, workers=None, min_chunk=None):
+    """
+    Same as functions.medfilt(), computed in chunks on a thread pool.
+
+    Every chunk is extended by a halo of (window - 1) / 2 points
+    on both sides, so each output point sees exactly the same window
+    as in serial computation and result is bit-identical.
+    Only chunk-sized (N, window) matrices are built, which also
+    limits peak memory.
+
+    >>> v = np.array([1., 15., 1., 1., 1., 7., 1.])
+    >>> np.array_equal(medfilt(v, 3, workers=3, min_chunk=1), functions.medfilt(v, 3))
+    True
+
+    :param vector: 1D array
+    :param window: odd window length
+    :param workers: number of threads, defaults to number of CPUs
+    :param min_chunk: minimal number of points in a chunk, defaults to MIN_CHUNK
+    :return: filtered np.array
+    """
+    if not window % 2 == 1:
+        raise ValueError("Median filter length must be odd.")
+    if not vector.ndim == 1:
+        raise ValueError("Input must be one-dimensional.")
+    workers = _workers(workers)
+    bounds = chunk_bounds(len(vector), workers, min_chunk)
+    if len(bounds) == 2:
+        return functions.medfilt(vector, window)
+    logger.info('Running parallel medfilt of %(n)s points in %(c)s chunks on %(w)s threads',
+                {"n": len(vector), "c": len(bounds) - 1, "w": workers})
+    k = (window - 1) // 2
+
+    def task(start, stop):
+        lo, hi = max(start - k, 0), min(stop + k, len(vector))
+        # halo at global edges is missing, medfilt repeats edge values there as in serial case
+        return functions.medfilt(vector[lo:hi], window)[start - lo:stop - lo]
+
+    return np.concatenate(_run([lambda s=s, e=e: task(s, e) for s, e in zip(bounds[:-1], bounds[1:])], workers))
+
+
+def interp(x, xp, fp, left=None, right=None, workers=None, min_chunk=None):
+    """
+    Same as np.interp(), with query points split into blocks
+    interpolated on a thread pool. Every query point is evaluated
+    independently, so result is bit-identical to np.interp().
+
+    >>> xp, fp = np.array([0., 1., 2.]), np.array([0., 10., 0.])
+    >>> print(interp(np.array([-1., 0.5, 1.5, 3.]), xp, fp, left=-1, workers=2, min_chunk=1))
+    [-1.  5.  5.  0.]
+
+    :param x: query points
+    :param xp: increasing x of data points
+    :param fp: y of data points
+    :param left: value for x < xp[0], defaults to fp[0]
+    :param right: value for x > xp[-1], defaults to fp[-1]
+    :param workers: number of threads, defaults to number of CPUs
+    :param min_chunk: minimal number of query points in a block, defaults to MIN_CHUNK
+    :return: np.array of interpolated values (or scalar for scalar x)
+    """
+    x = np.asarray(x)
+    workers = _workers(workers)
+    bounds = chunk_bounds(x.size, workers, min_chunk)
+    if x.ndim != 1 or len(bounds) == 2:
+        return np.interp(x, xp, fp, left=left, right=right)
+    logger.info('Running parallel interp of %(n)s points in %(c)s blocks on %(w)s threads',
+                {"n": x.size, "c": len(bounds) - 1, "w": workers})
+    # convert data once, not in every block
+    xp = np.ascontiguousarray(xp, dtype=np.float64)
+    fp = np.ascontiguousarray(fp)
+
+    def task(start, stop):
+        return np.interp(x[start:stop], xp, fp, left=left, right=right)
+
+    return np.concatenate(_run([lambda s=s, e=e: task(s, e) for s, e in zip(bounds[:-1], bounds[1:])], workers))
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(0)
+    x = np.linspace(0, 1000, 4000001)
+    c = curve.Curve(np.column_stack((x, np.sin(x / 10) + 0.1 * rng.randn(x.size))))
+    domain = np.sort(rng.uniform(0, 1000, 8000000))
+    print('{:d} CPUs'.format(multiprocessing.cpu_count()))
+    for workers in (1, 2, 4, None):
+        start = time.time()
+        filtered = medfilt(c.y, 9, workers=workers)
+        t_medfilt = time.time() - start
+        start = time.time()
+        values = c.evaluate_at_x(domain, workers=workers)
+        t_interp = time.time() - start
+        if workers == 1:
+            reference = filtered, values
+        identical = np.array_equal(reference[0], filtered) and np.array_equal(reference[1], values)
+        print('workers {}: medfilt {:.3f} s, evaluate_at_x {:.3f} s, identical: {}'.format(
+            workers, t_medfilt, t_interp, identical))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from beprof import curve
 from beprof import functions
+from beprof import moments
 import numpy as np
 import logging
 
@@ -26,7 +27,72 @@ class Profile(curve.Curve):
     def __array_finalize__(self, obj):
         if obj is None:
             return
-        self.metadata = getattr(obj, 'metadata', {})
+        super(Profile, self).__array_finalize__(obj)
+        self.axis = getattr(obj, 'axis', None)
+
+    @classmethod
+    def _from_buffers(cls, x, y, metadata=None, sigma=None, axis=None):
+        """
+        Trusted low-overhead constructor, see Curve._from_buffers().
+
+        :param axis: axis attribute of new profile
+        """
+        obj = super(Profile, cls)._from_buffers(x, y, metadata, sigma)
+        obj.axis = axis
+        return obj
+
+    def build_index(self):
+        """
+        Precomputes lookup tables used by x_at_y().
+
+        For each direction of lookup y is scanned once and decomposed
+        into monotone segments: running maximum of y is a non-decreasing
+        table of levels, and first point where it reaches given level
+        is the first point where y >= level. After the index is built
+        x_at_y() queries (scalar ones, i.e. from fwhm and width(), as well
+        as arrays of levels) are binary searches (O(log N) per level)
+        on stored tables. Index is kept in the object cache, so it is
+        dropped when points are modified (see Curve) and x_at_y() falls
+        back to scanning the profile until build_index() is called again.
+
+        >>> p = Profile([[0.0, 5.0], [0.1, 10.0], [0.2, 20.0], [0.3, 10.0]])
+        >>> p.build_index()
+        >>> print(p.x_at_y([7.5, 10.0, 15.0]))
+        [0.05 0.1  0.15]
+        """
+        self._cached('x_at_y', self._inverse_tables)
+        self._cached('max', lambda: np.max(self.y))
+
+    def _inverse_tables(self):
+        logger.info('Building inverse lookup index for %(name)s of %(n)s points',
+                    {"name": self.__class__, "n": len(self)})
+        tables = []
+        for sl in (slice(None), slice(None, None, -1)):
+            # contiguous copies, so that reverse lookup doesn't use strided access
+            x_handle = np.ascontiguousarray(self.x[sl], dtype=np.float64)
+            y_handle = np.ascontiguousarray(self.y[sl], dtype=np.float64)
+            # NaN values are never >= level, fmax skips them
+            levels = np.fmax.accumulate(y_handle)
+            levels[np.isnan(levels)] = -np.inf
+            tables.append((x_handle, y_handle, levels))
+        return tables
+
+    def _x_at_y_indexed(self, y, reverse, tables):
+        x_handle, y_handle, levels = tables[1 if reverse else 0]
+        y = np.asarray(y, dtype=np.float64)
+        # index of first value in y_handle greater or equal than y
+        ind = np.searchsorted(levels, y, side='left')
+        # same boundary conditions as in x_at_y(),
+        # NaN given as y is sorted past the end of levels
+        not_found = (ind == len(levels)) | ((ind == 0) & (y < y_handle[0]))
+        ind = np.minimum(ind, len(levels) - 1)
+        prev = np.maximum(ind - 1, 0)
+        x1, y1, x0, y0 = x_handle[ind], y_handle[ind], x_handle[prev], y_handle[prev]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = (x1 - x0) / (y1 - y0) * (y - y0) + x0
+        result = np.where(y1 == y, x1, result)
+        result[not_found] = np.nan
+        return result[()]
 
     def x_at_y(self, y, reverse=False):
         """
@@ -37,6 +103,11 @@ class Profile(curve.Curve):
         looks from right. If y is outside range of self.y
         then np.nan is returned.
 
+        If y is an array (or other iterable), result is returned for every
+        given level, using lookup tables of whole profile (built for this
+        call only, unless index was built with build_index()).
+        With the index built scalar queries use it as well.
+
         Use inverse lookup to get x-coordinate of first point:
         >>> float(Profile([[0.0, 5.0], [0.1, 10.0], [0.2, 20.0], [0.3, 10.0]])\
             .x_at_y(5.))
@@ -69,12 +140,24 @@ class Profile(curve.Curve):
             .x_at_y(22.0))
         nan
 
-        :param y: reference value
+        Find both edges at many levels at once:
+        >>> print(Profile([[0.0, 5.0], [0.1, 10.0], [0.2, 20.0], [0.3, 10.0]])\
+            .x_at_y([2.0, 10.0, 15.0], reverse=True))
+        [ nan 0.3  0.25]
+
+        :param y: reference value (or array of values)
         :param reverse: boolean value - direction of lookup
         :return: x value corresponding to given y or NaN if not found
         """
         logger.info('Running %(name)s.y_at_x(y=%(y)s, reverse=%(rev)s)',
                     {"name": self.__class__, "y": y, "rev": reverse})
+        tables = self.__dict__.get('_cache', {}).get('x_at_y')
+        if tables is not None:
+            return self._x_at_y_indexed(y, reverse, tables)
+        if np.ndim(y) > 0:
+            # index not requested with build_index(), tables are used once
+            return self._x_at_y_indexed(y, reverse, self._inverse_tables())
+
         # positive or negative direction handles
         x_handle, y_handle = self.x, self.y
         if reverse:
@@ -130,7 +213,23 @@ class Profile(curve.Curve):
         Full width af half-maximum
         :return:
         """
-        return self.width(0.5 * np.max(self.y))
+        # maximum is stored together with the index, so that fwhm doesn't scan y
+        peak = self.__dict__.get('_cache', {}).get('max')
+        return self.width(0.5 * (np.max(self.y) if peak is None else peak))
+
+    def moments(self, trapezoid=True):
+        """
+        Total, centroid, RMS width, skewness and kurtosis of the profile,
+        calculated in one pass (see moments.moments()).
+
+        >>> m = Profile([[0, 0], [1, 1], [2, 2], [3, 1], [4, 0]]).moments()
+        >>> print(m.centroid, m.rms)
+        2.0 0.7071067811865476
+
+        :param trapezoid: weight points with trapezoidal rule (for non-uniform x)
+        :return: moments.Moments named tuple
+        """
+        return moments.moments(self, trapezoid)
 
     def normalize(self, dt, allow_cast=True):
         """
@@ -151,7 +250,8 @@ class Profile(curve.Curve):
             raise ValueError("Expected positive input")
         logger.info('Running %(name)s.normalize(dt=%(dt)s)', {"name": self.__class__, "dt": dt})
         try:
-            ave = np.average(self.y[np.fabs(self.x) <= dt])
+            # average of points with |x| <= dt, using cached cumulative sums
+            ave = self._points_average(-dt, dt)
         except RuntimeWarning as e:
             logger.error('in normalize(). self class is %(name)s, dt=%(dt)s', {"name": self.__class__, "dt": dt})
             raise Exception("Scaling factor error: {0}".format(e))
@@ -0,0 +1,114 @@
+import numpy as np
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Pyramid(object):
+    """
+    Multi-resolution summary of a curve with sorted domain.
+
+    Level 0 are the original points, every next level groups
+    `factor` consecutive blocks of previous level into one block
+    and keeps its x range, mean x, and minimal, maximal and mean y.
+    Levels are built once in O(N) time, using about 5N / (factor - 1)
+    additional values. Query for any x range and resolution picks
+    the finest level with no more blocks in that range than requested,
+    finds the range with binary search and returns views of level
+    arrays, so its cost depends on the size of output, not on N.
+
+    >>> p = Pyramid(np.arange(8.), np.array([0., 1., 0., 5., 0., 1., 0., 0.]), factor=2)
+    >>> len(p.levels)
+    4
+    >>> x, y_min, y_max, y_mean = p.query(0, 7, 2)
+    >>> print(x, y_min, y_max, y_mean)
+    [1.5 5.5] [0. 0.] [5. 1.] [1.5  0.25]
+    """
+
+    def __init__(self, x, y, factor=4):
+        if factor < 2:
+            raise ValueError("Pyramid factor must be at least 2.")
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if np.any(x[1:] < x[:-1]):
+            raise ValueError("Curve domain must be sorted to build a pyramid.")
+        logger.info('Building %(name)s of %(n)s points, factor %(f)s',
+                    {"name": self.__class__.__name__, "n": x.size, "f": factor})
+        self.factor = factor
+        # each level: x_first, x_last, x_mean, y_min, y_max, y_mean
+        # x_first is a strided view of original domain
+        self.levels = [(x, x, x, y, y, y)]
+        block = 1
+        while self.levels[-1][0].size > 1:
+            _, x_last, x_mean, y_min, y_max, y_mean = self.levels[-1]
+            starts = np.arange(0, y_min.size, factor)
+            # number of original points in every block of previous level
+            count = np.full(y_min.size, block, dtype=np.float64)
+            count[-1] = x.size - block * (y_min.size - 1)
+            block *= factor
+            new_count = np.add.reduceat(count, starts)
+            self.levels.append((x[::block],
+                                x_last[np.append(starts[1:], x_last.size) - 1],
+                                np.add.reduceat(x_mean * count, starts) / new_count,
+                                np.minimum.reduceat(y_min, starts),
+                                np.maximum.reduceat(y_max, starts),
+                                np.add.reduceat(y_mean * count, starts) / new_count))
+
+    def level_for(self, a, b, resolution):
+        """
+        Index of the finest level with at most `resolution` blocks in [a, b].
+        """
+        x = self.levels[0][0]
+        n = np.searchsorted(x, b, side='right') - np.searchsorted(x, a, side='left')
+        level = 0
+        while level < len(self.levels) - 1 and n > resolution:
+            n = -(-n // self.factor)
+            level += 1
+        return level
+
+    def query(self, a, b, resolution):
+        """
+        Summary of points with x in [a, b] in at most about `resolution`
+        blocks (one more block can be returned at each end of range
+        when range boundaries fall inside a block).
+
+        :param a: start of x range
+        :param b: end of x range
+        :param resolution: maximal number of blocks requested
+        :return: tuple of np.arrays (x, y_min, y_max, y_mean), where x
+            is mean x of block (views of pyramid data, must not be modified)
+        """
+        level = self.level_for(a, b, resolution)
+        x_first, x_last, x_mean, y_min, y_max, y_mean = self.levels[level]
+        lo = np.searchsorted(x_last, a, side='left')
+        hi = np.searchsorted(x_first, b, side='right')
+        return x_mean[lo:hi], y_min[lo:hi], y_max[lo:hi], y_mean[lo:hi]
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by levels built on top of original points.
+        """
+        return sum(arr.nbytes for level in self.levels[1:] for arr in level[1:])
+
+
+def main():
+    from beprof import curve
+
+    rng = np.random.RandomState(0)
+    x = np.linspace(0, 1000, 4000000)
+    c = curve.Curve(np.column_stack((x, np.sin(x / 10) + 0.1 * rng.randn(x.size))))
+    start = time.time()
+    p = c.pyramid()
+    print('Pyramid of {:d} points: {:d} levels, {:.1f} MB, built in {:.3f} s'.format(
+        len(c), len(p.levels), p.nbytes / 1e6, time.time() - start))
+    for a, b in ((0, 1000), (100, 200), (500, 500.5)):
+        start = time.time()
+        for _ in range(1000):
+            result = p.query(a, b, 1000)
+        print('query [{}, {}]: {:d} blocks, {:.1f} us'.format(a, b, len(result[0]), (time.time() - start) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
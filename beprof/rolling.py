@@ -0,0 +1,266 @@
+import numpy as np
+import bisect
+import time
+import logging
+
+from beprof import functions
+
+logger = logging.getLogger(__name__)
+
+# scale factor making MAD a consistent estimator of standard deviation for normal distribution
+MAD_SCALE = 1.4826
+
+# below this window functions.medfilt() (vectorized, (N, window) matrix) is faster
+# than incremental sorted window, measured with 200k points
+MEDFILT_MAX_WINDOW = 41
+
+# below this window median and MAD are calculated with np.median() over blocks
+# of strided (N, window) view, faster than incremental sorted window (200k points)
+MEDIAN_MAD_MAX_WINDOW = 101
+
+# number of window values processed at once by vectorized median and MAD
+BLOCK_SIZE = 2 ** 20
+
+
+def _check(vector, window):
+    if not window % 2 == 1 or window < 1:
+        raise ValueError("Window length must be odd and positive.")
+    vector = np.asarray(vector, dtype=np.float64)
+    if not vector.ndim == 1:
+        raise ValueError("Input must be one-dimensional.")
+    return vector
+
+
+def _padded(vector, window):
+    # windows are centered, values at edges are repeated (same as in functions.medfilt)
+    k = (window - 1) // 2
+    return np.pad(vector, (k, k), mode='edge') if vector.size else vector
+
+
+def rolling_mean(vector, window):
+    """
+    Mean over centered sliding window (edge values repeated),
+    calculated from cumulative sums in O(N) regardless of window.
+
+    >>> print(rolling_mean(np.array([3., 0., 0., 3., 0.]), 3))
+    [2. 1. 1. 1. 1.]
+    """
+    vector = _check(vector, window)
+    sums = np.concatenate(([0.], np.cumsum(_padded(vector, window))))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def rolling_std(vector, window):
+    """
+    Standard deviation (ddof=0) over centered sliding window
+    (edge values repeated), calculated from cumulative sums in O(N)
+    (exact up to rounding errors of the sums).
+
+    >>> print(np.round(rolling_std(np.array([1., 1., 1., 4., 1.]), 3), 4))
+    [0.     0.     1.4142 1.4142 1.4142]
+    """
+    vector = _check(vector, window)
+    padded = _padded(vector, window)
+    # shift improves accuracy of sum of squares
+    padded = padded - (np.mean(vector) if vector.size else 0.)
+    sums = np.concatenate(([0.], np.cumsum(padded)))
+    squares = np.concatenate(([0.], np.cumsum(padded ** 2)))
+    mean = (sums[window:] - sums[:-window]) / window
+    variance = (squares[window:] - squares[:-window]) / window - mean ** 2
+    return np.sqrt(np.maximum(variance, 0.))
+
+
+def _windows(vector, window):
+    """
+    Read-only (N, window) view of centered sliding windows (edge values
+    repeated), rows of the view share memory of one padded copy of vector.
+    """
+    padded = _padded(vector, window)
+    step = padded.strides[0]
+    windows = np.lib.stride_tricks.as_strided(padded, shape=(vector.size, window), strides=(step, step))
+    windows.flags.writeable = False
+    return windows
+
+
+def _sorted_windows(vector, window):
+    """
+    Yields sorted content of centered sliding window for every point.
+    Window is updated incrementally - position of removed and inserted
+    value is found with binary search (O(log window) comparisons), list
+    del and insert move O(window) pointers at every step.
+    The same list object is yielded every time, it must not be modified.
+    """
+    padded = _padded(vector, window).tolist()
+    current = sorted(padded[:window])
+    yield current
+    for old, new in zip(padded, padded[window:]):
+        del current[bisect.bisect_left(current, old)]
+        bisect.insort(current, new)
+        yield current
+
+
+def rolling_quantile(vector, window, q):
+    """
+    Quantile q (0 <= q <= 1, linear interpolation as in np.quantile)
+    over centered sliding window with edge values repeated.
+    Unlike functions.medfilt() no (N, window) matrix is built.
+    NaN values are not supported.
+
+    >>> print(rolling_quantile(np.array([1., 15., 1., 1., 1.]), 3, 0.5))
+    [1. 1. 1. 1. 1.]
+
+    :param vector: 1D array
+    :param window: odd window length
+    :param q: quantile or sequence of quantiles
+    :return: np.array of shape (N,) or (len(q), N)
+    """
+    vector = _check(vector, window)
+    qs = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    if np.any((qs < 0) | (qs > 1)):
+        raise ValueError("Quantiles must be in [0, 1] range.")
+    pos = qs * (window - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, window - 1)
+    frac = pos - lo
+    result = np.empty((qs.size, vector.size))
+    for i, current in enumerate(_sorted_windows(vector, window) if vector.size else ()):
+        for j in range(qs.size):
+            a, b = current[lo[j]], current[hi[j]]
+            result[j, i] = a + (b - a) * frac[j] if frac[j] else a
+    return result[0] if np.ndim(q) == 0 else result
+
+
+def rolling_median(vector, window):
+    """
+    Median over centered sliding window, same result as functions.medfilt().
+
+    Windows shorter than MEDFILT_MAX_WINDOW are passed to functions.medfilt(),
+    which is faster for them (about 7x for window 5). Longer windows use
+    incrementally updated sorted window (see rolling_quantile()), which
+    costs a binary search and a list update (O(window) memory move, but
+    a small constant) per point instead of sorting (N, window) matrix,
+    so it is faster and uses less memory for wide windows.
+
+    >>> print(rolling_median(np.array([15., 1., 1., 1., 1.]), 3))
+    [15.  1.  1.  1.  1.]
+    """
+    vector = _check(vector, window)
+    if window < MEDFILT_MAX_WINDOW and vector.size:
+        return functions.medfilt(vector, window)
+    return rolling_quantile(vector, window, 0.5)
+
+
+def _kth_deviation(current, k):
+    """
+    k-th smallest (counting from 0) of |v - median| for sorted list current
+    of odd length. Deviations to the left and to the right of the median
+    form two sorted sequences, k-th element of their union is found
+    with binary search in O(log window).
+    """
+    m = (len(current) - 1) // 2
+    med = current[m]
+
+    def left(i):  # i-th smallest deviation on the left side, i = 0 is the median itself
+        return med - current[m - i]
+
+    def right(i):  # i-th smallest deviation on the right side (i >= 1)
+        return current[m + i] - med
+
+    # take i values from the left sequence (including median) and k + 1 - i from the right one
+    lo, hi = max(1, k + 1 - m), min(k + 1, m + 1)
+    while lo < hi:
+        i = (lo + hi) // 2
+        j = k + 1 - i
+        if j > 0 and i <= m and right(j) > left(i):
+            lo = i + 1
+        else:
+            hi = i
+    i, j = lo, k + 1 - lo
+    candidates = []
+    if i >= 1:
+        candidates.append(left(i - 1))
+    if j >= 1:
+        candidates.append(right(j))
+    return max(candidates)
+
+
+def rolling_median_mad(vector, window):
+    """
+    Median and median absolute deviation (MAD, not scaled) over
+    centered sliding window with edge values repeated.
+
+    Windows shorter than MEDIAN_MAD_MAX_WINDOW are processed with
+    np.median() over blocks of strided window view (BLOCK_SIZE values
+    at a time, so memory use does not grow with N). Longer windows
+    use incrementally updated sorted window in one pass: binary
+    search and list update per point, MAD found with binary search
+    over deviations on both sides of the median.
+
+    >>> med, mad = rolling_median_mad(np.array([1., 2., 9., 4., 5.]), 3)
+    >>> print(med, mad)
+    [1. 2. 4. 5. 5.] [0. 1. 2. 1. 0.]
+
+    :return: tuple of np.arrays (median, MAD)
+    """
+    vector = _check(vector, window)
+    k = (window - 1) // 2
+    median = np.empty(vector.size)
+    mad = np.empty(vector.size)
+    if window < MEDIAN_MAD_MAX_WINDOW:
+        windows = _windows(vector, window) if vector.size else np.empty((0, window))
+        rows = max(BLOCK_SIZE // window, 1)
+        for start in range(0, vector.size, rows):
+            block = windows[start:start + rows]
+            median[start:start + rows] = np.median(block, axis=1)
+            mad[start:start + rows] = np.median(np.fabs(block - median[start:start + rows, np.newaxis]), axis=1)
+        return median, mad
+    for i, current in enumerate(_sorted_windows(vector, window) if vector.size else ()):
+        median[i] = current[k]
+        mad[i] = _kth_deviation(current, k)
+    return median, mad
+
+
+def hampel(vector, window=7, n_sigmas=3.0):
+    """
+    Hampel filter: values differing from rolling median by more than
+    n_sigmas robust standard deviations (MAD_SCALE * MAD) are
+    treated as outliers and replaced by the rolling median.
+
+    >>> filtered, outliers = hampel(np.array([1., 1.1, 0.9, 25., 1., 1.05, 0.95]), 5)
+    >>> print(filtered)
+    [1.   1.1  0.9  1.05 1.   1.05 0.95]
+    >>> print(outliers.nonzero()[0])
+    [3]
+
+    :param vector: 1D array
+    :param window: odd window length
+    :param n_sigmas: threshold in units of robust standard deviation
+    :return: tuple (filtered np.array, boolean np.array marking outliers)
+    """
+    median, mad = rolling_median_mad(vector, window)
+    vector = np.asarray(vector, dtype=np.float64)
+    outliers = np.fabs(vector - median) > n_sigmas * MAD_SCALE * mad
+    return np.where(outliers, median, vector), outliers
+
+
+def main():
+    rng = np.random.RandomState(0)
+    vector = rng.randn(200000)
+    for window in (5, 51, 501):
+        start = time.time()
+        functions.medfilt(vector, window)
+        t_matrix = time.time() - start
+        start = time.time()
+        rolling_median(vector, window)
+        t_rolling = time.time() - start
+        print('window {:4d}: medfilt {:.3f} s, rolling_median {:.3f} s'.format(window, t_matrix, t_rolling))
+    start = time.time()
+    hampel(vector, 51)
+    print('hampel, window 51: {:.3f} s'.format(time.time() - start))
+    start = time.time()
+    hampel(vector, 201)
+    print('hampel, window 201: {:.3f} s'.format(time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import numpy as np
+import copy
+import time
+import logging
+
+from beprof import moments
+from beprof import profile
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileStack(object):
+    """
+    Sequence of profiles measured on the same x grid (i.e. time-resolved
+    readouts of a monitor), stored as one x array and a matrix of y values
+    (one row per profile).
+
+    Buffer of the stack is a single (1 + capacity, N) array: first row holds x,
+    following rows hold y of profiles. Thanks to that i-th profile is
+    available as a Profile view of the buffer (no copy of x nor y):
+    its first column is the shared x row and second column is its y row,
+    at a constant distance in memory. Modifying y of such view modifies
+    the stack, modifying its x modifies x of all profiles.
+    Views are valid until the buffer is reallocated by one of next appends.
+
+    With ring set, capacity is fixed and appending to full stack
+    overwrites the oldest profiles. Otherwise buffer grows geometrically.
+
+    Widths, edges, moments and normalization are calculated for all rows
+    at once with operations on the y matrix.
+
+    >>> s = ProfileStack([0, 1, 2, 3, 4], [[0, 1, 2, 1, 0], [0, 2, 4, 2, 0]], capacity=2, ring=True, monitor='ic')
+    >>> print(s.fwhm())
+    [2. 2.]
+    >>> s.append([0, 0, 1, 1, 0])
+    >>> print(len(s), s[0].y, s[-1].metadata)
+    2 [0. 2. 4. 2. 0.] {'monitor': 'ic'}
+    >>> print(s.x_at_y(0.5))
+    [0.25 1.5 ]
+
+    :param x: positions shared by all profiles
+    :param y: optional initial profiles, array-like of shape (T, N)
+    :param capacity: number of profiles buffer is allocated for
+    :param ring: keep at most capacity newest profiles
+    :param axis: axis attribute of Profile views
+    """
+
+    def __init__(self, x, y=None, capacity=16, ring=False, axis=None, **meta):
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim != 1:
+            raise IndexError('Invalid format of x - shape is %s, must be (N,)' % str(x.shape))
+        capacity = max(int(capacity), 1)
+        if y is not None and not ring:
+            capacity = max(capacity, len(y))
+        self._buffer = np.empty((1 + capacity, x.size), dtype=np.float64)
+        self._buffer[0] = x
+        self._start = 0
+        self._count = 0
+        self.ring = ring
+        self.axis = axis
+        self.metadata = copy.deepcopy(meta)
+        logger.info('Creating %(name)s of %(n)s points per profile, capacity %(c)s',
+                    {"name": self.__class__.__name__, "n": x.size, "c": capacity})
+        if y is not None:
+            self.extend(y)
+
+    @classmethod
+    def from_profiles(cls, profiles, ring=False, **meta):
+        """
+        Stack of profiles sharing the same x (metadata of profiles is dropped).
+        """
+        profiles = list(profiles)
+        if not profiles:
+            raise ValueError("Expected at least one profile.")
+        x = profiles[0].x
+        for p in profiles[1:]:
+            if not np.array_equal(p.x, x):
+                raise ValueError("Profiles of stack must have the same x.")
+        return cls(x, [p.y for p in profiles], capacity=len(profiles), ring=ring,
+                   axis=getattr(profiles[0], 'axis', None), **meta)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._buffer.shape[0] - 1
+
+    @property
+    def x(self):
+        return self._buffer[0]
+
+    def _rows(self):
+        """
+        Rows of buffer in use, in storage order (see _order()), no copy.
+        """
+        return self._buffer[1:1 + self._count]
+
+    def _order(self):
+        """
+        Storage rows in order of appending, None if storage order is the same.
+        """
+        if self._start == 0:
+            return None
+        return (self._start + np.arange(self._count)) % self.capacity
+
+    def _ordered(self, values):
+        order = self._order()
+        return values if order is None else values[order]
+
+    @property
+    def y(self):
+        """
+        Matrix of y values (T, N), oldest profile first.
+        A view of the buffer, unless ring buffer has wrapped around.
+        """
+        return self._ordered(self._rows())
+
+    def _reserve(self, count):
+        capacity = self.capacity
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        logger.info('Growing %(name)s buffer to %(c)s profiles', {"name": self.__class__.__name__, "c": capacity})
+        buffer = np.empty((1 + capacity, self._buffer.shape[1]), dtype=np.float64)
+        buffer[:1 + self._count] = self._buffer[:1 + self._count]
+        self._buffer = buffer
+
+    def append(self, y):
+        """
+        Appends single profile given by its y values.
+        """
+        self.extend(np.asarray(y, dtype=np.float64)[np.newaxis])
+
+    def extend(self, rows):
+        """
+        Appends many profiles at once.
+
+        :param rows: array-like of shape (K, N)
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != self._buffer.shape[1]:
+            raise IndexError('Invalid format of rows - shape is %s, must be (K, %d)' % (
+                str(rows.shape), self._buffer.shape[1]))
+        k = rows.shape[0]
+        if not self.ring:
+            self._reserve(self._count + k)
+            self._buffer[1 + self._count:1 + self._count + k] = rows
+            self._count += k
+            return
+        capacity = self.capacity
+        # rows which would be overwritten within this call are not stored at all
+        skip = max(k - capacity, 0)
+        slots = (self._start + self._count + np.arange(skip, k)) % capacity
+        self._buffer[1 + slots] = rows[skip:]
+        total = self._count + k
+        if total > capacity:
+            self._start = (self._start + total - capacity) % capacity
+            self._count = capacity
+        else:
+            self._count = total
+
+    def __getitem__(self, i):
+        """
+        Profile view of i-th profile (oldest first), sharing memory with the stack.
+        """
+        if not -self._count <= i < self._count:
+            raise IndexError("Profile index out of range.")
+        slot = (self._start + i % self._count) % self.capacity
+        itemsize = self._buffer.itemsize
+        # x at offset 0, y of slot one (1 + slot) rows further
+        points = np.lib.stride_tricks.as_strided(self._buffer, shape=(self._buffer.shape[1], 2),
+                                                 strides=(itemsize, (1 + slot) * self._buffer.strides[0]))
+        obj = points.view(profile.Profile)
+        obj.metadata = self.metadata
+        obj.axis = self.axis
+        return obj
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def x_at_y(self, y, reverse=False):
+        """
+        Profile.x_at_y() for every profile.
+
+        :param y: level, scalar or array with one level per profile
+        :param reverse: look from right
+        :return: np.array of x values (NaN where level is not reached)
+        """
+        rows = self._ordered(self._rows())
+        x = self.x
+        if reverse:
+            rows, x = rows[:, ::-1], x[::-1]
+        levels = np.broadcast_to(np.asarray(y, dtype=np.float64), (self._count,))
+        cond = rows >= levels[:, np.newaxis]
+        ind = np.argmax(cond, axis=1)
+        index = np.arange(self._count)
+        prev = np.maximum(ind - 1, 0)
+        x1, y1, x0, y0 = x[ind], rows[index, ind], x[prev], rows[index, prev]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = (x1 - x0) / (y1 - y0) * (levels - y0) + x0
+        result = np.where(y1 == levels, x1, result)
+        # same boundary conditions as in Profile.x_at_y()
+        result[~cond[index, ind] | ((ind == 0) & (levels < rows[:, 0]))] = np.nan
+        return result
+
+    def width(self, level):
+        """
+        Width of every profile at given level (scalar or one per profile).
+        """
+        return self.x_at_y(level, reverse=True) - self.x_at_y(level)
+
+    def fwhm(self):
+        """
+        Full width at half-maximum of every profile.
+        """
+        return self.width(0.5 * self.max())
+
+    def max(self):
+        """
+        Maximal y of every profile.
+        """
+        return self._ordered(self._rows().max(axis=1))
+
+    def moments(self, trapezoid=True):
+        """
+        Moments of every profile (see moments.moments()).
+
+        :return: moments.Moments named tuple of np.arrays
+        """
+        x = self.x
+        shift = 0.5 * (x[0] + x[-1])
+        rows = self._rows()
+        d = np.broadcast_to(x - shift, rows.shape)
+        m = moments._from_sums(moments._power_sums(d, moments._weights(x, rows, trapezoid)),
+                               np.full(self._count, shift))
+        return moments.Moments(*(self._ordered(v) for v in m))
+
+    def centroid(self, trapezoid=True):
+        """
+        Centroid (mean x weighted by y) of every profile.
+        """
+        return self.moments(trapezoid).centroid
+
+    def normalize(self, dt):
+        """
+        Normalizes every profile to 1 over [-dt, +dt] area (as Profile.normalize()),
+        in place. Nothing is modified if factor of any profile is undefined.
+
+        :return: np.array of applied factors
+        """
+        if dt <= 0:
+            raise ValueError("Expected positive input")
+        logger.info('Running %(name)s.normalize(dt=%(dt)s)', {"name": self.__class__.__name__, "dt": dt})
+        inside = np.abs(self.x) <= dt
+        rows = self._rows()
+        if not inside.any():
+            raise ValueError("Scaling factor error: no points in [-{0}, {0}]".format(dt))
+        ave = rows[:, inside].mean(axis=1)
+        bad = ~np.isfinite(ave) | (ave == 0)
+        if bad.any():
+            logger.error('Normalization factors of %(n)s profiles are undefined', {"n": int(bad.sum())})
+            raise ValueError("Scaling factor error for profiles {}".format(
+                np.flatnonzero(self._ordered(bad))[:10].tolist()))
+        rows /= ave[:, np.newaxis]
+        return self._ordered(ave)
+
+
+def main():
+    rng = np.random.RandomState(0)
+    x = np.linspace(-20, 20, 401)
+    n = 10000
+    sigmas = rng.uniform(2, 4, n)
+    y = np.exp(-(x[np.newaxis] - rng.uniform(-1, 1, (n, 1))) ** 2 / (2 * sigmas[:, np.newaxis] ** 2))
+
+    profiles = [profile.Profile(np.column_stack((x, row))) for row in y]
+    start = time.time()
+    widths = [p.fwhm for p in profiles]
+    print('Profile.fwhm: {:.0f} profiles/s'.format(n / (time.time() - start)))
+    start = time.time()
+    centroids = [p.moments().centroid for p in profiles]
+    print('Profile.moments(): {:.0f} profiles/s'.format(n / (time.time() - start)))
+
+    stack = ProfileStack(x, capacity=1000, ring=True)
+    start = time.time()
+    for row in y:
+        stack.append(row)
+    print('ProfileStack.append(), ring of 1000: {:.0f} profiles/s'.format(n / (time.time() - start)))
+    stack = ProfileStack(x, y)
+    start = time.time()
+    stack_widths = stack.fwhm()
+    print('ProfileStack.fwhm(): {:.0f} profiles/s'.format(n / (time.time() - start)))
+    start = time.time()
+    stack_centroids = stack.centroid()
+    print('ProfileStack.centroid(): {:.0f} profiles/s'.format(n / (time.time() - start)))
+    print('max differences: fwhm {:.2e}, centroid {:.2e}'.format(np.max(np.abs(stack_widths - widths)),
+                                                                 np.max(np.abs(stack_centroids - centroids))))
+    print('memory: {:d} B as stack, {:d} B as profiles'.format(stack._buffer.nbytes,
+                                                               sum(p.nbytes for p in profiles)))
+
+
+if __name__ == '__main__':
+    main()
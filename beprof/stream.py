@@ -0,0 +1,231 @@
+import numpy as np
+import copy
+import time
+import logging
+
+from beprof import curve
+from beprof import functions
+from beprof import moments
+
+logger = logging.getLogger(__name__)
+
+
+def _crossing(x_a, y_a, x_b, y_b, level):
+    """
+    x where line through (x_a, y_a), (x_b, y_b) reaches level,
+    same formula as used by np.interp.
+    """
+    if y_b == level:
+        return x_b
+    return (x_b - x_a) / (y_b - y_a) * (level - y_a) + x_a
+
+
+class AppendableCurve(object):
+    """
+    Curve growing point by point, i.e. during live acquisition.
+
+    Points are stored in a preallocated buffer which grows geometrically,
+    so that appending N points costs amortized O(N) instead of O(N^2)
+    for repeated concatenation and Curve() construction.
+    Property curve returns a Curve object which is a view of the buffer
+    (no copy of points, no copy of metadata). This view is valid until
+    the buffer is reallocated by one of the next appends.
+
+    Running maximum and FWHM are updated incrementally using
+    only the newly appended points. If smooth_window is given,
+    median filtered copy of data (same as functions.medfilt() on all points)
+    is maintained - only outputs affected by new points are recalculated.
+    If track_moments is set, moments of data (see moments.RunningMoments)
+    are updated with every append as well.
+
+    >>> s = AppendableCurve(capacity=2, description='live scan')
+    >>> s.append(0, 1)
+    >>> s.extend([[1, 3], [2, 4], [3, 3], [4, 1]])
+    >>> print(len(s), s.max, s.fwhm)
+    5 4.0 3.0
+    >>> print(s.curve.y)
+    [1. 3. 4. 3. 1.]
+    >>> print(s.curve.metadata)
+    {'description': 'live scan'}
+    """
+
+    def __init__(self, capacity=1024, curve_class=curve.Curve, smooth_window=None, track_moments=False, **meta):
+        if smooth_window is not None and not smooth_window % 2 == 1:
+            raise ValueError("Median filter length must be odd.")
+        self._buffer = np.empty((max(int(capacity), 1), 2), dtype=np.float64)
+        self._smoothed = np.empty_like(self._buffer) if smooth_window is not None else None
+        self._size = 0
+        self.curve_class = curve_class
+        self.smooth_window = smooth_window
+        self.metadata = copy.deepcopy(meta)
+        self._max = -np.inf
+        self._left = None
+        self._right = None
+        self._moments = moments.RunningMoments() if track_moments else None
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        capacity = self._buffer.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        logger.info('Growing %(name)s buffer to %(c)s points', {"name": self.__class__.__name__, "c": capacity})
+        buffer = np.empty((capacity, 2), dtype=np.float64)
+        buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = buffer
+        if self._smoothed is not None:
+            smoothed = np.empty_like(buffer)
+            smoothed[:self._size] = self._smoothed[:self._size]
+            self._smoothed = smoothed
+
+    def append(self, x, y):
+        """
+        Appends single point (x, y).
+        """
+        self.extend(((x, y),))
+
+    def extend(self, points):
+        """
+        Appends many points at once.
+
+        :param points: array-like of shape (K, 2) (i.e. Curve or list of pairs)
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise IndexError('Invalid format of points - ' 'shape is %s, must be (X, 2)' % str(points.shape))
+        old, new = self._size, self._size + points.shape[0]
+        if new == old:
+            return
+        self._reserve(new)
+        self._buffer[old:new] = points
+        self._size = new
+        self._update_fwhm(old)
+        if self._smoothed is not None:
+            self._update_smoothed(old)
+        if self._moments is not None:
+            self._moments.update(self._buffer[old:new])
+
+    def _view(self, buffer):
+        obj = buffer[:self._size].view(self.curve_class)
+        obj.metadata = self.metadata
+        return obj
+
+    @property
+    def curve(self):
+        """
+        Curve view of all points appended so far (no copy).
+        """
+        return self._view(self._buffer)
+
+    @property
+    def smoothed(self):
+        """
+        Curve view of median filtered points, None if smooth_window was not set.
+        """
+        if self._smoothed is None:
+            return None
+        return self._view(self._smoothed)
+
+    @property
+    def moments(self):
+        """
+        Moments of appended points (moments.Moments), None if track_moments was not set.
+        """
+        if self._moments is None:
+            return None
+        return self._moments.result()
+
+    @property
+    def max(self):
+        """
+        Running maximum of y.
+        """
+        return self._max if self._size else np.nan
+
+    def _first_at_least(self, level, start):
+        # search in blocks of growing size, cost is proportional to distance travelled
+        y = self._buffer[:self._size, 1]
+        block = 256
+        while start < self._size:
+            cond = y[start:start + block] >= level
+            if cond.any():
+                return start + int(np.argmax(cond))
+            start += block
+            block *= 2
+        return None
+
+    def _update_fwhm(self, old):
+        y = self._buffer[old:self._size, 1]
+        chunk_max = np.nanmax(y) if not np.all(np.isnan(y)) else -np.inf
+        half_changed = chunk_max > self._max
+        if half_changed:
+            self._max = chunk_max
+        level = 0.5 * self._max
+        # left edge - first point >= level, moves only to the right when level grows,
+        # if it was not found yet all old points are below level
+        if self._left is None:
+            self._left = self._first_at_least(level, old)
+        elif half_changed:
+            self._left = self._first_at_least(level, self._left)
+        # right edge - last point >= level, always in the new chunk if anything changed
+        hits = np.flatnonzero(y >= level)
+        if hits.size:
+            self._right = old + int(hits[-1])
+        elif half_changed:
+            self._right = None
+
+    @property
+    def fwhm(self):
+        """
+        Full width at half-maximum, same as Profile.fwhm of appended points.
+        """
+        if self._left is None or self._right is None:
+            return np.nan
+        level = 0.5 * self._max
+        x, y = self._buffer[:self._size, 0], self._buffer[:self._size, 1]
+        i, j = self._left, self._right
+        if i == 0:
+            if level < y[0]:
+                return np.nan
+            left = x[0]
+        else:
+            left = _crossing(x[i - 1], y[i - 1], x[i], y[i], level)
+        if j == self._size - 1:
+            if level < y[j]:
+                return np.nan
+            right = x[j]
+        else:
+            right = _crossing(x[j + 1], y[j + 1], x[j], y[j], level)
+        return float(right - left)
+
+    def _update_smoothed(self, old):
+        k = (self.smooth_window - 1) // 2
+        # outputs from old - k on depended on right edge padding
+        start = max(old - k, 0)
+        lo = max(start - k, 0)
+        filtered = functions.medfilt(self._buffer[lo:self._size, 1], self.smooth_window)
+        self._smoothed[old:self._size, 0] = self._buffer[old:self._size, 0]
+        self._smoothed[start:self._size, 1] = filtered[start - lo:]
+
+
+def main():
+    rng = np.random.RandomState(0)
+    x = np.linspace(-50, 50, 200000)
+    y = np.exp(-x ** 2 / 200) + 0.01 * rng.randn(x.size)
+    packets = np.array_split(np.column_stack((x, y)), 20000)
+
+    start = time.time()
+    s = AppendableCurve(smooth_window=5, name='demo')
+    for packet in packets:
+        s.extend(packet)
+        s.fwhm
+    print('AppendableCurve: {:d} points in {:d} packets, {:.3f} s'.format(len(s), len(packets), time.time() - start))
+    print('FWHM: {:.4f}, max: {:.4f}'.format(s.fwhm, s.max))
+    print(s.curve)
+
+
+if __name__ == '__main__':
+    main()
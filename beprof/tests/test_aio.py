@@ -0,0 +1,101 @@
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import aio
+from beprof import loader
+from beprof.curve import Curve
+from beprof.profile import Profile
+
+
+class TestAsyncLoading(TestCase):
+    """
+    Testing asyncio loaders of curves
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(25):
+            self.paths.append(os.path.join(self.directory, 'p{:02d}.dat'.format(i)))
+            np.savetxt(self.paths[-1], [[0, i], [1, 2 * i], [2, i]])
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.directory)
+
+    def test_load_in_order(self):
+        curves = self.loop.run_until_complete(aio.load_curves(self.paths, concurrency=4, curve_class=Curve,
+                                                              source='test'))
+        self.assertEqual(len(curves), len(self.paths))
+        for i, c in enumerate(curves):
+            self.assertIs(type(c), Curve)
+            self.assertTrue(np.array_equal(c.y, [i, 2 * i, i]))
+            self.assertEqual(c.metadata, {'filename': 'p{:02d}.dat'.format(i), 'source': 'test'})
+
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def load(path):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            try:
+                return loader.load_curve(path)
+            finally:
+                with lock:
+                    state['running'] -= 1
+
+        async def consume():
+            found = []
+            async for path, c in aio.iter_curves(self.paths, concurrency=3, load=load):
+                self.assertIsInstance(c, Profile)
+                found.append(path)
+                # slow consumer
+                await asyncio.sleep(0.001)
+            return found
+
+        found = self.loop.run_until_complete(consume())
+        self.assertEqual(sorted(found), self.paths)
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_attributes(self):
+        def load(path):
+            p = Profile(loader.load_curve(path), axis='x')
+            # metadata keys clashing with constructor arguments
+            p.metadata = {'dtype': 'diode', 'order': 1, 'axis': 'y'}
+            return p
+
+        curves = self.loop.run_until_complete(aio.load_curves(self.paths[:3], load=load))
+        for i, c in enumerate(curves):
+            self.assertIsInstance(c, Profile)
+            self.assertEqual(c.axis, 'x')
+            self.assertEqual(c.metadata, {'dtype': 'diode', 'order': 1, 'axis': 'y'})
+            self.assertTrue(np.array_equal(c.y, [i, 2 * i, i]))
+        # data sent from worker processes
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            curves = self.loop.run_until_complete(aio.load_curves(self.paths[:3], executor=executor, source='test'))
+        self.assertEqual(curves[2].metadata, {'filename': 'p02.dat', 'source': 'test'})
+        self.assertTrue(np.array_equal(curves[2].y, [2, 4, 2]))
+
+    def test_errors(self):
+        paths = self.paths[:3] + [os.path.join(self.directory, 'missing.dat')]
+
+        async def consume():
+            return [item async for item in aio.iter_curves(paths, 2, return_exceptions=True)]
+
+        results = dict(self.loop.run_until_complete(consume()))
+        self.assertIsInstance(results[paths[-1]], (IOError, OSError))
+        self.assertIsInstance(results[paths[0]], Profile)
+        with self.assertRaises((IOError, OSError)):
+            self.loop.run_until_complete(aio.load_curves(paths))
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(aio.load_curves(paths, concurrency=0))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import align
+from beprof.profile import Profile
+
+
+def _profile(x, shift, **meta):
+    return Profile(np.column_stack((x, 1 / (1 + np.exp(np.abs(x - shift) - 5)))), **meta)
+
+
+class TestAlign(TestCase):
+    """
+    Testing FFT cross-correlation shift estimation
+    """
+    def setUp(self):
+        self.x = np.linspace(-15, 15, 301)
+        self.reference = _profile(self.x, 0.)
+        self.shifts = np.array([-0.83, -0.25, 0., 0.04, 0.5, 1.37])
+
+    def test_estimate_shifts(self):
+        curves = [_profile(self.x, s) for s in self.shifts]
+        estimated = align.estimate_shifts(self.reference, curves)
+        self.assertTrue(np.allclose(estimated, self.shifts, atol=0.01))
+        self.assertAlmostEqual(align.estimate_shift(self.reference, curves[-1]), 1.37, places=2)
+        # different sampling of curve and reference
+        coarse = _profile(np.linspace(-12, 14, 131), 0.6)
+        self.assertAlmostEqual(align.estimate_shift(self.reference, coarse), 0.6, delta=0.02)
+        self.assertEqual(align.estimate_shifts(self.reference, []).size, 0)
+
+    def test_max_shift(self):
+        far = _profile(self.x, 4.)
+        self.assertAlmostEqual(align.estimate_shift(self.reference, far), 4., delta=0.01)
+        self.assertLessEqual(abs(align.estimate_shift(self.reference, far, max_shift=1.)), 1.05)
+
+    def test_align_in_place(self):
+        curves = [_profile(self.x, s, scan=i) for i, s in enumerate(self.shifts)]
+        ids = [id(c) for c in curves]
+        applied = align.align(self.reference, curves)
+        self.assertEqual([id(c) for c in curves], ids)
+        for i, c in enumerate(curves):
+            self.assertEqual(c.metadata, {'scan': i})
+            self.assertTrue(np.allclose(c.evaluate_at_x(self.x[50:-50]), self.reference.y[50:-50], atol=0.01))
+        self.assertTrue(np.allclose(applied, self.shifts, atol=0.01))
@@ -0,0 +1,63 @@
+import sys
+import unittest
+
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import audit
+from beprof.curve import Curve
+
+
+@unittest.skipIf(audit.tracemalloc is None, "tracemalloc not available")
+class TestCopyAudit(TestCase):
+    """
+    Testing copy-audit debug mode
+    """
+    def setUp(self):
+        x = np.linspace(0, 10, 200001)
+        self.c = Curve(np.column_stack((x, np.sin(x))))
+
+    def test_allocations(self):
+        trace = sys.gettrace()
+        asarray = np.asarray
+        with audit.CopyAudit() as a:
+            self.c.change_domain(np.linspace(1, 9, 100000))
+        self.assertIs(sys.gettrace(), trace)
+        self.assertIs(np.asarray, asarray)
+        self.assertNotIn('__array_wrap__', Curve.__dict__)
+        sites = set((r.filename, r.function) for r in a.allocations)
+        self.assertIn(('curve.py', '_from_buffers'), sites)
+        # result of 100000 points is allocated at least once
+        self.assertGreaterEqual(a.total_bytes, 100000 * 16)
+        self.assertTrue(all(r.nbytes >= a.min_bytes for r in a.allocations))
+        self.assertIn('_from_buffers', a.summary())
+        # nothing allocated in beprof
+        with audit.CopyAudit(max_bytes=0) as a:
+            np.ones(100000)
+        self.assertEqual(a.records, [])
+
+    def test_promotions(self):
+        c = Curve([[0, 0], [5, 5], [10, 10]] * 1000, dtype=int)
+        with audit.CopyAudit() as a:
+            c.rescale(1.5)
+            Curve(c)
+        details = [(r.function, r.detail.replace('true_divide', 'divide')) for r in a.promotions]
+        self.assertIn(('rescale', 'divide: int64 -> float64'), details)
+        self.assertIn(('__new__', 'asarray: int64 -> float64'), details)
+        with audit.CopyAudit(max_promotions=0) as a:
+            self.c.rescale(2.)
+        self.assertEqual(a.promotions, [])
+
+    def test_budget(self):
+        with self.assertRaises(audit.CopyBudgetExceeded) as cm:
+            with audit.CopyAudit(max_bytes=1000):
+                self.c.rebinned(0.001)
+        self.assertIn('curve.py', str(cm.exception))
+        with self.assertRaises(audit.CopyBudgetExceeded):
+            with audit.CopyAudit(max_count=0):
+                self.c.change_domain([1, 2, 3] * 1000)
+        # exceptions from audited code are not replaced
+        with self.assertRaises(ValueError):
+            with audit.CopyAudit(max_bytes=0):
+                self.c.change_domain(np.linspace(-1, 1, 100000))
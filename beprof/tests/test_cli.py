@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import cli
+from beprof import loader
+from beprof.profile import Profile
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestCli(TestCase):
+    """
+    Testing command-line batch processor
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        x = np.linspace(-10, 10, 201)
+        for i, width in enumerate((2., 3., 4.)):
+            np.savetxt(os.path.join(self.directory, 'p{:d}.dat'.format(i)),
+                       np.column_stack((x, 10 * np.exp(-x ** 2 / (2 * width ** 2)))), header='x y')
+        np.savetxt(os.path.join(self.directory, 'bg.txt'), [[-20, 1], [20, 1]])
+        with open(os.path.join(self.directory, 'broken.dat'), 'w') as f:
+            f.write('1 2\nthree four\n')
+        self.output = os.path.join(self.directory, 'out.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def records(self):
+        records = {}
+        with open(self.output) as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                records[r['file']] = r
+        return records
+
+    def test_loader(self):
+        p = loader.load_curve(os.path.join(self.directory, 'p0.dat'), detector='diode')
+        self.assertIsInstance(p, Profile)
+        self.assertEqual(len(p), 201)
+        self.assertEqual(p.metadata, {'filename': 'p0.dat', 'detector': 'diode'})
+
+    def test_metrics_json(self):
+        # half maximum is never reached, width is undefined
+        m = cli.metrics(Profile([[0, 1], [1, 1], [2, 1]]))
+        self.assertIsNone(m['fwhm'])
+        self.assertEqual(m['integral'], 2.0)
+        json.loads(json.dumps(m, allow_nan=False))
+
+    def test_pipeline(self):
+        stream = StringIO()
+        code = cli.main([self.directory, '--pattern', 'p*.dat', '-o', self.output, '--step', '0.05',
+                         '--smooth', '3', '--background', os.path.join(self.directory, 'bg.txt')])
+        self.assertEqual(code, 0)
+        records = self.records()
+        self.assertEqual(len(records), 3)
+        r = records[os.path.join(self.directory, 'p1.dat')]
+        self.assertEqual(r['status'], 'ok')
+        self.assertEqual(r['points'], 201)
+        self.assertEqual(r['metrics']['points'], 401)
+        self.assertAlmostEqual(r['metrics']['y_max'], 9., places=2)
+        self.assertEqual(sorted(r['timing']), ['background', 'load', 'metrics', 'rebin', 'smooth'])
+        report = cli.run(cli.find_files([self.directory], '*.dat'), self.output,
+                         dict(x_col=0, y_col=1, delimiter=None, skiprows=0, normalize=1.), stream=stream)
+        self.assertEqual((report.files, report.errors, report.points), (4, 1, 603))
+        self.assertIn('files/s', stream.getvalue())
+        self.assertIn('normalize', stream.getvalue())
+        broken = self.records()[os.path.join(self.directory, 'broken.dat')]
+        self.assertEqual(broken['status'], 'error')
+        self.assertTrue(broken['error'].startswith('load'))
+
+    def test_resume_and_workers(self):
+        files = cli.find_files([self.directory], 'p*.dat')
+        config = dict(x_col=0, y_col=1, delimiter=None, skiprows=0)
+        cli.run(files[:1], self.output, config, stream=StringIO())
+        # interrupted write of next record
+        with open(self.output, 'a') as f:
+            f.write('{"file": "p1.dat", "sta')
+        report = cli.run(files, self.output, config, workers=2, resume=True, stream=StringIO())
+        self.assertEqual(report.files, 2)
+        records = self.records()
+        self.assertEqual(sorted(records), files)
+        self.assertTrue(all(r['status'] == 'ok' for r in records.values()))
+        # resumed run after complete one doesn't add empty lines
+        cli.run(files, self.output, config, resume=True, stream=StringIO())
+        with open(self.output) as f:
+            lines = f.read().split('\n')
+        self.assertEqual(lines[-1], '')
+        self.assertNotIn('', lines[:-1])
+        # records and the interrupted line
+        self.assertEqual(len(lines[:-1]), len(files) + 1)
@@ -0,0 +1,87 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.collection import CurveCollection
+from beprof.curve import Curve
+from beprof.profile import Profile
+
+
+class TestCurveCollection(TestCase):
+    """
+    Testing batched normalization of packed curves
+    """
+    def setUp(self):
+        rng = np.random.RandomState(9)
+        self.profiles = []
+        for i, n in enumerate((1, 7, 30, 31, 2)):
+            x = np.sort(rng.uniform(-5, 5, n))
+            self.profiles.append(Profile(np.column_stack((x, rng.uniform(1, 3, n))), scan=i))
+        self.profiles[0][0, 0] = 0.
+
+    def test_views(self):
+        cc = CurveCollection(self.profiles)
+        self.assertEqual(len(cc), 5)
+        self.assertEqual(list(cc.lengths), [1, 7, 30, 31, 2])
+        for p, view in zip(self.profiles, cc):
+            self.assertIsInstance(view, Profile)
+            self.assertTrue(np.array_equal(p, view))
+            self.assertEqual(view.metadata, p.metadata)
+        cc[-1].y = 0
+        self.assertTrue(np.all(cc.y[-2:] == 0))
+        with self.assertRaises(IndexError):
+            cc[5]
+        with self.assertRaises(ValueError):
+            CurveCollection([Curve([[0, 1]]), Curve(np.zeros((0, 2)))])
+        self.assertIs(type(CurveCollection([Curve([[0, 1]])], curve_class=Curve)[0]), Curve)
+
+    def test_factors(self):
+        cc = CurveCollection(self.profiles)
+        self.assertTrue(np.allclose(cc.factors('max'), [np.max(p.y) for p in self.profiles]))
+        self.assertTrue(np.allclose(cc.factors('integral'), [p.integral() for p in self.profiles]))
+        means = cc.factors('mean', dt=2.)
+        for p, mean in zip(self.profiles, means):
+            inside = np.abs(p.x) <= 2.
+            if inside.any():
+                self.assertAlmostEqual(mean, np.mean(p.y[inside]))
+            else:
+                self.assertTrue(np.isnan(mean))
+        with self.assertRaises(ValueError):
+            cc.factors('median')
+        with self.assertRaises(ValueError):
+            cc.factors('mean')
+
+    def test_normalize(self):
+        cc = CurveCollection(self.profiles[:4])
+        cc.normalize(dt=2.5)
+        for p, view in zip(self.profiles[:4], cc):
+            expected = p.copy()
+            expected.normalize(2.5)
+            self.assertTrue(np.allclose(view, expected))
+        before = cc.factors('max')
+        cc.rescale(0.5)
+        cc.rescale([1., 2., 4., 8.])
+        self.assertTrue(np.allclose(cc.factors('max'), before * 2 / [1., 2., 4., 8.]))
+        with self.assertRaises(ValueError):
+            cc.rescale([1., 2.])
+
+    def test_undefined_factor(self):
+        cc = CurveCollection(self.profiles)
+        before = cc.data.copy()
+        with self.assertRaises(ValueError):
+            cc.normalize(dt=1e-9)
+        self.assertTrue(np.array_equal(cc.data, before))
+
+    def test_sigma(self):
+        curves = [p.with_sigma(0.1 * (i + 1)) for i, p in enumerate(self.profiles)]
+        cc = CurveCollection(curves)
+        self.assertEqual(cc.data.shape[1], 3)
+        self.assertIsNone(CurveCollection(self.profiles).sigma)
+        for c, view in zip(curves, cc):
+            self.assertTrue(np.array_equal(view.sigma, c.sigma))
+        cc.rescale(-np.arange(1., 6.))
+        for i, (c, view) in enumerate(zip(curves, cc)):
+            self.assertTrue(np.allclose(view.y, -c.y / (i + 1)))
+            self.assertTrue(np.allclose(view.sigma, 0.1))
+        with self.assertRaises(ValueError):
+            CurveCollection([curves[0], self.profiles[1]])
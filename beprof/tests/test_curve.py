@@ -3,6 +3,7 @@ import numpy as np
 from unittest import TestCase
 
 from beprof.curve import Curve
+from beprof import functions
 
 
 class TestCurveInit(TestCase):
@@ -42,6 +43,28 @@ class TestCurveInit(TestCase):
         c = Curve(array)
         self.assertTrue(np.array_equal(c, array))
 
+    def test_from_buffers(self):
+        metadata = {'name': 'scan'}
+        c = Curve._from_buffers([0, 1, 2], np.array([3, 4, 5]), metadata)
+        self.assertIs(type(c), Curve)
+        self.assertEqual(c.dtype, np.float64)
+        self.assertTrue(np.array_equal(c, Curve([[0, 3], [1, 4], [2, 5]])))
+        self.assertIs(c.metadata, metadata)
+        self.assertEqual(Curve._from_buffers([0], [1]).metadata, {})
+        self.assertTrue(np.array_equal(Curve._from_buffers([0, 1], [1, 1], sigma=0.5).sigma, [0.5, 0.5]))
+        c = Curve([[0, 0], [2, 2]], name='scan')
+        changed = c.change_domain([0, 1])
+        changed.metadata['name'] = 'changed'
+        self.assertEqual(c.metadata, {'name': 'scan'})
+        self.assertEqual(functions.subtract(c, c).metadata, {'name': 'scan'})
+        # nested metadata is not shared
+        c.metadata['cal'] = {'k': 1}
+        c.change_domain([0, 1]).metadata['cal']['k'] = 2
+        functions.subtract(c, c).metadata['cal']['k'] = 3
+        self.assertEqual(c.metadata['cal'], {'k': 1})
+        # scalar domain
+        self.assertTrue(np.array_equal(c.change_domain(1), [[1, 1]]))
+
     def test_nonnumerical_init(self):
         with self.assertRaises(ValueError):
             Curve([['a', 'b']])
@@ -124,6 +147,57 @@ class TestCurveSmooth(TestCase):
         self.assertTrue(np.array_equal(self.test_curve, [[0, 0], [1, 0], [2, 0], [3, 0], [4, 0], [5, 0]]))
 
 
+class TestCurveConvolutionSmooth(TestCase):
+    """
+    Testing Curve.smooth() - Gaussian and kernel convolution
+    """
+    def setUp(self):
+        rng = np.random.RandomState(11)
+        self.x = np.linspace(-10, 10, 501)
+        self.y = np.exp(-self.x ** 2 / 8) + 0.1 * rng.randn(self.x.size)
+
+    def test_fft_same_as_direct(self):
+        kernel = functions.gaussian_kernel(0.5, self.x[1] - self.x[0])
+        for edge in ('reflect', 'symmetric', 'edge', 'wrap', 'constant'):
+            direct = functions.convolve(self.y, kernel, edge=edge, method='direct')
+            fft = functions.convolve(self.y, kernel, edge=edge, method='fft')
+            self.assertTrue(np.allclose(direct, fft))
+        self.assertTrue(np.allclose(functions.convolve(self.y, [0, 1, 0]), self.y))
+
+    def test_gaussian(self):
+        c = Curve(np.column_stack((self.x, self.y)))
+        c.smooth(method='gaussian', width=0.5)
+        self.assertTrue(np.array_equal(c.x, self.x))
+        # noise is reduced, area is preserved
+        self.assertLess(np.std(np.diff(c.y)), np.std(np.diff(self.y)) / 3)
+        self.assertAlmostEqual(np.sum(c.y), np.sum(self.y), delta=0.5)
+
+    def test_non_uniform_domain(self):
+        x = np.concatenate((np.linspace(-10, 0, 100, endpoint=False), np.linspace(0, 10, 400)))
+        c = Curve(np.column_stack((x, np.exp(-x ** 2 / 8))))
+        c.smooth(method='gaussian', width=0.1)
+        self.assertTrue(np.allclose(c.y, np.exp(-x ** 2 / 8), atol=0.01))
+
+    def test_batch(self):
+        curves = [Curve(np.column_stack((self.x, self.y * k))) for k in range(1, 4)]
+        curves.append(Curve(np.column_stack((self.x[::2], self.y[::2]))))
+        expected = [c.copy() for c in curves]
+        for c in expected:
+            c.smooth(method='gaussian', width=0.4, edge='edge')
+        functions.smooth_curves(curves, width=0.4, edge='edge')
+        for c, e in zip(curves, expected):
+            self.assertTrue(np.allclose(c, e))
+
+    def test_wrong_parameters(self):
+        c = Curve(np.column_stack((self.x, self.y)))
+        with self.assertRaises(ValueError):
+            c.smooth(method='gaussian')
+        with self.assertRaises(ValueError):
+            c.smooth(method='kernel', kernel=[0.5, 0.5])
+        with self.assertRaises(ValueError):
+            c.smooth(method='unknown')
+
+
 class TestCurveXatY(TestCase):
     """
     Testing Curve.x_at_y()
@@ -199,3 +273,205 @@ class TestCurveOther(TestCase):
         self.assertTrue(np.array_equal(c1, [[-1, -2], [0, -1], [1, 4], [2, -1], [3, -1]]))
         # create new object and compare
         self.assertTrue(np.array_equal(c1.subtract(c2, new_obj=True), [[-1, -3], [0, -2], [1, 3], [2, -2], [3, -2]]))
+
+
+class TestCurveIntegral(TestCase):
+    """
+    Testing Curve.integral(), Curve.integral_mean() and Curve.cumulative_integral()
+    """
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        x = np.sort(rng.uniform(-5, 5, 200))
+        self.c = Curve(np.column_stack((x, rng.rand(x.size))))
+
+    def test_same_as_trapz(self):
+        for a, b in [(-2, 3), (-10, 10), (0.1234, 0.1235), (self.c.x[10], self.c.x[50])]:
+            xs = np.concatenate(([max(a, self.c.x[0])], self.c.x[(self.c.x > a) & (self.c.x < b)],
+                                 [min(b, self.c.x[-1])]))
+            expected = np.trapz(self.c.evaluate_at_x(xs), xs)
+            self.assertAlmostEqual(self.c.integral(a, b), expected)
+
+    def test_vectorized(self):
+        a = np.linspace(-6, 4, 50)
+        b = a + 1.5
+        result = self.c.integral(a, b)
+        self.assertEqual(result.shape, a.shape)
+        self.assertTrue(np.allclose(result, [self.c.integral(lo, hi) for lo, hi in zip(a, b)]))
+        lengths = np.clip(b, self.c.x[0], self.c.x[-1]) - np.clip(a, self.c.x[0], self.c.x[-1])
+        self.assertTrue(np.allclose(self.c.integral_mean(a, b) * lengths, result))
+
+    def test_cache_invalidated(self):
+        total = self.c.integral()
+        self.c.y = self.c.y * 2
+        self.assertAlmostEqual(self.c.integral(), 2 * total)
+        self.c.rescale(2)
+        self.assertAlmostEqual(self.c.integral(), total)
+        self.assertAlmostEqual(self.c.cumulative_integral()[-1], total)
+
+    def test_cache_after_element_writes(self):
+        c = Curve([[0, 0], [1, 2], [2, 2], [4, 0]])
+        self.assertEqual(c.integral(), 5.0)
+        c.y[1] = 100
+        self.assertEqual(c.integral(), 103.0)
+        self.assertEqual(c.integral_mean(0, 2), 50.5)
+        # x and y scaled
+        c *= 0.5
+        self.assertEqual(c.integral(), 25.75)
+        c.crop(0.5, 1).y = 0
+        self.assertEqual(c.cumulative_integral()[-1], 0.0)
+        c.x[-1] = 3
+        self.assertEqual(c.integral(), 0.0)
+        self.assertEqual(c.cumulative_integral()[-1], 0.0)
+        c.y[-1] = np.nan
+        self.assertTrue(np.isnan(c.integral()))
+        self.assertTrue(np.isnan(c.integral()))
+        y = c.y
+        y[:] = 0
+        y += 2
+        self.assertEqual(c.integral(), 6.0)
+        # writes through plain numpy views are not seen by the curve
+        np.asarray(c)[:, 1] = 0
+        c.invalidate_cache()
+        self.assertEqual(c.integral(), 0.0)
+        self.assertIsNone(c.copy().__dict__['_owner'])
+
+    def test_unsorted_and_single_point(self):
+        c = Curve([[2, 2], [0, 0], [1, 2]])
+        self.assertEqual(c.integral(), 3.0)
+        self.assertEqual(Curve([[1, 5]]).integral(), 0.0)
+
+
+class TestCurveCrop(TestCase):
+    """
+    Testing Curve.crop()
+    """
+    def setUp(self):
+        self.c = Curve([[0, 0], [1, 1], [2, 2], [3, 1], [4, 0]], name='scan')
+
+    def test_view(self):
+        part = self.c.crop(1, 3)
+        self.assertTrue(np.array_equal(part, [[1, 1], [2, 2], [3, 1]]))
+        self.assertTrue(np.shares_memory(part, self.c))
+        self.assertIs(part.metadata, self.c.metadata)
+        self.assertIsInstance(part, Curve)
+        self.assertEqual(len(self.c.crop(1.2, 1.8)), 0)
+        self.assertEqual(len(self.c.crop(3, 1)), 0)
+        self.assertTrue(np.array_equal(self.c.xslice(-10, 10), self.c))
+
+    def test_interpolated_ends(self):
+        part = self.c.crop(0.5, 2.25, interpolate=True)
+        self.assertTrue(np.array_equal(part, [[0.5, 0.5], [1, 1], [2, 2], [2.25, 1.75]]))
+        self.assertFalse(np.shares_memory(part, self.c))
+        self.assertIs(part.metadata, self.c.metadata)
+        # range clipped to domain, existing points are not duplicated
+        self.assertTrue(np.array_equal(self.c.crop(-1, 1, interpolate=True), [[0, 0], [1, 1]]))
+        self.assertTrue(np.array_equal(self.c.crop(1.5, 1.5, interpolate=True), [[1.5, 1.5]]))
+        self.assertTrue(np.array_equal(self.c.crop(1.2, 1.8, interpolate=True), [[1.2, 1.2], [1.8, 1.8]]))
+        self.assertEqual(len(self.c.crop(5, 6, interpolate=True)), 0)
+
+
+class TestCurveSigma(TestCase):
+    """
+    Testing propagation of uncertainty (sigma channel)
+    """
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        x = np.sort(rng.uniform(0, 10, 50))
+        x[0], x[-1] = 0, 10
+        self.c = Curve(np.column_stack((x, np.sin(x), rng.uniform(0.05, 0.2, 50))), name='scan')
+
+    def test_channel(self):
+        self.assertIsNone(Curve([[0, 1]]).sigma)
+        with self.assertRaises(ValueError):
+            Curve([[0, 1]]).sigma = 1
+        with self.assertRaises(IndexError):
+            Curve([[0, 1, 2, 3]])
+        c = Curve([[0, 1], [1, 2]], name='a').with_sigma(0.5)
+        self.assertEqual(c.shape, (2, 3))
+        self.assertEqual(c.metadata, {'name': 'a'})
+        self.assertTrue(np.array_equal(c.sigma, [0.5, 0.5]))
+        # integer curve is promoted to float
+        c = Curve([[0, 1], [1, 2]], dtype=np.int64).with_sigma(0.5)
+        self.assertEqual(c.dtype, np.float64)
+        self.assertTrue(np.array_equal(c, [[0, 1, 0.5], [1, 2, 0.5]]))
+
+    def test_interpolation(self):
+        domain = np.linspace(0, 10, 333)
+        plain = Curve(self.c[:, :2])
+        y, sigma = self.c.evaluate_at_x(domain, return_sigma=True)
+        self.assertTrue(np.allclose(y, plain.evaluate_at_x(domain)))
+        self.assertTrue(np.allclose(self.c.evaluate_at_x(domain), y))
+        # interpolated uncertainty never exceeds uncertainties of neighbouring points
+        self.assertTrue(np.all(sigma <= np.interp(domain, self.c.x, self.c.sigma) + 1e-12))
+        at_points, sigma_at_points = self.c.evaluate_at_x(self.c.x, return_sigma=True)
+        self.assertTrue(np.allclose(sigma_at_points, self.c.sigma))
+        value, error = self.c.evaluate_at_x(-1, def_val=3, return_sigma=True)
+        self.assertEqual((value, error), (3, 0))
+        self.assertTrue(np.array_equal(plain.evaluate_at_x(domain, return_sigma=True)[1], np.zeros(333)))
+
+        changed = self.c.change_domain(domain)
+        self.assertEqual(changed.metadata, {'name': 'scan'})
+        self.assertTrue(np.allclose(changed.y, y))
+        self.assertTrue(np.allclose(changed.sigma, sigma))
+        rebinned = self.c.rebinned(0.5)
+        self.assertEqual(rebinned.shape, (21, 3))
+        self.assertTrue(np.allclose(rebinned.sigma, self.c.evaluate_at_x(rebinned.x, return_sigma=True)[1]))
+        part = self.c.crop(0.5, 5.5, interpolate=True)
+        self.assertEqual(part.shape[1], 3)
+        self.assertTrue(np.allclose(part.sigma[[0, -1]], self.c.evaluate_at_x([0.5, 5.5], return_sigma=True)[1]))
+
+    def test_subtract_and_rescale(self):
+        other = Curve([[-1, 1, 0.1], [11, 1, 0.1]])
+        diff = functions.subtract(self.c, other)
+        self.assertEqual(diff.shape[1], 3)
+        inside = (diff.x >= 0) & (diff.x <= 10)
+        s1 = self.c.evaluate_at_x(diff.x, return_sigma=True)[1]
+        s2 = other.evaluate_at_x(diff.x, return_sigma=True)[1]
+        self.assertTrue(np.allclose(diff.sigma[inside], np.hypot(s1, s2)[inside]))
+        diff = functions.subtract(Curve(self.c[:, :2]), other)
+        self.assertTrue(np.allclose(diff.sigma, s2))
+
+        c = self.c.copy()
+        c.subtract(other)
+        s2 = other.evaluate_at_x(self.c.x, return_sigma=True)[1]
+        self.assertTrue(np.allclose(c.y, self.c.y - 1))
+        self.assertTrue(np.allclose(c.sigma, np.hypot(self.c.sigma, s2)))
+        self.assertTrue(np.allclose(self.c.subtract(other, new_obj=True), c))
+
+        c.rescale(-4)
+        self.assertTrue(np.allclose(c.sigma, np.hypot(self.c.sigma, s2) / 4))
+        c = Curve([[0, 4, 2]], dtype=int)
+        c.rescale(1.5)
+        self.assertEqual(c.tolist(), [[0, 2, 1]])
+
+    def test_smooth(self):
+        x = np.linspace(0, 10, 101)
+        c = Curve(np.column_stack((x, np.sin(x), np.full(x.size, 0.2))))
+        median = c.copy()
+        median.smooth(5)
+        self.assertTrue(np.array_equal(median.sigma, c.sigma))
+        kernel = np.ones(5) / 5
+        smoothed = c.copy()
+        smoothed.smooth(method='kernel', kernel=kernel, edge='edge')
+        # mean of 5 independent values
+        self.assertTrue(np.allclose(smoothed.sigma, 0.2 / np.sqrt(5)))
+        gaussian = c.copy()
+        gaussian.smooth(method='gaussian', width=0.3)
+        expected = 0.2 * np.sqrt(np.sum(functions.gaussian_kernel(0.3, 0.1) ** 2))
+        self.assertTrue(np.allclose(gaussian.sigma[5:-5], expected))
+        batch = [c.copy(), Curve(c[:, :2])]
+        functions.smooth_curves(batch, width=0.3)
+        self.assertTrue(np.allclose(batch[0], gaussian))
+        self.assertIsNone(batch[1].sigma)
+        # non-uniform domain is resampled, constant uncertainty stays close to uniform case
+        nonuniform = Curve(np.column_stack((x ** 1.01, np.sin(x), np.full(x.size, 0.2))))
+        nonuniform.smooth(method='kernel', kernel=kernel, edge='edge')
+        self.assertTrue(np.allclose(nonuniform.sigma, 0.2 / np.sqrt(5), rtol=0.05))
+
+    def test_subtract_without_sigma(self):
+        c = Curve(self.c[:, :2])
+        c.subtract(Curve([[-1, 1], [11, 1]]))
+        self.assertEqual(c.shape[1], 2)
+        self.assertTrue(np.allclose(c.y, self.c.y - 1))
+        c.subtract(Curve([[-1, 1, 0.1], [11, 1, 0.1]]))
+        self.assertEqual(c.shape[1], 2)
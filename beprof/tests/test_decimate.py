@@ -0,0 +1,120 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.curve import Curve
+from beprof.profile import Profile
+from beprof.decimate import simplify_indices, simplify_batch, lttb_indices, minmax_indices
+
+
+class TestSimplify(TestCase):
+    """
+    Testing Curve.simplify() and simplify_batch()
+    """
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        x = np.sort(rng.uniform(-20, 20, 5000))
+        self.c = Profile(np.column_stack((x, 10 * np.exp(-x ** 2 / 50) + 0.05 * rng.randn(x.size))), detector='diode')
+
+    def test_error_within_tolerance(self):
+        for tolerance in (0.0, 0.02, 0.1, 1.0):
+            s = self.c.simplify(tolerance)
+            self.assertLessEqual(np.max(np.fabs(s.evaluate_at_x(self.c.x) - self.c.y)), tolerance)
+            self.assertEqual(s.x[0], self.c.x[0])
+            self.assertEqual(s.x[-1], self.c.x[-1])
+        self.assertLess(len(self.c.simplify(0.5)), len(self.c) // 10)
+
+    def test_result_type(self):
+        s = self.c.simplify(0.1)
+        self.assertIsInstance(s, Profile)
+        self.assertEqual(s.metadata, {'detector': 'diode'})
+        self.assertTrue(np.all(np.in1d(s.x, self.c.x)))
+
+    def test_collinear(self):
+        c = Curve([[0, 0], [1, 1], [2, 2], [3, 3]])
+        self.assertTrue(np.array_equal(c.simplify(0), [[0, 0], [3, 3]]))
+        self.assertTrue(np.array_equal(simplify_indices([], [], 0.1), []))
+        self.assertTrue(np.array_equal(simplify_indices([1.], [2.], 0.1), [0]))
+
+    def test_batch(self):
+        curves = [self.c, Curve(self.c[:100]), Curve([[0, 1]]), Curve(self.c[::3] * [1, 2]),
+                  Curve(self.c[:300]).with_sigma(0.1)]
+        batch = simplify_batch(curves, 0.05)
+        self.assertEqual(len(batch), len(curves))
+        for c, s in zip(curves, batch):
+            self.assertTrue(np.array_equal(s, c.simplify(0.05)))
+        self.assertEqual(simplify_batch([], 0.05), [])
+
+    def test_wrong_input(self):
+        with self.assertRaises(ValueError):
+            Curve([[1, 0], [0, 1]]).simplify(0.1)
+        with self.assertRaises(ValueError):
+            self.c.simplify(-1)
+
+
+def reference_lttb(x, y, n_out):
+    # textbook implementation of LTTB
+    every = (len(x) - 2) / float(n_out - 2)
+    a, result = 0, [0]
+    for i in range(n_out - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, len(x))
+        avg_x, avg_y = np.mean(x[nlo:nhi]), np.mean(y[nlo:nhi])
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        result.append(a)
+    return np.array(result + [len(x) - 1])
+
+
+class TestDecimate(TestCase):
+    """
+    Testing Curve.decimate() - LTTB and min/max envelope
+    """
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        x = np.linspace(0, 100, 10001)
+        y = np.sin(x / 5) + 0.1 * rng.randn(x.size)
+        y[5003] = 20
+        self.c = Curve(np.column_stack((x, y)), channel=3)
+
+    def test_lttb_same_as_reference(self):
+        for n_out in (3, 10, 102):
+            x, y = self.c.x[:1002], self.c.y[:1002]
+            self.assertTrue(np.array_equal(lttb_indices(x, y, n_out), reference_lttb(x, y, n_out)))
+
+    def test_size_and_type(self):
+        for method in ('lttb', 'minmax'):
+            d = self.c.decimate(500, method=method)
+            self.assertLessEqual(len(d), 500)
+            self.assertGreater(len(d), 400)
+            self.assertEqual(d.metadata, {'channel': 3})
+            self.assertTrue(np.all(np.in1d(d.x, self.c.x)))
+            self.assertTrue(np.all(np.diff(d.x) > 0))
+            # spike is preserved
+            self.assertEqual(np.max(d.y), 20)
+        self.assertTrue(np.array_equal(self.c.decimate(len(self.c)), self.c))
+
+    def test_minmax_envelope(self):
+        idx = minmax_indices(self.c.x, self.c.y, 102)
+        bins = np.minimum((self.c.x / 2).astype(int), 49)
+        for b in range(50):
+            in_bin = idx[bins[idx] == b]
+            self.assertIn(np.min(self.c.y[bins == b]), self.c.y[in_bin])
+            self.assertIn(np.max(self.c.y[bins == b]), self.c.y[in_bin])
+
+    def test_x_range(self):
+        d = self.c.decimate(50, method='minmax', x_range=(40, 60))
+        self.assertGreaterEqual(d.x[0], 40)
+        self.assertLessEqual(d.x[-1], 60)
+        self.assertEqual(np.max(d.y), 20)
+        d = self.c.decimate(50, x_range=(10, 20))
+        self.assertEqual(len(d), 50)
+        self.assertEqual((d.x[0], d.x[-1]), (10, 20))
+
+    def test_wrong_parameters(self):
+        with self.assertRaises(ValueError):
+            self.c.decimate(2)
+        with self.assertRaises(ValueError):
+            self.c.decimate(3, method='minmax')
+        with self.assertRaises(ValueError):
+            self.c.decimate(100, method='unknown')
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.curve import Curve
+from beprof.dosegrid import DoseGrid
+from beprof.profile import Profile
+
+
+class TestDoseGrid(TestCase):
+    """
+    Testing extraction of curves from 3D dose cubes
+    """
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        self.cube = rng.uniform(0, 1, (6, 7, 8)).astype(np.float32)
+        self.directory = tempfile.mkdtemp()
+        self.kwargs = dict(origin=(-1., 0., 2.), spacing=(0.5, 1., 2.), depth_axis='z')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_open(self):
+        npy = os.path.join(self.directory, 'dose.npy')
+        np.save(npy, self.cube)
+        raw = os.path.join(self.directory, 'dose.raw')
+        with open(raw, 'wb') as f:
+            f.write(b'HEADER')
+            f.write(self.cube.tobytes())
+        for g in (DoseGrid.open(npy, **self.kwargs),
+                  DoseGrid.open(raw, shape=self.cube.shape, dtype=np.float32, offset=6, **self.kwargs)):
+            self.assertIsInstance(g.data, np.memmap)
+            values = g.values_along('y', (2, 3))
+            self.assertTrue(np.array_equal(values, self.cube[2, :, 3]))
+            # view of the mapped file, not a copy
+            self.assertFalse(values.flags.owndata)
+            del g, values
+        with self.assertRaises(ValueError):
+            DoseGrid.open(raw)
+
+    def test_lines(self):
+        g = DoseGrid(self.cube, **self.kwargs)
+        p = g.line('x', (1, 2), energy=150)
+        self.assertIsInstance(p, Profile)
+        self.assertEqual(p.axis, 'x')
+        self.assertEqual(p.metadata, {'energy': 150})
+        self.assertTrue(np.allclose(p.x, -1 + 0.5 * np.arange(6)))
+        self.assertTrue(np.array_equal(p.y, self.cube[:, 1, 2]))
+        d = g.line(2, (0, 0))
+        self.assertIs(type(d), Curve)
+        self.assertTrue(np.allclose(d.x, 2 + 2 * np.arange(8)))
+        ats = [(0, 1), (3, 2), (5, 6)]
+        for axis in ('x', 'y', 'z'):
+            batch = g.lines(axis, ats)
+            self.assertEqual(len(batch), len(ats))
+            for at, c in zip(ats, batch):
+                self.assertTrue(np.array_equal(c, g.line(axis, at)))
+        self.assertEqual(g.index_of('z', 7.2), 3)
+        with self.assertRaises(ValueError):
+            g.line('w', (0, 0))
+
+    def test_oblique(self):
+        g = DoseGrid(self.cube, **self.kwargs)
+        # axis-aligned line through voxel centers gives exact values
+        p = g.oblique((-1., 3., 4.), (1.5, 3., 4.), 6)
+        self.assertTrue(np.allclose(p.y, self.cube[:, 3, 1]))
+        self.assertTrue(np.allclose(p.x, np.linspace(0, 2.5, 6)))
+        # trilinear interpolation reproduces linear function exactly
+        i, j, k = np.meshgrid(np.arange(6), np.arange(7), np.arange(8), indexing='ij')
+        linear = DoseGrid(1. + 2. * i - j + 0.5 * k, **self.kwargs)
+        rng = np.random.RandomState(1)
+        starts = rng.uniform([-1, 0, 2], [1.5, 6, 16], (10, 3))
+        stops = rng.uniform([-1, 0, 2], [1.5, 6, 16], (10, 3))
+        for start, stop, c in zip(starts, stops, linear.oblique_lines(starts, stops, 20)):
+            points = start + np.linspace(0, 1, 20)[:, None] * (stop - start)
+            f = (points - linear.origin) / linear.spacing
+            self.assertTrue(np.allclose(c.y, 1. + 2. * f[:, 0] - f[:, 1] + 0.5 * f[:, 2]))
+            self.assertAlmostEqual(c.x[-1], np.linalg.norm(stop - start))
+        self.assertEqual(linear.sample([[-2., 0., 2.], [0., 0., 2.]], def_val=-1)[0], -1)
@@ -0,0 +1,87 @@
+import numpy as np
+import warnings
+
+from unittest import TestCase
+
+from beprof.curve import Curve
+from beprof.gamma import gamma_index, gamma_index_batch, pass_rate
+
+
+def brute_force_gamma(reference, evaluated, dose_tol, dist_tol, step, search_radius):
+    # every evaluated point against every point of reference sub-grid
+    n = int(np.ceil(search_radius / step))
+    offsets = np.arange(-n, n + 1) * step
+    dd = dose_tol * np.max(reference.y)
+    result = []
+    for xe, de in evaluated:
+        q = xe + offsets
+        dr = reference.evaluate_at_x(q, def_val=np.nan)
+        g2 = (offsets / dist_tol) ** 2 + ((dr - de) / dd) ** 2
+        result.append(np.sqrt(np.nanmin(g2)) if not np.all(np.isnan(g2)) else np.nan)
+    return np.array(result)
+
+
+class TestGammaIndex(TestCase):
+    """
+    Testing gamma_index() and gamma_index_batch()
+    """
+    def setUp(self):
+        x = np.linspace(-20, 20, 401)
+        self.ref = Curve(np.column_stack((x, 100.0 / (1 + np.exp((np.fabs(x) - 10) / 1.5)))))
+        xe = np.linspace(-25, 25, 173)
+        self.ev = Curve(np.column_stack((xe, self.ref.evaluate_at_x(xe - 0.8, def_val=0) * 1.015)))
+
+    def test_identical_curves(self):
+        self.assertTrue(np.array_equal(gamma_index(self.ref, self.ref), np.zeros(len(self.ref))))
+
+    def test_against_brute_force(self):
+        g = gamma_index(self.ref, self.ev, dose_tol=0.03, dist_tol=2.0, step=0.05, search_radius=4.0)
+        expected = brute_force_gamma(self.ref, self.ev, 0.03, 2.0, 0.05, 4.0)
+        self.assertTrue(np.allclose(g, expected, equal_nan=True))
+
+    def test_local_zero_dose(self):
+        c = Curve([[0, 0], [1, 10], [2, 10], [3, 0]])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertTrue(np.array_equal(gamma_index(c, c, local=True), np.zeros(4)))
+            # zero evaluated dose, reference dose is not 0 anywhere in search window
+            g = gamma_index(c, Curve([[1.5, 0], [3, 0]]), local=True, dist_tol=0.2)
+            self.assertEqual(g[0], np.inf)
+            self.assertEqual(g[1], 0.0)
+            self.assertEqual(pass_rate(g), 0.5)
+            self.assertEqual(gamma_index_batch([(c, c)], local=True)[0].tolist(), [0.0] * 4)
+
+    def test_outside_reference_domain(self):
+        g = gamma_index(self.ref, Curve([[-40, 1], [0, 100], [40, 1]]), dist_tol=1.0)
+        self.assertTrue(np.isnan(g[0]))
+        self.assertTrue(np.isnan(g[2]))
+        self.assertFalse(np.isnan(g[1]))
+
+    def test_threshold(self):
+        g = gamma_index(self.ref, self.ev, threshold=0.1)
+        self.assertTrue(np.all(np.isnan(g[self.ev.y < 0.1 * np.max(self.ref.y)])))
+
+    def test_early_exit(self):
+        exact = gamma_index(self.ref, self.ev, dose_tol=0.02, dist_tol=0.5)
+        fast = gamma_index(self.ref, self.ev, dose_tol=0.02, dist_tol=0.5, early_exit=True)
+        self.assertTrue(np.array_equal(exact <= 1, fast <= 1))
+        valid = ~np.isnan(exact)
+        self.assertTrue(np.all(fast[valid] >= exact[valid]))
+        self.assertEqual(pass_rate(exact), pass_rate(fast))
+
+    def test_batch(self):
+        shifted = Curve(self.ev + [1000.0, 0.0])
+        ref_shifted = Curve(self.ref + [1000.0, 0.0])
+        pairs = [(self.ref, self.ev), (ref_shifted, shifted), (self.ref, self.ref)]
+        batch = gamma_index_batch(pairs, dose_tol=0.02, dist_tol=1.0)
+        self.assertEqual(len(batch), 3)
+        for (reference, evaluated), g in zip(pairs, batch):
+            single = gamma_index(reference, evaluated, dose_tol=0.02, dist_tol=1.0)
+            self.assertTrue(np.allclose(g, single, equal_nan=True))
+        self.assertEqual(gamma_index_batch([]), [])
+
+    def test_wrong_parameters(self):
+        with self.assertRaises(ValueError):
+            gamma_index(self.ref, self.ev, dist_tol=0)
+        with self.assertRaises(ValueError):
+            gamma_index(self.ref, self.ev, step=-1)
@@ -0,0 +1,76 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.histogram import HistogramBuilder
+from beprof.profile import Profile
+
+
+class TestHistogramBuilder(TestCase):
+    """
+    Testing streaming histogram of events
+    """
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        self.positions = rng.normal(0, 3, 20000)
+        self.weights = rng.exponential(2., self.positions.size)
+
+    def test_regular_grid(self):
+        h = HistogramBuilder(start=-5, stop=5, bins=40, track_errors=True)
+        for chunk in np.array_split(np.arange(self.positions.size), 7):
+            h.add(self.positions[chunk], self.weights[chunk])
+        expected, _ = np.histogram(self.positions, bins=40, range=(-5, 5), weights=self.weights)
+        self.assertTrue(np.allclose(h.sums, expected))
+        counts, _ = np.histogram(self.positions, bins=40, range=(-5, 5))
+        self.assertTrue(np.array_equal(h.counts, counts))
+        self.assertEqual(h.underflow, np.sum(self.positions < -5))
+        self.assertEqual(h.overflow, np.sum(self.positions > 5))
+        self.assertEqual(h.events, self.positions.size)
+        squares, _ = np.histogram(self.positions, bins=40, range=(-5, 5), weights=self.weights ** 2)
+        self.assertTrue(np.allclose(h.errors(), np.sqrt(squares)))
+
+    def test_edges(self):
+        edges = np.array([-10., -1., 0., 0.5, 2., 10.])
+        h = HistogramBuilder(edges=edges, curve_class=Profile, detector='strip')
+        h.add(self.positions, self.weights)
+        h.add(np.array([10., -10., np.nan, np.inf]))
+        expected, _ = np.histogram(self.positions, bins=edges, weights=self.weights)
+        expected[0] += 1
+        expected[-1] += 1
+        p = h.to_curve()
+        self.assertIsInstance(p, Profile)
+        self.assertEqual(p.metadata, {'detector': 'strip'})
+        self.assertTrue(np.allclose(p.y, expected))
+        self.assertTrue(np.allclose(p.x, [-5.5, -0.5, 0.25, 1.25, 6.]))
+        self.assertEqual(h.overflow, np.sum(self.positions > 10) + 2)
+        self.assertTrue(np.allclose(h.to_curve('density').y, expected / np.diff(edges)))
+        with self.assertRaises(ValueError):
+            h.errors()
+
+    def test_modes_and_snapshots(self):
+        h = HistogramBuilder(start=0, stop=2, bins=2)
+        chunks = [(np.array([0.5, 1.5]), np.array([2., 4.])), np.array([0.5]), np.array([1.5, 1.5, 3.])]
+        snapshots = list(h.consume(chunks, every=2))
+        # last chunk triggers a snapshot, final curve is not repeated
+        self.assertEqual(len(snapshots), 2)
+        self.assertTrue(np.array_equal(snapshots[0].y, [2., 4.]))
+        self.assertTrue(np.array_equal(snapshots[-1].y, [3., 6.]))
+        tail = list(HistogramBuilder(start=0, stop=2, bins=2).consume(chunks + [np.array([0.5])], every=5))
+        self.assertEqual([np.sum(c.y) for c in tail], [9., 10.])
+        self.assertEqual(len(list(HistogramBuilder(start=0, stop=2, bins=2).consume([]))), 1)
+        self.assertTrue(np.array_equal(h.to_curve('count').y, [2, 3]))
+        self.assertTrue(np.allclose(h.to_curve('mean').y, [1.5, 2.]))
+        h.reset()
+        self.assertEqual(h.events, 0)
+        self.assertEqual(np.sum(h.to_curve().y), 0)
+
+    def test_wrong_input(self):
+        with self.assertRaises(ValueError):
+            HistogramBuilder(start=0, stop=1)
+        with self.assertRaises(ValueError):
+            HistogramBuilder(edges=[0, 1, 1])
+        h = HistogramBuilder(start=0, stop=1, bins=3)
+        with self.assertRaises(ValueError):
+            h.add([0.5, 0.6], [1.])
+        with self.assertRaises(ValueError):
+            h.to_curve('median')
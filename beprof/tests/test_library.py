@@ -0,0 +1,82 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.curve import Curve
+from beprof.library import ProfileLibrary
+
+
+class TestProfileLibrary(TestCase):
+    """
+    Testing ProfileLibrary
+    """
+    def setUp(self):
+        rng = np.random.RandomState(12)
+        x = np.linspace(-20, 20, 81)
+        self.grid = np.linspace(-20, 20, 161)
+        self.refs = [Curve(np.column_stack((x, a * np.exp(-(x - s) ** 2 / (2 * w ** 2)))), index=i)
+                     for i, (a, s, w) in enumerate(zip(rng.uniform(0.5, 2, 300), rng.uniform(-3, 3, 300),
+                                                       rng.uniform(2, 8, 300)))]
+        self.queries = [Curve(np.column_stack((x, r.y + 0.02 * rng.randn(x.size)))) for r in self.refs[:10]]
+
+    def brute_force(self, q, metric):
+        values = np.array([r.evaluate_at_x(self.grid) for r in self.refs])
+        qv = q.evaluate_at_x(self.grid)
+        if metric == 'rms':
+            return np.sqrt(np.mean((values - qv) ** 2, axis=1))
+        return np.array([np.corrcoef(v, qv)[0, 1] for v in values])
+
+    def test_rms_and_correlation(self):
+        lib = ProfileLibrary(self.refs, grid=self.grid)
+        for metric, sign in (('rms', 1), ('correlation', -1)):
+            for q in self.queries[:3]:
+                expected = self.brute_force(q, metric)
+                indices, scores = lib.query(q, k=5, metric=metric)
+                self.assertTrue(np.array_equal(indices, np.argsort(sign * expected, kind='mergesort')[:5]))
+                self.assertTrue(np.allclose(scores, expected[indices], atol=1e-4))
+
+    def test_batch_query(self):
+        lib = ProfileLibrary(self.refs, grid=self.grid)
+        indices, scores = lib.query(self.queries, k=3)
+        self.assertEqual(indices.shape, (10, 3))
+        for q, idx in zip(self.queries, indices):
+            self.assertTrue(np.array_equal(lib.query(q, k=3)[0], idx))
+        self.assertEqual([lib.labels[i]['index'] for i in indices[:, 0]], list(range(10)))
+
+    def test_reduced_search(self):
+        exact = ProfileLibrary(self.refs, grid=self.grid)
+        reduced = ProfileLibrary(self.refs, grid=self.grid, n_components=10)
+        e_idx, e_scores = exact.query(self.queries, k=3)
+        r_idx, r_scores = reduced.query(self.queries, k=3, candidates=300)
+        self.assertTrue(np.array_equal(e_idx, r_idx))
+        # float32 products may be rounded differently
+        self.assertTrue(np.allclose(e_scores, r_scores, atol=1e-5))
+        self.assertTrue(np.array_equal(reduced.query(self.queries, k=1)[0][:, 0], np.arange(10)))
+
+    def test_clustered_index(self):
+        reduced = ProfileLibrary(self.refs, grid=self.grid, n_components=10)
+        clustered = ProfileLibrary(self.refs, grid=self.grid, n_components=10, n_clusters=17)
+        self.assertEqual(sorted(clustered.members.tolist()), list(range(300)))
+        self.assertEqual(clustered.offsets[-1], 300)
+        # probing all clusters gives the same candidates as scan of reduced space
+        r_idx, r_scores = reduced.query(self.queries, k=3, candidates=20)
+        c_idx, c_scores = clustered.query(self.queries, k=3, candidates=20, probes=17)
+        self.assertTrue(np.array_equal(r_idx, c_idx))
+        self.assertTrue(np.allclose(r_scores, c_scores))
+        # search is approximate, queries close to cluster borders need more probes
+        self.assertTrue(np.array_equal(clustered.query(self.queries, k=1, probes=3)[0][:, 0], np.arange(10)))
+        # at least as many references as candidates are searched
+        self.assertEqual(clustered.query(self.queries[0], k=100, candidates=250)[0].size, 100)
+        with self.assertRaises(ValueError):
+            ProfileLibrary(self.refs, grid=self.grid, n_clusters=5)
+
+    def test_default_grid_and_errors(self):
+        lib = ProfileLibrary(self.refs, n_points=100)
+        self.assertEqual(lib.matrix.shape, (300, 100))
+        self.assertEqual(lib.matrix.dtype, np.float32)
+        self.assertEqual((lib.grid[0], lib.grid[-1]), (-20, 20))
+        self.assertEqual(len(lib.query(self.queries[0], k=1000)[0]), 300)
+        with self.assertRaises(ValueError):
+            ProfileLibrary([])
+        with self.assertRaises(ValueError):
+            lib.query(self.queries[0], metric='unknown')
@@ -0,0 +1,144 @@
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from beprof import memo
+from beprof.curve import Curve
+from beprof.profile import Profile
+
+
+class TestTransformCache(TestCase):
+    """
+    Testing memoization of Curve transforms
+    """
+    def setUp(self):
+        x = np.linspace(0, 10, 101)
+        self.c = Profile(np.column_stack((x, np.sin(x))), detector='diode')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        memo.disable()
+        shutil.rmtree(self.directory)
+
+    def test_new_object_results(self):
+        cache = memo.TransformCache()
+        first = self.c.rebinned(0.3, 0.1, cache=cache)
+        second = self.c.rebinned(0.3, 0.1, cache=cache)
+        self.assertTrue(np.array_equal(first, second))
+        self.assertIsInstance(second, Profile)
+        self.assertEqual(second.metadata, {'detector': 'diode'})
+        # returned objects are independent
+        second.y = 0
+        self.assertFalse(np.array_equal(self.c.rebinned(0.3, 0.1, cache=cache), second))
+        # other parameters or other content give a miss
+        self.c.rebinned(0.3, 0.2, cache=cache)
+        Curve(self.c * 2).rebinned(0.3, 0.1, cache=cache)
+        self.assertEqual(cache.stats['hits'], 2)
+        # rebinned() calls memoized change_domain(), only rebinned() is cached
+        self.assertEqual(cache.stats['misses'], 3)
+        self.assertEqual(cache.stats['items'], 3)
+
+    def test_inplace_results(self):
+        cache = memo.TransformCache()
+        a, b = self.c.copy(), self.c.copy()
+        a.smooth(window=5, cache=cache)
+        b.smooth(window=5, cache=cache)
+        self.assertTrue(np.array_equal(a, b))
+        self.assertEqual(cache.stats['hits'], 1)
+        d = Curve([[0, 1], [20, 1]])
+        a.subtract(d, cache=cache)
+        b.subtract(d, cache=cache)
+        self.assertTrue(np.array_equal(a, b))
+        self.assertTrue(np.array_equal(self.c.subtract(d, new_obj=True, cache=cache),
+                                       self.c.subtract(d, new_obj=True)))
+        self.assertEqual(cache.stats['hits'], 2)
+
+    def test_global_and_per_call(self):
+        self.c.rebinned(0.5)
+        cache = memo.enable()
+        self.c.rebinned(0.5)
+        self.c.rebinned(0.5)
+        self.assertEqual(cache.stats['hits'], 1)
+        # nested change_domain() call is not cached either
+        stats = cache.stats
+        self.c.rebinned(0.25, cache=False)
+        self.assertEqual(cache.stats, stats)
+        self.assertEqual(stats['items'], 1)
+        memo.disable()
+        calls = cache.stats['hits'] + cache.stats['misses']
+        self.c.rebinned(0.5)
+        self.assertEqual(cache.stats['hits'] + cache.stats['misses'], calls)
+        self.assertIsNotNone(self.c.rebinned(0.5, cache=True))
+
+    def test_lru_and_disk_tier(self):
+        cache = memo.TransformCache(max_items=2, directory=self.directory, max_disk_bytes=10 ** 9)
+        for step in (0.1, 0.2, 0.3):
+            self.c.change_domain(np.arange(0, 10, step), cache=cache)
+        self.assertEqual(cache.stats['items'], 2)
+        self.assertEqual(cache.stats['disk_items'], 3)
+        # first entry was evicted from memory but is found on disk
+        fresh = memo.TransformCache(directory=self.directory)
+        result = self.c.change_domain(np.arange(0, 10, 0.1), cache=fresh)
+        self.assertTrue(np.array_equal(result, self.c.change_domain(np.arange(0, 10, 0.1))))
+        self.assertEqual(fresh.stats['disk_hits'], 1)
+        cache.clear()
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 0, 'disk_hits': 0, 'items': 0, 'disk_items': 0})
+
+    def test_disk_size_limit(self):
+        cache = memo.TransformCache(directory=self.directory, max_disk_bytes=2500)
+        for step in (0.1, 0.2, 0.3, 0.4):
+            self.c.change_domain(np.arange(0, 10, step), cache=cache)
+        self.assertLess(cache.stats['disk_items'], 4)
+        self.assertGreater(cache.stats['disk_items'], 0)
+        self.assertEqual(len(self.disk_sizes()), cache.stats['disk_items'])
+        self.assertLessEqual(sum(self.disk_sizes()), 2500)
+        # existing entries are replaced, entry removed by other process is skipped
+        os.remove(os.path.join(self.directory, sorted(os.listdir(self.directory))[0]))
+        for step in (0.4, 0.5, 0.6):
+            self.c.change_domain(np.arange(0, 10, step), cache=memo.TransformCache(directory=self.directory))
+            self.c.change_domain(np.arange(0, 10, step), cache=cache)
+        self.assertLessEqual(sum(self.disk_sizes()), 2500)
+        self.assertGreater(len(self.disk_sizes()), 0)
+
+    def disk_sizes(self):
+        return [os.path.getsize(os.path.join(self.directory, name))
+                for name in os.listdir(self.directory) if name.endswith('.pkl')]
+
+    def test_keys(self):
+        big = np.zeros(2000)
+        other = big.copy()
+        other[1000] = 1
+        # repr of both arrays is the same ("..."), content is not
+        self.assertEqual(repr(big), repr(other))
+        self.assertNotEqual(memo.content_hash(Curve([[0, 1]], table=big)),
+                            memo.content_hash(Curve([[0, 1]], table=other)))
+        self.assertEqual(memo.content_hash({'a': 1, 2: 'b'}), memo.content_hash({2: 'b', 'a': 1}))
+        self.assertNotEqual(memo.content_hash(1), memo.content_hash('1'))
+
+        cache = memo.TransformCache()
+        a, b, c = self.c.copy(), self.c.copy(), self.c.copy()
+        a.smooth(5, cache=cache)
+        b.smooth(window=5, cache=cache, workers=2)
+        c.smooth(window=5, method='median', cache=cache)
+        self.assertEqual(cache.stats['hits'], 2)
+        self.c.rebinned(cache=cache)
+        self.c.rebinned(0.1, cache=cache)
+        self.assertEqual(cache.stats['hits'], 3)
+        with self.assertRaises(TypeError):
+            self.c.rebinned(0.1, unknown=1, cache=cache)
+
+    def test_metadata_clashing_with_constructor(self):
+        cache = memo.TransformCache()
+        c = Profile(self.c)
+        c.metadata = {'dtype': 'diode', 'input_array': 1, 'axis': 'x'}
+        first = c.change_domain([1, 2, 3], cache=cache)
+        second = c.change_domain([1, 2, 3], cache=cache)
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertIsInstance(second, Profile)
+        self.assertEqual(second.metadata, first.metadata)
+        self.assertTrue(np.array_equal(first, second))
+        second.metadata['dtype'] = 'changed'
+        self.assertEqual(c.change_domain([1, 2, 3], cache=cache).metadata['dtype'], 'diode')
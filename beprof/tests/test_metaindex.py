@@ -0,0 +1,91 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import loader
+from beprof.curve import Curve
+from beprof.metaindex import MetadataIndex
+
+
+class TestMetadataIndex(TestCase):
+    """
+    Testing columnar index of curve metadata
+    """
+    def setUp(self):
+        rng = np.random.RandomState(6)
+        day = datetime.datetime(2017, 3, 1)
+        self.curves = []
+        for i in range(300):
+            meta = dict(gantry=int(rng.randint(1, 4)), energy=float(rng.choice([70., 150., 230.])),
+                        date=day + datetime.timedelta(hours=int(rng.randint(0, 24 * 30))),
+                        detector=str(rng.choice(['diode', 'chamber'])))
+            if i % 7 == 0:
+                del meta['detector']
+            self.curves.append(Curve([[0, i], [1, i]], **meta))
+        self.index = MetadataIndex.from_curves(self.curves)
+
+    def scan(self, test):
+        return [i for i, c in enumerate(self.curves) if test(c.metadata)]
+
+    def test_queries(self):
+        week = (datetime.datetime(2017, 3, 10), datetime.datetime(2017, 3, 17))
+        rows = self.index.select(gantry=2, energy=150, date=week)
+        expected = self.scan(lambda m: m['gantry'] == 2 and m['energy'] == 150 and week[0] <= m['date'] <= week[1])
+        self.assertEqual(list(rows), expected)
+        self.assertTrue(len(expected) > 0)
+        rows = self.index.select(energy=(None, 150), detector=['chamber', 'none'])
+        self.assertEqual(list(rows), self.scan(lambda m: m['energy'] <= 150 and m.get('detector') == 'chamber'))
+        self.assertEqual(list(self.index.select(detector='diode')),
+                         self.scan(lambda m: m.get('detector') == 'diode'))
+        self.assertEqual(len(self.index.select()), len(self.curves))
+        self.assertEqual(len(self.index.select(unknown=1)), 0)
+        self.assertEqual(len(self.index.select(gantry=(3.5, None))), 0)
+
+    def test_wrong_value_type(self):
+        for conditions in ({'energy': 'high'}, {'energy': (None, 'high')}, {'date': 'yesterday'},
+                           {'gantry': [1, 'two']}):
+            with self.assertRaises(TypeError) as cm:
+                self.index.select(**conditions)
+            self.assertIn(list(conditions)[0], str(cm.exception))
+        # any value can be compared with string column
+        self.assertEqual(len(self.index.select(detector=5)), 0)
+
+    def test_lazy_curves(self):
+        loaded = []
+
+        def load(key):
+            loaded.append(key)
+            return self.curves[key]
+
+        index = MetadataIndex(((i, c.metadata) for i, c in enumerate(self.curves)), load)
+        found = index.curves(gantry=1)
+        self.assertEqual(loaded, [])
+        first = next(found)
+        self.assertEqual(first.metadata['gantry'], 1)
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(index.select_keys(gantry=1), self.scan(lambda m: m['gantry'] == 1))
+        with self.assertRaises(ValueError):
+            next(MetadataIndex([(0, {'a': 1})]).curves())
+
+    def test_persisted_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i, c in enumerate(self.curves[:20]):
+                paths.append(os.path.join(directory, 'c{:d}.dat'.format(i)))
+                np.savetxt(paths[-1], c)
+            index = MetadataIndex(zip(paths, (c.metadata for c in self.curves[:20])))
+            index.save(os.path.join(directory, 'index.npz'))
+            restored = MetadataIndex.load(os.path.join(directory, 'index.npz'), loader.load_curve)
+            conditions = dict(energy=[70, 230], date=(datetime.date(2017, 3, 5), None))
+            self.assertEqual(restored.select_keys(**conditions), index.select_keys(**conditions))
+            for c in restored.curves(**conditions):
+                i = paths.index(os.path.join(directory, c.metadata['filename']))
+                self.assertTrue(np.array_equal(c, self.curves[i]))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import moments
+from beprof.profile import Profile
+from beprof.stream import AppendableCurve
+
+
+def _reference(x, y):
+    # separate reductions with trapezoidal weights
+    w = np.zeros_like(x)
+    w[:-1] += np.diff(x) / 2
+    w[1:] += np.diff(x) / 2
+    w = w * y
+    c = np.sum(w * x) / np.sum(w)
+    s = np.sqrt(np.sum(w * (x - c) ** 2) / np.sum(w))
+    return (np.sum(w), c, s, np.sum(w * (x - c) ** 3) / np.sum(w) / s ** 3,
+            np.sum(w * (x - c) ** 4) / np.sum(w) / s ** 4 - 3)
+
+
+class TestMoments(TestCase):
+    """
+    Testing one-pass moments of profiles
+    """
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.profiles = []
+        for n in (50, 80, 80, 120):
+            x = np.sort(rng.uniform(90, 110, n))
+            self.profiles.append(Profile(np.column_stack((x, np.exp(-(x - 100) ** 2 / 8) * (1 + 0.3 * (x > 100))))))
+
+    def test_single(self):
+        for p in self.profiles:
+            m = p.moments()
+            self.assertTrue(np.allclose(m, _reference(p.x, p.y), rtol=1e-8))
+        # gaussian sampled densely on non-uniform grid
+        x = np.sort(np.concatenate((np.linspace(-20, 20, 2001), np.linspace(-1, 1, 3000))))
+        m = moments.moments(Profile(np.column_stack((x + 1000, np.exp(-x ** 2 / 2)))))
+        self.assertAlmostEqual(m.centroid, 1000, places=6)
+        self.assertAlmostEqual(m.rms, 1, places=4)
+        self.assertAlmostEqual(m.skewness, 0, places=4)
+        self.assertAlmostEqual(m.kurtosis, 0, places=3)
+        self.assertAlmostEqual(m.total, np.sqrt(2 * np.pi), places=4)
+        # plain sums of y without trapezoid
+        m = moments.moments(Profile([[0, 1], [1, 1], [5, 2]]), trapezoid=False)
+        self.assertEqual((m.total, m.centroid), (4., 2.75))
+
+    def test_batch(self):
+        for curves in (self.profiles, self.profiles[1:3]):
+            batch = moments.moments_batch(curves)
+            for i, p in enumerate(curves):
+                self.assertTrue(np.allclose([field[i] for field in batch], p.moments(), rtol=1e-10))
+            flat = moments.moments_batch(curves, trapezoid=False)
+            self.assertTrue(np.allclose(flat.total, [np.sum(p.y) for p in curves]))
+        self.assertEqual(moments.moments_batch([]).centroid.size, 0)
+        with self.assertRaises(ValueError):
+            moments.moments_batch([self.profiles[0], self.profiles[0][:0]])
+
+    def test_streaming(self):
+        p = self.profiles[-1]
+        s = AppendableCurve(capacity=8, track_moments=True)
+        r = moments.RunningMoments(trapezoid=False)
+        for chunk in np.array_split(np.asarray(p), [1, 2, 30, 31, 77]):
+            s.extend(chunk)
+            r.update(chunk)
+        self.assertTrue(np.allclose(s.moments, p.moments(), rtol=1e-9))
+        self.assertTrue(np.allclose(r.result(), moments.moments(p, trapezoid=False), rtol=1e-9))
+        self.assertIsNone(AppendableCurve().moments)
+        self.assertTrue(np.isnan(moments.RunningMoments().result().centroid))
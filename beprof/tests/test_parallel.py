@@ -0,0 +1,55 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import functions
+from beprof import parallel
+from beprof.curve import Curve
+
+
+class TestParallel(TestCase):
+    """
+    Testing chunked thread-parallel median filter and interpolation
+    """
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        x = np.sort(rng.uniform(0, 100, 5003))
+        self.c = Curve(np.column_stack((x, rng.randn(x.size))))
+        self.domain = rng.uniform(-10, 110, 7001)
+
+    def test_chunk_bounds(self):
+        self.assertEqual(list(parallel.chunk_bounds(10, 4, min_chunk=5)), [0, 5, 10])
+        self.assertEqual(list(parallel.chunk_bounds(3, 8, min_chunk=5)), [0, 3])
+        self.assertEqual(list(parallel.chunk_bounds(0, 8)), [0, 0])
+
+    def test_medfilt_identical(self):
+        for window in (1, 3, 9, 51):
+            for workers in (2, 3, 7):
+                for min_chunk in (1, 20, 1000):
+                    result = parallel.medfilt(self.c.y, window, workers, min_chunk)
+                    self.assertTrue(np.array_equal(result, functions.medfilt(self.c.y, window)))
+        # window wider than chunks
+        self.assertTrue(np.array_equal(parallel.medfilt(self.c.y[:40], 21, 8, 1),
+                                       functions.medfilt(self.c.y[:40], 21)))
+        with self.assertRaises(ValueError):
+            parallel.medfilt(self.c.y, 4, 2)
+
+    def test_interp_identical(self):
+        expected = np.interp(self.domain, self.c.x, self.c.y, left=-1, right=-2)
+        result = parallel.interp(self.domain, self.c.x, self.c.y, left=-1, right=-2, workers=4, min_chunk=100)
+        self.assertTrue(np.array_equal(result, expected))
+
+    def test_curve_methods(self):
+        a, b = self.c.copy(), self.c.copy()
+        a.smooth(5)
+        parallel.MIN_CHUNK, old = 10, parallel.MIN_CHUNK
+        try:
+            b.smooth(5, workers=4)
+            self.assertTrue(np.array_equal(a, b))
+            inside = self.domain[(self.domain > self.c.x[0]) & (self.domain < self.c.x[-1])]
+            self.assertTrue(np.array_equal(self.c.evaluate_at_x(self.domain, 5, workers=None),
+                                           self.c.evaluate_at_x(self.domain, 5)))
+            self.assertTrue(np.array_equal(self.c.change_domain(inside, workers=3),
+                                           self.c.change_domain(inside)))
+        finally:
+            parallel.MIN_CHUNK = old
@@ -39,6 +39,24 @@ class TestProfileInit(TestCase):
         self.assertEqual(p.x, 1)
         self.assertEqual(p.y, 2)
 
+    def test_from_buffers(self):
+        p = Profile._from_buffers([0, 1], [2, 3], {'energy': 150}, axis='x')
+        self.assertIsInstance(p, Profile)
+        self.assertEqual((p.axis, p.metadata), ('x', {'energy': 150}))
+        self.assertTrue(np.array_equal(p, [[0, 2], [1, 3]]))
+        self.assertIsNone(Profile._from_buffers([0], [1]).axis)
+        self.assertIsInstance(p.change_domain([0.5]), Profile)
+
+    def test_with_sigma(self):
+        p = Profile([[0, 2], [1, 3]], axis='x', energy={'MeV': 150})
+        s = p.with_sigma(0.5)
+        self.assertIsInstance(s, Profile)
+        self.assertEqual(s.axis, 'x')
+        self.assertEqual(s.metadata, p.metadata)
+        s.metadata['energy']['MeV'] = 60
+        self.assertEqual(p.metadata['energy'], {'MeV': 150})
+        self.assertFalse(np.shares_memory(s, p))
+
     def test_two_point_init(self):
         array = [[-1, 3], [1, 7]]
         p = Profile(array)
@@ -86,6 +104,62 @@ class TestProfileXatY(TestCase):
             self.p.x_at_y('a')
 
 
+class TestProfileIndex(TestCase):
+    """
+    Testing Profile.build_index() and vectorized Profile.x_at_y()
+    """
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        x = np.linspace(-10, 10, 301)
+        self.p = Profile(np.column_stack((x, np.exp(-x ** 2 / 20) + 0.05 * rng.rand(x.size))))
+        self.levels = np.concatenate(([-1.0, 2.0, np.nan], np.linspace(0, 1.1, 97), self.p.y[::10]))
+
+    def test_same_as_linear_lookup(self):
+        for reverse in (False, True):
+            expected = np.array([self.p.x_at_y(level, reverse=reverse) for level in self.levels])
+            result = self.p.x_at_y(self.levels, reverse=reverse)
+            self.assertTrue(np.allclose(result, expected, equal_nan=True))
+
+    def test_scalar_query_with_index(self):
+        expected = self.p.x_at_y(0.5, reverse=True)
+        self.p.build_index()
+        self.assertAlmostEqual(self.p.x_at_y(0.5, reverse=True), expected)
+        self.assertTrue(np.isnan(self.p.x_at_y(5.0)))
+        self.assertAlmostEqual(self.p.fwhm, self.p.width(0.5 * np.max(self.p.y)))
+
+    def test_index_invalidated(self):
+        self.p.build_index()
+        self.p.y = self.p.y * 2
+        self.assertAlmostEqual(self.p.x_at_y(1.5), self.p.copy().x_at_y(1.5))
+        self.p[:, 1] = 1.0
+        self.assertEqual(self.p.x_at_y(1.0), self.p.x[0])
+
+    def test_index_after_element_write(self):
+        p = Profile([[0, 0], [1, 1], [2, 2], [3, 1], [4, 0]])
+        p.x_at_y([0.5])
+        self.assertNotIn('x_at_y', p.__dict__.get('_cache', {}))
+        p.y[2] = 10
+        self.assertAlmostEqual(p.fwhm, Profile(p).fwhm)
+        p.build_index()
+        p.y[2] = 20
+        fresh = Profile(p)
+        self.assertAlmostEqual(p.fwhm, fresh.fwhm)
+        self.assertTrue(np.allclose(p.x_at_y([5., 15.], reverse=True), fresh.x_at_y([5., 15.], reverse=True)))
+
+
+class TestProfileCrop(TestCase):
+    """
+    Testing Profile.crop()
+    """
+    def test_crop_keeps_type_and_axis(self):
+        p = Profile([[0.0, 5.0], [0.1, 10.0], [0.2, 20.0], [0.3, 10.0]], axis='x', energy=150)
+        for part in (p.crop(0.05, 0.3), p.crop(0.05, 0.25, interpolate=True)):
+            self.assertIsInstance(part, Profile)
+            self.assertEqual(part.axis, 'x')
+            self.assertEqual(part.metadata, {'energy': 150})
+        self.assertAlmostEqual(p.crop(0.05, 0.3).fwhm, 0.2)
+
+
 class TestProfileWidth(TestCase):
     """
     Testing Profile.width()
@@ -152,6 +226,16 @@ class TestProfileNormalize(TestCase):
         self.p.normalize(2)
         self.assertTrue(np.allclose(self.p.y, [0.5, 1., 1.5, 1.]))
 
+    def test_normalize_after_element_write(self):
+        p = Profile([[-1, 1], [0, 2], [1, 1]])
+        p.integral()
+        p.normalize(1)
+        p.y[1] = 4
+        p.normalize(1)
+        # same as normalization of a fresh profile with modified values
+        self.assertTrue(np.allclose(p.y, np.array([0.75, 4., 0.75]) / (5.5 / 3)))
+        self.assertAlmostEqual(float(np.mean(p.y)), 1.)
+
     def test_normalize_integers(self):
         # Testing normalization of integer-filled profiles
         # case 1 - int filled 'p_int /= dt' raises:
@@ -0,0 +1,63 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.curve import Curve
+from beprof.pyramid import Pyramid
+
+
+class TestPyramid(TestCase):
+    """
+    Testing Pyramid and Curve.pyramid()
+    """
+    def setUp(self):
+        rng = np.random.RandomState(8)
+        x = np.sort(rng.uniform(0, 100, 10007))
+        self.c = Curve(np.column_stack((x, rng.randn(x.size))))
+
+    def test_levels_against_brute_force(self):
+        p = Pyramid(self.c.x, self.c.y, factor=3)
+        for level, (x_first, x_last, x_mean, y_min, y_max, y_mean) in enumerate(p.levels):
+            block = 3 ** level
+            for i in (0, len(y_min) // 2, len(y_min) - 1):
+                sl = slice(i * block, (i + 1) * block)
+                self.assertEqual(x_first[i], self.c.x[sl][0])
+                self.assertEqual(x_last[i], self.c.x[sl][-1])
+                self.assertAlmostEqual(x_mean[i], float(np.mean(self.c.x[sl])))
+                self.assertEqual(y_min[i], np.min(self.c.y[sl]))
+                self.assertEqual(y_max[i], np.max(self.c.y[sl]))
+                self.assertAlmostEqual(y_mean[i], float(np.mean(self.c.y[sl])))
+        self.assertEqual(len(p.levels[-1][0]), 1)
+
+    def test_query(self):
+        p = self.c.pyramid()
+        for a, b, resolution in ((0, 100, 100), (20, 30, 50), (50, 50.05, 1000), (-10, 5, 10)):
+            x, y_min, y_max, y_mean = p.query(a, b, resolution)
+            self.assertLessEqual(len(x), resolution + 2)
+            inside = (self.c.x >= a) & (self.c.x <= b)
+            # envelope covers all points in range
+            self.assertLessEqual(np.min(y_min), np.min(self.c.y[inside]))
+            self.assertGreaterEqual(np.max(y_max), np.max(self.c.y[inside]))
+        # fine resolution returns original points
+        x, y_min, y_max, y_mean = p.query(50, 50.05, 1000)
+        inside = (self.c.x >= 50) & (self.c.x <= 50.05)
+        self.assertTrue(np.array_equal(y_mean, self.c.y[inside]))
+
+    def test_cached(self):
+        p = self.c.pyramid()
+        self.assertIs(self.c.pyramid(), p)
+        self.c.y = 0
+        self.assertIsNot(self.c.pyramid(), p)
+        self.assertEqual(np.max(self.c.pyramid().query(0, 100, 10)[2]), 0)
+        p = self.c.pyramid()
+        self.c.y[10] = 7
+        self.assertIsNot(self.c.pyramid(), p)
+        self.assertEqual(np.max(self.c.pyramid().query(0, 100, 10)[2]), 7)
+        self.assertEqual(set(self.c.__dict__['_cache']), {('pyramid', 4)})
+
+    def test_wrong_input(self):
+        with self.assertRaises(ValueError):
+            Curve([[1, 0], [0, 1]]).pyramid()
+        with self.assertRaises(ValueError):
+            self.c.pyramid(factor=1)
+        self.assertEqual(len(Curve([[1, 5]]).pyramid().levels), 1)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import functions
+from beprof import rolling
+from beprof.curve import Curve
+
+
+def window_matrix(vector, window):
+    k = (window - 1) // 2
+    padded = np.pad(vector, (k, k), mode='edge')
+    return np.array([padded[i:i + window] for i in range(len(vector))])
+
+
+class TestRolling(TestCase):
+    """
+    Testing rolling window statistics
+    """
+    def setUp(self):
+        rng = np.random.RandomState(9)
+        # rounding gives repeated values
+        self.vectors = [np.round(rng.randn(n), 1) for n in (1, 2, 7, 300)]
+
+    def test_against_window_matrix(self):
+        for vector in self.vectors:
+            for window in (1, 3, 5, 11, 51, 151):
+                matrix = window_matrix(vector, window)
+                median, mad = rolling.rolling_median_mad(vector, window)
+                self.assertTrue(np.array_equal(median, np.median(matrix, axis=1)))
+                self.assertTrue(np.array_equal(mad, np.median(np.fabs(matrix - median[:, None]), axis=1)))
+                self.assertTrue(np.array_equal(rolling.rolling_median(vector, window),
+                                               functions.medfilt(vector, window)))
+                self.assertTrue(np.allclose(rolling.rolling_quantile(vector, window, [0, 0.1, 0.75, 1]),
+                                            np.percentile(matrix, [0, 10, 75, 100], axis=1)))
+                self.assertTrue(np.allclose(rolling.rolling_mean(vector, window), matrix.mean(axis=1)))
+                self.assertTrue(np.allclose(rolling.rolling_std(vector, window), matrix.std(axis=1), atol=1e-6))
+
+    def test_median_mad_paths(self):
+        vector = self.vectors[-1]
+        for window in (5, 11):
+            expected = rolling.rolling_median_mad(vector, window)
+            # small blocks of vectorized path
+            block_size, rolling.BLOCK_SIZE = rolling.BLOCK_SIZE, 2 * window
+            try:
+                result = rolling.rolling_median_mad(vector, window)
+            finally:
+                rolling.BLOCK_SIZE = block_size
+            self.assertTrue(np.array_equal(result, expected))
+            # incrementally sorted window
+            max_window, rolling.MEDIAN_MAD_MAX_WINDOW = rolling.MEDIAN_MAD_MAX_WINDOW, 1
+            try:
+                result = rolling.rolling_median_mad(vector, window)
+            finally:
+                rolling.MEDIAN_MAD_MAX_WINDOW = max_window
+            self.assertTrue(np.array_equal(result, expected))
+        for median in rolling.rolling_median_mad(np.array([]), 5):
+            self.assertEqual(median.size, 0)
+
+    def test_wrong_parameters(self):
+        with self.assertRaises(ValueError):
+            rolling.rolling_median(self.vectors[2], 4)
+        with self.assertRaises(ValueError):
+            rolling.rolling_mean(np.ones((3, 3)), 3)
+        with self.assertRaises(ValueError):
+            rolling.rolling_quantile(self.vectors[2], 3, 1.5)
+        self.assertEqual(rolling.rolling_median(np.array([]), 3).size, 0)
+
+
+class TestCurveHampel(TestCase):
+    """
+    Testing Curve.hampel()
+    """
+    def test_spikes_removed(self):
+        rng = np.random.RandomState(10)
+        x = np.linspace(-10, 10, 401)
+        y = np.exp(-x ** 2 / 20) + 0.01 * rng.randn(x.size)
+        spikes = [50, 200, 201, 350]
+        c = Curve(np.column_stack((x, y)))
+        c.y[spikes] += 5
+        outliers = c.hampel(window=9)
+        self.assertTrue(np.all(outliers[spikes]))
+        self.assertLess(np.count_nonzero(outliers), 20)
+        self.assertTrue(np.array_equal(c.y[~outliers], y[~outliers]))
+        self.assertLess(np.max(np.fabs(c.y - y)), 0.1)
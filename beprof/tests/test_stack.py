@@ -0,0 +1,80 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof.profile import Profile
+from beprof.stack import ProfileStack
+
+
+class TestProfileStack(TestCase):
+    """
+    Testing ProfileStack
+    """
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.x = np.linspace(-10, 10, 81)
+        self.y = np.exp(-(self.x - rng.uniform(-2, 2, (25, 1))) ** 2 / (2 * rng.uniform(1, 3, (25, 1)) ** 2))
+        self.y[3] = 0.
+        self.profiles = [Profile(np.column_stack((self.x, row))) for row in self.y]
+
+    def test_views(self):
+        s = ProfileStack(self.x, self.y, axis='x', detector='strip')
+        self.assertEqual(len(s), 25)
+        for p, view in zip(self.profiles, s):
+            self.assertIsInstance(view, Profile)
+            self.assertTrue(np.array_equal(p, view))
+            self.assertEqual(view.axis, 'x')
+            self.assertEqual(view.metadata, {'detector': 'strip'})
+        view = s[-1]
+        view.y = 7.
+        self.assertTrue(np.all(s.y[-1] == 7.))
+        self.assertTrue(np.shares_memory(s.y, s[5]))
+        with self.assertRaises(IndexError):
+            s[25]
+        with self.assertRaises(IndexError):
+            s.append(np.zeros(3))
+
+    def test_growth_and_ring(self):
+        s = ProfileStack(self.x, capacity=2)
+        for row in self.y:
+            s.append(row)
+        self.assertTrue(np.array_equal(s.y, self.y))
+
+        ring = ProfileStack(self.x, capacity=7, ring=True)
+        ring.extend(self.y[:5])
+        ring.extend(self.y[5:9])
+        self.assertEqual(len(ring), 7)
+        self.assertTrue(np.array_equal(ring.y, self.y[2:9]))
+        ring.extend(self.y[9:])
+        self.assertEqual(ring.capacity, 7)
+        self.assertTrue(np.array_equal(ring.y, self.y[-7:]))
+        for p, view in zip(self.profiles[-7:], ring):
+            self.assertTrue(np.array_equal(p, view))
+        self.assertTrue(np.array_equal(ring[0].y, self.y[-7]))
+
+    def test_vectorized(self):
+        s = ProfileStack(self.x, capacity=10, ring=True)
+        s.extend(self.y)
+        profiles = self.profiles[-10:]
+        fwhm = s.fwhm()
+        for p, value in zip(profiles, fwhm):
+            self.assertAlmostEqual(p.fwhm, value)
+        for level, reverse in ((0.3, False), (0.7, True), (2., False)):
+            expected = [p.x_at_y(level, reverse) for p in profiles]
+            self.assertTrue(np.allclose(s.x_at_y(level, reverse), expected, equal_nan=True))
+        self.assertTrue(np.allclose(s.centroid(), [p.moments().centroid for p in profiles]))
+        self.assertTrue(np.allclose(s.moments(False).rms, [p.moments(False).rms for p in profiles]))
+
+    def test_normalize(self):
+        s = ProfileStack.from_profiles(p for i, p in enumerate(self.profiles) if i != 3)
+        s.normalize(2.)
+        for p, view in zip((p for i, p in enumerate(self.profiles) if i != 3), s):
+            expected = p.copy()
+            expected.normalize(2.)
+            self.assertTrue(np.allclose(view, expected))
+        s = ProfileStack(self.x, self.y)
+        with self.assertRaises(ValueError):
+            s.normalize(2.)
+        self.assertTrue(np.array_equal(s.y, self.y))
+        with self.assertRaises(ValueError):
+            ProfileStack.from_profiles([Profile([[0, 1]]), Profile([[1, 1]])])
@@ -0,0 +1,60 @@
+import numpy as np
+
+from unittest import TestCase
+
+from beprof import functions
+from beprof.profile import Profile
+from beprof.stream import AppendableCurve
+
+
+class TestAppendableCurve(TestCase):
+    """
+    Testing AppendableCurve
+    """
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        x = np.linspace(-10, 10, 1000)
+        self.points = np.column_stack((x, np.exp(-x ** 2 / 10) * (1 + 0.2 * rng.rand(x.size)) + 0.5 * (x > 6)))
+        self.packets = np.array_split(self.points, np.sort(rng.randint(1, 999, size=40)))
+
+    def test_same_as_curve(self):
+        s = AppendableCurve(capacity=3, curve_class=Profile, smooth_window=7, detector='ionization chamber')
+        n = 0
+        for packet in self.packets:
+            s.extend(packet)
+            n += len(packet)
+            p = Profile(self.points[:n])
+            self.assertTrue(np.array_equal(s.curve, p))
+            self.assertEqual(s.max, np.max(p.y))
+            if np.isnan(p.fwhm):
+                self.assertTrue(np.isnan(s.fwhm))
+            else:
+                self.assertAlmostEqual(s.fwhm, p.fwhm)
+            self.assertTrue(np.array_equal(s.smoothed.y, functions.medfilt(p.y, 7)))
+        self.assertIsInstance(s.curve, Profile)
+        self.assertEqual(s.curve.metadata, {'detector': 'ionization chamber'})
+
+    def test_single_points(self):
+        s = AppendableCurve(capacity=1)
+        for x, y in self.points[:100]:
+            s.append(x, y)
+        self.assertEqual(len(s), 100)
+        self.assertTrue(np.array_equal(s.curve, self.points[:100]))
+        self.assertIsNone(s.smoothed)
+
+    def test_view_shares_buffer(self):
+        s = AppendableCurve(capacity=10)
+        s.extend(self.points[:5])
+        c = s.curve
+        c.y = 0
+        self.assertTrue(np.all(s.curve.y == 0))
+
+    def test_empty_and_wrong_input(self):
+        s = AppendableCurve()
+        self.assertTrue(np.isnan(s.max))
+        self.assertTrue(np.isnan(s.fwhm))
+        self.assertEqual(len(s.curve), 0)
+        with self.assertRaises(IndexError):
+            s.extend([1, 2, 3])
+        with self.assertRaises(ValueError):
+            AppendableCurve(smooth_window=4)
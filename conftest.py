@@ -0,0 +1,6 @@
+import sys
+
+# asyncio support requires async generators (Python 3.6+)
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore += ['beprof/aio.py', 'beprof/tests/test_aio.py']
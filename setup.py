@@ -116,6 +116,9 @@ setuptools.setup(
         'Programming Language :: Python :: 3.6',
     ],
     install_requires=numpy_version,
+    entry_points={
+        'console_scripts': ['beprof=beprof.cli:main'],
+    },
     setup_requires=[] + pytest_runner,
     tests_require=['pytest']
 )